@@ -0,0 +1,162 @@
+"""
+Conversation context for the SQL agent.
+
+Each chat turn gives the agent a bounded window instead of the bare message:
+the newest turns verbatim, up to CHAT_CONTEXT["history_token_budget"] tokens,
+plus a rolling summary of everything older (conversations.summary). Once the
+unsummarized tail outgrows the budget, the turns that fell out of the window are
+folded into the summary with one LLM call and summary_message_id moves past them,
+so every message is summarized once and the prompt stays flat as threads grow.
+"""
+
+import asyncio
+import logging
+import math
+from typing import Optional, Sequence
+
+import config
+from app.agents.prompts.summary import SUMMARY_PROMPT
+from app.db import queries as q
+from app.db.postgres import DataBasePool
+
+logger = logging.getLogger(__name__)
+
+_SPEAKERS = {"USER": "User", "SYSTEM": "LUMINA"}
+
+_summarizer = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Conservative token estimate without a tokenizer round trip: about 4 Latin
+    characters per token, while Thai script encodes at well under 2 characters per token.
+    """
+    ascii_chars = sum(1 for ch in text if ch < "\x80")
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 1.5)
+
+
+class Turn:
+    __slots__ = ("message_id", "role", "content", "tokens")
+
+    def __init__(self, message_id: int, role: str, content: str, tokens: int) -> None:
+        self.message_id = message_id
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+
+
+class AgentContext:
+    """Rolling summary plus recent turns (oldest first) preceding the current message."""
+
+    __slots__ = ("summary", "turns")
+
+    def __init__(self, summary: Optional[str] = None, turns: Sequence[Turn] = ()) -> None:
+        self.summary = summary
+        self.turns = list(turns)
+
+    def render(self, message: str) -> str:
+        """Agent input: summary, recent turns, then the current question."""
+        if not self.summary and not self.turns:
+            return message
+        parts = []
+        if self.summary:
+            parts.append(f"Conversation summary:\n{self.summary}")
+        if self.turns:
+            parts.append(f"Recent conversation:\n{_format_turns(self.turns)}")
+        parts.append(f"Current question:\n{message}")
+        return "\n\n".join(parts)
+
+
+def _format_turns(turns: Sequence[Turn]) -> str:
+    return "\n".join(f"{_SPEAKERS.get(turn.role, turn.role)}: {turn.content}" for turn in turns)
+
+
+def _split(turns: Sequence[Turn], token_budget: int, max_turns: int) -> tuple[list[Turn], list[Turn]]:
+    """Split newest-first turns into the window that fits the budget and the older rest."""
+    used = 0
+    for index, turn in enumerate(turns):
+        if index >= max_turns or used + turn.tokens > token_budget:
+            return list(turns[:index]), list(turns[index:])
+        used += turn.tokens
+    return list(turns), []
+
+
+def _get_summarizer():
+    global _summarizer
+    if _summarizer is None:
+        from app.services.llm.open_ai import OpenAILLM
+
+        _summarizer = OpenAILLM(model=config.CHAT_CONTEXT["summary_model"])
+    return _summarizer
+
+
+async def _fold(
+    conversation_id: int,
+    summary: Optional[str],
+    summary_message_id: Optional[int],
+    turns: Sequence[Turn],
+) -> Optional[str]:
+    """Summary extended with ``turns`` (newest first) and persisted; None if the model call failed."""
+    ordered = list(reversed(turns))
+    prompt = SUMMARY_PROMPT.format(
+        max_tokens=config.CHAT_CONTEXT["summary_max_tokens"],
+        summary=summary or "(none)",
+        turns=_format_turns(ordered),
+    )
+    try:
+        updated = (await asyncio.to_thread(_get_summarizer().invoke, prompt)).strip()
+    except Exception as exc:
+        logger.warning("Summary update failed for conversation %s: %s", conversation_id, exc)
+        return None
+
+    # A concurrent turn may have folded first; its summary wins and this one is only used once.
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        await connection.execute(
+            q.CONTEXT_SUMMARY_UPDATE,
+            conversation_id,
+            updated,
+            ordered[-1].message_id,
+            summary_message_id,
+        )
+    return updated
+
+
+async def build_context(conversation_id: int) -> AgentContext:
+    """
+    Context from the messages already stored for the conversation (call before inserting
+    the new one). Takes its own pooled connections and releases them before the summary
+    model call, so a slow fold never holds a connection.
+    """
+    settings = config.CHAT_CONTEXT
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        row = await connection.fetchrow(q.CONTEXT_SUMMARY, conversation_id)
+        if row is None:
+            return AgentContext()
+        rows = await connection.fetch(
+            q.CONTEXT_RECENT, conversation_id, row["summary_message_id"], settings["scan_limit"]
+        )
+
+    summary, summary_message_id = row["summary"], row["summary_message_id"]
+    turns = [
+        Turn(
+            row["message_id"],
+            row["role"],
+            row["content"],
+            row["token_count"] or estimate_tokens(row["content"]),
+        )
+        for row in rows
+    ]
+
+    budget, max_turns = settings["history_token_budget"], settings["max_turns"]
+    window, overflow = _split(turns, budget, max_turns)
+    if overflow:
+        # Fold down to half the budget so the next few turns fit without another summary call.
+        keep, fold = _split(turns, budget // 2, max(1, max_turns // 2))
+        updated = await _fold(conversation_id, summary, summary_message_id, fold)
+        if updated is not None:
+            summary, window = updated, keep
+
+    window.reverse()
+    return AgentContext(summary, window)
@@ -0,0 +1,431 @@
+"""
+Intent router for common analytics questions.
+
+Questions such as "ยอดขายวันนี้เท่าไหร่", "which items are low on stock?",
+"top treatments this month" or "วันนี้มีนัดกี่คิว" map onto the dashboard queries.
+They are answered here from parameterized templates in a few milliseconds, without
+an LLM call. Matching is keyword/regex first, with a character-trigram
+nearest-example classifier as a fallback for phrasings the patterns miss; both work
+for Thai, which has no word boundaries. Anything ambiguous, open-ended, outside
+the supported time expressions or carrying words outside the intent's vocabulary
+(a treatment or item name, "target", "category", ...) returns None and goes to the
+SQL agent.
+"""
+
+import math
+import re
+from collections import Counter as TermCounter
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Awaitable, Callable, Optional
+
+from asyncpg import Connection
+
+import config
+from app.db import queries as q
+from app.services.metrics import Counter
+
+INTENT_ROUTES = Counter(
+    "agent_intent_routes_total",
+    "Chat questions by route; intent is the template that answered, or agent",
+    label_names=("intent", "matched_by"),
+)
+
+_THAI = re.compile(r"[\u0E00-\u0E7F]")
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_TOP_N = re.compile(r"\btop\s*(\d{1,2})\b|อันดับ\s*(\d{1,2})|(\d{1,2})\s*อันดับ", re.I)
+_DIGITS = re.compile(r"\d")
+
+# Analysis, comparison or advice needs the agent even when a template topic matches.
+_OPEN_ENDED = re.compile(
+    r"\b(why|compare|compared|versus|vs|trend|recommend|suggest|predict|forecast|explain|average)\b"
+    r"|ทำไม|เทียบ|เปรียบ|แนวโน้ม|แนะนำ|คาดการณ์|วิเคราะห์|อธิบาย|เฉลี่ย",
+    re.I,
+)
+
+_PERIOD_WORDS = (
+    ("yesterday", re.compile(r"\byesterday\b|เมื่อวาน", re.I)),
+    ("today", re.compile(r"\btoday\b|วันนี้", re.I)),
+    ("week", re.compile(r"\bthis week\b|สัปดาห์นี้|อาทิตย์นี้", re.I)),
+    ("month", re.compile(r"\bthis month\b|เดือนนี้", re.I)),
+)
+
+# Time expressions the templates cannot resolve.
+_OTHER_TIME = re.compile(
+    r"\b(last|next|previous|past)\s+(\d+\s+)?(days?|weeks?|months?|years?)\b|\b(tomorrow|year|quarter)\b"
+    r"|\b(january|february|march|april|june|july|august|september|october|november|december)\b"
+    r"|พรุ่งนี้|ปีนี้|ปีที่แล้ว|ปีก่อน|เดือนที่แล้ว|เดือนก่อน|สัปดาห์ที่แล้ว|อาทิตย์ที่แล้ว|ไตรมาส"
+    r"|มกรา|กุมภา|มีนา|เมษา|พฤษภา|มิถุนา|กรกฎา|สิงหา|กันยา|ตุลา|พฤศจิกา|ธันวา",
+    re.I,
+)
+
+
+# Question and filler words any intent may contain.
+_COMMON_WORDS = (
+    "what", "whats", "which", "how", "much", "many", "is", "are", "was", "were", "do", "does",
+    "did", "we", "our", "us", "i", "the", "a", "an", "any", "there", "me", "show", "tell", "give",
+    "list", "in", "on", "at", "to", "for", "so", "far", "total", "all", "s", "please", "have",
+    "has", "had", "be", "get", "got", "now", "currently", "current",
+    "เท่าไหร่", "เท่าไร", "เท่าไหร", "กี่", "มี", "อะไร", "บ้าง", "ไหน", "ที่", "ได้", "ไหม", "มั้ย",
+    "ครับ", "ค่ะ", "คะ", "นะ", "หน่อย", "ขอ", "ดู", "ทั้งหมด", "รวม", "ตอนนี้", "แล้ว", "อยู่", "คือ",
+)
+
+_CONTENT_WORD = re.compile(r"[a-z]+|[\u0E00-\u0E7F]+")
+
+
+def _word_pattern(words: tuple[str, ...]) -> re.Pattern:
+    """Alternation over ``words``, longest first; English words match whole words only."""
+    ordered = sorted(words, key=len, reverse=True)
+    english = [re.escape(word) for word in ordered if not _THAI.search(word)]
+    thai = [re.escape(word) for word in ordered if _THAI.search(word)]
+    parts = ([r"\b(?:" + "|".join(english) + r")\b"] if english else []) + thai
+    return re.compile("|".join(parts), re.I)
+
+
+_COMMON = _word_pattern(_COMMON_WORDS)
+
+
+class Period:
+    __slots__ = ("start", "end", "kind")
+
+    def __init__(self, start: date, end: date, kind: str) -> None:
+        self.start = start
+        self.end = end
+        self.kind = kind
+
+    def label(self, thai: bool) -> str:
+        if self.start == self.end:
+            return f"วันที่ {self.start.isoformat()}" if thai else f"on {self.start.isoformat()}"
+        if thai:
+            return f"ช่วง {self.start.isoformat()} ถึง {self.end.isoformat()}"
+        return f"from {self.start.isoformat()} to {self.end.isoformat()}"
+
+
+class IntentAnswer:
+    __slots__ = ("intent", "text", "sql", "matched_by")
+
+    def __init__(self, intent: str, text: str, sql: str, matched_by: str) -> None:
+        self.intent = intent
+        self.text = text
+        self.sql = sql
+        self.matched_by = matched_by
+
+
+def _resolve_period(message: str, today: date, default: Optional[str]) -> Optional[Period]:
+    """The one time expression in the message (``default`` when none); None if unsupported."""
+    if _OTHER_TIME.search(message):
+        return None
+    dates = _ISO_DATE.findall(message)
+    kinds = [kind for kind, pattern in _PERIOD_WORDS if pattern.search(message)]
+    if len(dates) + len(kinds) > 1:
+        return None
+    if dates:
+        try:
+            day = date(*(int(part) for part in dates[0]))
+        except ValueError:
+            return None
+        return Period(day, day, "day")
+    if _DIGITS.search(_ISO_DATE.sub(" ", message)):
+        # "5 ต.ค.", "15/10" and the like are left to the agent.
+        return None
+
+    kind = kinds[0] if kinds else default
+    if kind is None:
+        return None
+    if kind == "yesterday":
+        day = today - timedelta(days=1)
+        return Period(day, day, "day")
+    if kind == "week":
+        return Period(today - timedelta(days=today.weekday()), today, "week")
+    if kind == "month":
+        return Period(today.replace(day=1), today, "month")
+    return Period(today, today, "day")
+
+
+def _money(value: Decimal | float | int) -> str:
+    return f"฿{float(value):,.2f}"
+
+
+def _quantity(value: Decimal | float | int) -> str:
+    text = f"{float(value):,.2f}"
+    return text.rstrip("0").rstrip(".")
+
+
+# ==================== Answers ====================
+
+
+async def _revenue(connection: Connection, message: str, period: Period, thai: bool) -> str:
+    total = await connection.fetchval(q.REVENUE_FOR_RANGE, period.start, period.end)
+    if thai:
+        return f"ยอดขาย{period.label(thai)} คือ {_money(total)}"
+    return f"Revenue {period.label(thai)} was {_money(total)}."
+
+
+async def _low_stock(connection: Connection, message: str, period: Period, thai: bool) -> str:
+    limit = config.INTENT_ROUTER["max_list_rows"]
+    rows = await connection.fetch(q.LOW_STOCK_ITEMS, limit + 1)
+    if not rows:
+        return "ไม่มีสินค้าที่สต็อกต่ำกว่าจุดสั่งซื้อ" if thai else "No items are at or below their restock threshold."
+
+    lines = []
+    for row in rows[:limit]:
+        name = f"{row['name']} ({row['variant_name']})" if row["variant_name"] else row["name"]
+        if thai:
+            lines.append(
+                f"- {name}: คงเหลือ {_quantity(row['current_qty'])} "
+                f"จุดสั่งซื้อ {_quantity(row['restock_threshold'])}"
+            )
+        else:
+            lines.append(
+                f"- {name}: {_quantity(row['current_qty'])} left, "
+                f"restock at {_quantity(row['restock_threshold'])}"
+            )
+    more = len(rows) > limit
+    if thai:
+        header = f"สินค้าที่สต็อกต่ำกว่าจุดสั่งซื้อ{' (แสดง ' + str(limit) + ' รายการแรก)' if more else ''}:"
+    else:
+        header = f"Items at or below their restock threshold{f' (first {limit})' if more else ''}:"
+    return "\n".join([header, *lines])
+
+
+async def _top_treatments(connection: Connection, message: str, period: Period, thai: bool) -> str:
+    match = _TOP_N.search(message)
+    limit = next((int(group) for group in match.groups() if group), 5) if match else 5
+    limit = max(1, min(limit, config.INTENT_ROUTER["max_list_rows"]))
+    rows = await connection.fetch(q.TOP_TREATMENTS, period.start, period.end, limit)
+    if not rows:
+        return f"ไม่มีการใช้ทรีตเมนต์{period.label(thai)}" if thai else f"No treatment sessions {period.label(thai)}."
+
+    if thai:
+        lines = [f"ทรีตเมนต์ยอดนิยม{period.label(thai)}:"]
+        lines += [f"{i}. {row['treatment_name']} ({row['count']} ครั้ง)" for i, row in enumerate(rows, 1)]
+    else:
+        lines = [f"Top treatments {period.label(thai)}:"]
+        lines += [f"{i}. {row['treatment_name']} ({row['count']} sessions)" for i, row in enumerate(rows, 1)]
+    return "\n".join(lines)
+
+
+async def _appointments(connection: Connection, message: str, period: Period, thai: bool) -> str:
+    row = await connection.fetchrow(q.APPOINTMENT_COUNTS_FOR_DATE, period.start)
+    if thai:
+        return (
+            f"นัดหมาย{period.label(thai)} ทั้งหมด {row['total']} รายการ "
+            f"(เสร็จแล้ว {row['complete']}, ยังไม่เสร็จ {row['incomplete']})"
+        )
+    return (
+        f"{row['total']} appointments {period.label(thai)} "
+        f"({row['complete']} complete, {row['incomplete']} incomplete)."
+    )
+
+
+Handler = Callable[[Connection, str, Period, bool], Awaitable[str]]
+
+
+class Intent:
+    __slots__ = (
+        "name", "pattern", "excludes", "vocabulary", "examples", "periods", "default_period", "handler", "sql"
+    )
+
+    def __init__(
+        self,
+        name: str,
+        pattern: str,
+        excludes: Optional[str],
+        vocabulary: tuple[str, ...],
+        examples: tuple[str, ...],
+        periods: tuple[str, ...],
+        default_period: str,
+        handler: Handler,
+        sql: str,
+    ) -> None:
+        self.name = name
+        self.pattern = re.compile(pattern, re.I)
+        # Narrowing the question (one item, one customer, ...) makes the template answer wrong.
+        self.excludes = re.compile(excludes, re.I) if excludes else None
+        # Words the template understands; anything else (a name, "target", ...) narrows the question.
+        self.vocabulary = _word_pattern(vocabulary)
+        self.examples = examples
+        self.periods = periods
+        self.default_period = default_period
+        self.handler = handler
+        self.sql = sql
+
+
+INTENTS = (
+    Intent(
+        "revenue",
+        r"ยอดขาย|รายได้|รายรับ|\b(revenue|sales|income|takings)\b",
+        r"ของ|สินค้า|ทรีตเมนต์|ทรีทเมนต์|ลูกค้า|พนักงาน|หมอ|โปร"
+        r"|\b(of|by|per|from)\b|\b(item|product|treatment|customer|staff|doctor|promotion)s?\b",
+        (
+            "ยอดขาย", "ยอด", "ขาย", "รายได้", "รายรับ",
+            "revenue", "sales", "income", "takings", "make", "made", "earn", "earned", "sell", "sold",
+        ),
+        (
+            "ยอดขายวันนี้เท่าไหร่",
+            "วันนี้ขายได้เท่าไร",
+            "รายได้เดือนนี้",
+            "how much did we make today",
+            "what is today's revenue",
+            "total sales this month",
+        ),
+        ("day", "week", "month"),
+        "today",
+        _revenue,
+        q.REVENUE_FOR_RANGE,
+    ),
+    Intent(
+        "low_stock",
+        r"สต็?๊?อกต่ำ|ใกล้หมด|ของหมด|สินค้าหมด|หมดสต็?๊?อก|ต้องสั่งเพิ่ม|\b(low stock|out of stock|running low|restock)\b",
+        # Yes/no questions about one item ("is botox low?", "are we out of filler?"),
+        # but not "which items are low" or "are any items running low".
+        r"^\s*(is|are|does|do)\b(?!.*\b(any|anything|something|there|items|products|what|which)\b)"
+        r"|ยังมี|เหลือกี่",
+        (
+            "สต็อก", "สต๊อก", "สตอก", "ต่ำ", "ใกล้หมด", "หมด", "ของ", "สินค้า", "ต้อง", "สั่ง", "เพิ่ม",
+            "low", "stock", "out", "of", "running", "restock", "reorder", "order", "need", "item", "items",
+            "product", "products", "inventory", "left",
+        ),
+        (
+            "สินค้าใกล้หมดมีอะไรบ้าง",
+            "ของที่ต้องสั่งเพิ่ม",
+            "สต็อกต่ำ",
+            "which items are low on stock",
+            "what do we need to reorder",
+            "items running low",
+        ),
+        ("day",),
+        "today",
+        _low_stock,
+        q.LOW_STOCK_ITEMS,
+    ),
+    Intent(
+        "top_treatments",
+        r"(ทรีตเมนต์|ทรีทเมนต์|treatments?|บริการ).*(ขายดี|ยอดนิยม|นิยม|มากที่สุด|บ่อยที่สุด)"
+        r"|(ขายดี|ยอดนิยม).*(ทรีตเมนต์|ทรีทเมนต์|treatments?|บริการ)"
+        r"|\b(top|popular|best[- ]selling|most popular|most booked)\b.*\btreatments?\b",
+        r"ลูกค้า|คุณ|พนักงาน|หมอ|\b(customer|client|staff|doctor|for)\b",
+        (
+            "ทรีตเมนต์", "ทรีทเมนต์", "บริการ", "ขายดี", "ยอดนิยม", "นิยม", "มากที่สุด", "บ่อยที่สุด",
+            "เยอะที่สุด", "ที่สุด", "เยอะ", "คน", "ทำ", "อันดับ",
+            "top", "popular", "best", "selling", "sell", "sells", "most", "booked", "treatment", "treatments",
+        ),
+        (
+            "ทรีตเมนต์ขายดีเดือนนี้",
+            "ทรีตเมนต์ยอดนิยม",
+            "บริการไหนคนทำเยอะที่สุด",
+            "top treatments this month",
+            "most popular treatments",
+            "which treatments sell best",
+        ),
+        ("day", "week", "month"),
+        "month",
+        _top_treatments,
+        q.TOP_TREATMENTS,
+    ),
+    Intent(
+        "appointments",
+        r"นัดหมาย|มีนัด|กี่นัด|คิว|\bappointments?\b",
+        r"ชื่อ|คุณ|หมอ|ทรีตเมนต์|\b(with|who|doctor|treatment)\b|\bfor\s+(?!today|yesterday)",
+        (
+            "นัดหมาย", "นัด", "คิว", "ลูกค้า", "คน",
+            "appointment", "appointments", "booking", "bookings", "busy", "schedule", "scheduled",
+        ),
+        (
+            "วันนี้มีนัดกี่คิว",
+            "นัดหมายวันนี้",
+            "มีลูกค้านัดกี่คน",
+            "how many appointments today",
+            "appointments for today",
+            "how busy is the schedule today",
+        ),
+        ("day",),
+        "today",
+        _appointments,
+        q.APPOINTMENT_COUNTS_FOR_DATE,
+    ),
+)
+
+
+# ==================== Classifier ====================
+
+
+def _trigrams(text: str) -> TermCounter:
+    cleaned = " ".join(re.sub(r"[^\w\u0E00-\u0E7F]+", " ", text.lower()).split())
+    padded = f" {cleaned} "
+    return TermCounter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a: TermCounter, b: TermCounter) -> float:
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    if not dot:
+        return 0.0
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm
+
+
+_EXAMPLE_VECTORS = [(intent, _trigrams(example)) for intent in INTENTS for example in intent.examples]
+
+
+def _narrowed(intent: Intent, message: str) -> bool:
+    """True when the message says something the intent's template cannot take into account."""
+    if intent.excludes is not None and intent.excludes.search(message):
+        return True
+    rest = message.lower()
+    for _, pattern in _PERIOD_WORDS:
+        rest = pattern.sub(" ", rest)
+    rest = _COMMON.sub(" ", intent.vocabulary.sub(" ", rest))
+    return bool(_CONTENT_WORD.search(rest))
+
+
+def classify(message: str) -> Optional[tuple[Intent, str]]:
+    """(intent, "pattern" | "model") for an unambiguous match, else None."""
+    matches = [intent for intent in INTENTS if intent.pattern.search(message)]
+    if any(intent.excludes is not None and intent.excludes.search(message) for intent in matches):
+        return None
+    if len(matches) == 1:
+        return (matches[0], "pattern") if not _narrowed(matches[0], message) else None
+    if matches:
+        return None
+
+    vector = _trigrams(message)
+    scores: dict[str, float] = {}
+    for intent, example in _EXAMPLE_VECTORS:
+        scores[intent.name] = max(scores.get(intent.name, 0.0), _cosine(vector, example))
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    best_name, best_score = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    settings = config.INTENT_ROUTER
+    if best_score < settings["min_similarity"] or best_score - runner_up < settings["min_margin"]:
+        return None
+    intent = next(intent for intent in INTENTS if intent.name == best_name)
+    if _narrowed(intent, message):
+        return None
+    return intent, "model"
+
+
+async def answer(
+    connection: Connection, message: str, today: Optional[date] = None
+) -> Optional[IntentAnswer]:
+    """Template answer for a recognised question; None means the SQL agent should handle it."""
+    settings = config.INTENT_ROUTER
+    text = " ".join(message.split())
+    if not settings["enabled"] or len(text) > settings["max_chars"] or _OPEN_ENDED.search(text):
+        INTENT_ROUTES.inc("agent", "none")
+        return None
+
+    match = classify(text)
+    if match is None:
+        INTENT_ROUTES.inc("agent", "none")
+        return None
+    intent, matched_by = match
+
+    period = _resolve_period(_TOP_N.sub(" ", text), today or date.today(), intent.default_period)
+    if period is None or period.kind not in intent.periods:
+        INTENT_ROUTES.inc("agent", "none")
+        return None
+
+    thai = bool(_THAI.search(text))
+    reply = await intent.handler(connection, text, period, thai)
+    INTENT_ROUTES.inc(intent.name, matched_by)
+    return IntentAnswer(intent.name, reply, intent.sql.strip(), matched_by)
@@ -0,0 +1,22 @@
+SUMMARY_PROMPT = """
+You maintain the running summary of a conversation between a Refine Haus Clinic staff member and LUMINA, the clinic's data assistant.
+
+Update the existing summary with the new turns below. Keep:
+- What the user asked about (customers, items, treatments, promotions, date ranges, filters)
+- Figures and names LUMINA reported, exactly as given
+- Open questions or follow-ups the user may refer back to
+
+Rules:
+- Write plain sentences, no markdown, no emojis
+- Keep the language the conversation uses (Thai or English)
+- Drop greetings and small talk
+- Stay under {max_tokens} tokens; compress the oldest details first
+
+Existing summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:
+"""
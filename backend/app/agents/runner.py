@@ -1,14 +1,19 @@
 import logging
+from typing import Optional
 
-from app.agents.sql_agent import get_sql_agent_executor
+from app.agents.context import AgentContext
 
 logger = logging.getLogger(__name__)
 
 
-def run_agent(message: str) -> str:
+def run_agent(message: str, context: Optional[AgentContext] = None) -> str:
+    # LangChain loads with the first question the intent router cannot answer.
+    from app.agents.sql_agent import get_sql_agent_executor
+
     sql_agent = get_sql_agent_executor()
+    agent_input = context.render(message) if context is not None else message
     try:
-        result = sql_agent.invoke({"input": message})
+        result = sql_agent.invoke({"input": agent_input})
     except Exception as exc:
         logger.error("SQL Agent error: %s", exc)
         raise
@@ -1,10 +1,15 @@
 import logging
 
-from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits import create_sql_agent
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
 
-from config import POSTGRES
+from config import AGENT_SQL
 from app.agents.prompts.system import SYSTEM_PROMPT
+from app.agents.sql_guard import GuardRejected, execute_guarded
+from app.db.postgres import build_database_url, register_pool
 from app.services.llm.open_ai import get_chat_llm
 
 logger = logging.getLogger(__name__)
@@ -12,25 +17,54 @@ logger = logging.getLogger(__name__)
 _sql_agent = None
 
 
-def _build_database_url() -> str:
-    missing = [key for key, value in POSTGRES.items() if not value]
-    if missing:
-        missing_keys = ", ".join(missing)
-        raise ValueError(f"Missing database config values: {missing_keys}")
+class GuardedSQLDatabase(SQLDatabase):
+    """SQLDatabase whose text queries (the agent's SQL tool) go through sql_guard.execute_guarded."""
+
+    def _execute(self, command, fetch="all", *, parameters=None, execution_options=None):
+        if not isinstance(command, str):
+            # SQLAlchemy constructs come from LangChain itself (schema/sample rows), not the model.
+            return super()._execute(
+                command, fetch, parameters=parameters, execution_options=execution_options
+            )
+        try:
+            return execute_guarded(self._engine, command, fetch)
+        except GuardRejected as exc:
+            # The SQL tool (run_no_throw) hands SQLAlchemyError text back to the agent.
+            raise SQLAlchemyError(str(exc)) from exc
+
 
-    return (
-        "postgresql://"
-        f"{POSTGRES['user']}:{POSTGRES['password']}"
-        f"@{POSTGRES['host']}:{POSTGRES['port']}/{POSTGRES['database']}"
+def _create_engine() -> Engine:
+    """Bounded pool for the agent, reported next to the asyncpg pool in db_pool_connections."""
+    engine = create_engine(
+        AGENT_SQL["database_url"] or build_database_url(),
+        pool_size=AGENT_SQL["pool_size"],
+        max_overflow=AGENT_SQL["max_overflow"],
+        pool_timeout=AGENT_SQL["pool_timeout_seconds"],
+        pool_recycle=AGENT_SQL["pool_recycle_seconds"],
+        pool_pre_ping=True,
+        # Read-only for the whole session, not just the guard's transaction, even on the primary.
+        connect_args={
+            "options": "-c default_transaction_read_only=on -c standard_conforming_strings=on"
+        },
+    )
+    pool = engine.pool
+    register_pool(
+        "agent",
+        lambda: {
+            "open": pool.checkedin() + pool.checkedout(),
+            "idle": pool.checkedin(),
+            "max": AGENT_SQL["pool_size"] + AGENT_SQL["max_overflow"],
+        },
     )
+    return engine
 
 
 def create_sql_agent_executor():
     logger.info("Initializing LangChain SQL Agent...")
     llm = get_chat_llm()
 
-    db = SQLDatabase.from_uri(
-        _build_database_url(),
+    db = GuardedSQLDatabase(
+        _create_engine(),
         include_tables=[
             "customer",
             "item_catalog",
@@ -0,0 +1,290 @@
+"""
+Guarded execution of SQL written by the chat agent.
+
+Every query the agent sends through its SQL tool is
+1. checked to be a single SELECT/WITH statement,
+2. wrapped in an outer LIMIT of AGENT_SQL["max_rows"] + 1 rows,
+3. planned with EXPLAIN and refused when the estimated total cost exceeds AGENT_SQL["max_cost"],
+4. run in a READ ONLY transaction with a local statement_timeout,
+on the AGENT_SQL["database_url"] connection (read-only role or replica) when one is configured,
+whose sessions also default to read-only transactions (sql_agent._create_engine).
+
+Refusals and timeouts reach the agent as tool errors (sql_agent.GuardedSQLDatabase),
+so it can rewrite the query instead of failing the question. Each attempt is counted
+in metrics, collected for the current question (question_scope) and stored in
+agent_query_log.
+"""
+
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Sequence
+
+from asyncpg import Connection
+
+import config
+from app.db import queries as q
+from app.services.metrics import Counter, Histogram
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+AGENT_QUERIES = Counter(
+    "agent_sql_queries_total",
+    "Agent SQL queries by outcome (OK, TRUNCATED, REJECTED, TIMEOUT, ERROR)",
+    label_names=("status",),
+)
+AGENT_QUERY_DURATION = Histogram(
+    "agent_sql_query_duration_seconds",
+    "Agent SQL time including the EXPLAIN pre-check",
+    label_names=("status",),
+)
+
+OK = "OK"
+TRUNCATED = "TRUNCATED"
+REJECTED = "REJECTED"
+TIMEOUT = "TIMEOUT"
+ERROR = "ERROR"
+
+_QUERY_CANCELED = "57014"
+_READ_STATEMENT = re.compile(r"^\s*(select|with)\b", re.I)
+_IDENTIFIER_CHAR = re.compile(r"[A-Za-z0-9_$]")
+_DOLLAR_TAG = re.compile(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+
+_question_stats: ContextVar[Optional[list["QueryStat"]]] = ContextVar(
+    "agent_question_stats", default=None
+)
+
+
+class GuardRejected(ValueError):
+    """Query refused by the guard; the message tells the agent how to fix it."""
+
+
+class QueryStat:
+    __slots__ = ("sql", "status", "estimated_cost", "row_count", "duration_ms", "error")
+
+    def __init__(self, sql: str) -> None:
+        self.sql = sql
+        self.status = ERROR
+        self.estimated_cost: Optional[float] = None
+        self.row_count: Optional[int] = None
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _skip_quoted(sql: str, start: int, quote: str, backslash_escapes: bool) -> int:
+    """Offset just past the literal or quoted identifier opening at ``start``."""
+    i = start + 1
+    while i < len(sql):
+        ch = sql[i]
+        if backslash_escapes and ch == "\\":
+            i += 2
+        elif ch == quote:
+            if sql[i + 1:i + 2] != quote:
+                return i + 1
+            i += 2
+        else:
+            i += 1
+    raise GuardRejected("Unterminated quoted string or identifier.")
+
+
+def _skip_block_comment(sql: str, start: int) -> int:
+    # Block comments nest in PostgreSQL.
+    depth, i = 0, start
+    while i < len(sql):
+        if sql.startswith("/*", i):
+            depth, i = depth + 1, i + 2
+        elif sql.startswith("*/", i):
+            depth, i = depth - 1, i + 2
+            if depth == 0:
+                return i
+        else:
+            i += 1
+    raise GuardRejected("Unterminated comment.")
+
+
+def _scan(sql: str) -> tuple[str, int, int]:
+    """
+    Tokenize left to right the way the server does, so whichever of a string,
+    E'' string, dollar quote, quoted identifier or comment starts first wins.
+
+    Returns the text with literals emptied and comments replaced by a space,
+    plus the offsets of the first top-level ';' in ``sql`` and in that text
+    (both the full length when there is none).
+    """
+    out: list[str] = []
+    out_length = 0
+    end: Optional[tuple[int, int]] = None
+    i = 0
+    while i < len(sql):
+        ch, following = sql[i], sql[i + 1:i + 2]
+        after_identifier = i > 0 and _IDENTIFIER_CHAR.match(sql[i - 1]) is not None
+        dollar = _DOLLAR_TAG.match(sql, i) if ch == "$" and not after_identifier else None
+        if ch == "-" and following == "-":
+            newline = sql.find("\n", i)
+            i, token = (len(sql) if newline < 0 else newline), " "
+        elif ch == "/" and following == "*":
+            i, token = _skip_block_comment(sql, i), " "
+        elif ch == "'":
+            # E'...' takes backslash escapes; the E must start its own token.
+            escapes = (
+                i > 0
+                and sql[i - 1] in "eE"
+                and (i < 2 or _IDENTIFIER_CHAR.match(sql[i - 2]) is None)
+            )
+            i, token = _skip_quoted(sql, i, "'", escapes), "''"
+        elif ch == '"':
+            i, token = _skip_quoted(sql, i, '"', False), '""'
+        elif dollar is not None:
+            close = sql.find(dollar.group(0), dollar.end())
+            if close < 0:
+                raise GuardRejected("Unterminated dollar-quoted string.")
+            i, token = close + len(dollar.group(0)), "''"
+        else:
+            if ch == ";" and end is None:
+                end = (i, out_length)
+            i, token = i + 1, ch
+        out.append(token)
+        out_length += len(token)
+    scrubbed = "".join(out)
+    if end is None:
+        end = (len(sql), len(scrubbed))
+    return scrubbed, end[0], end[1]
+
+
+def normalize_statement(sql: str) -> str:
+    """The first statement without its semicolon; raises GuardRejected unless the input is one SELECT/WITH."""
+    scrubbed, end, scrubbed_end = _scan(sql)
+    if scrubbed[scrubbed_end:].strip(" \t\r\n;"):
+        raise GuardRejected("Only one SQL statement per query is allowed.")
+    code = scrubbed[:scrubbed_end]
+    if not _READ_STATEMENT.match(code):
+        raise GuardRejected("Only SELECT queries are allowed.")
+
+    # The statement is wrapped in a subquery, so it must not close parentheses it did not open.
+    depth = 0
+    for ch in code:
+        if ch in "()":
+            depth += 1 if ch == "(" else -1
+            if depth < 0:
+                break
+    if depth != 0:
+        raise GuardRejected("Unbalanced parentheses in the query.")
+    return sql[:end].strip()
+
+
+def with_row_limit(statement: str, max_rows: int) -> str:
+    # One extra row tells a truncated result apart from one that fits exactly.
+    return f"SELECT * FROM (\n{statement}\n) AS agent_query LIMIT {max_rows + 1}"
+
+
+def _explain_cost(connection, sql: str) -> float:
+    from sqlalchemy import text
+
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def _record(stat: QueryStat) -> None:
+    AGENT_QUERIES.inc(stat.status)
+    AGENT_QUERY_DURATION.observe((stat.duration_ms or 0) / 1000, stat.status)
+    stats = _question_stats.get()
+    if stats is not None:
+        stats.append(stat)
+    if stat.status in (REJECTED, TIMEOUT, ERROR):
+        logger.info("Agent SQL %s: %s | %s", stat.status, stat.error, stat.sql)
+
+
+def execute_guarded(engine: "Engine", sql: str, fetch: str = "all") -> list[dict[str, Any]]:
+    # SQLAlchemy is only needed once the agent runs (see sql_agent.GuardedSQLDatabase).
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+
+    settings = config.AGENT_SQL
+    max_rows = settings["max_rows"]
+    timeout_ms = int(settings["statement_timeout_ms"])
+    stat = QueryStat(sql)
+    started = time.perf_counter()
+    try:
+        limited = with_row_limit(normalize_statement(sql), max_rows)
+        with engine.begin() as connection:
+            connection.execute(text("SET TRANSACTION READ ONLY"))
+            connection.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+
+            stat.estimated_cost = _explain_cost(connection, limited)
+            if stat.estimated_cost > settings["max_cost"]:
+                raise GuardRejected(
+                    f"Query is too expensive (estimated cost {stat.estimated_cost:.0f}, "
+                    f"limit {settings['max_cost']:.0f}). Filter by date or key columns, "
+                    "aggregate in SQL, or select fewer rows."
+                )
+            rows = [row._asdict() for row in connection.execute(text(limited)).fetchall()]
+
+        stat.status = TRUNCATED if len(rows) > max_rows else OK
+        rows = rows[:1] if fetch == "one" else rows[:max_rows]
+        stat.row_count = len(rows)
+        return rows
+    except GuardRejected as exc:
+        stat.status, stat.error = REJECTED, str(exc)
+        raise
+    except DBAPIError as exc:
+        stat.error = str(exc.orig)[:500]
+        if getattr(exc.orig, "pgcode", None) == _QUERY_CANCELED:
+            stat.status = TIMEOUT
+            raise GuardRejected(
+                f"Query exceeded the {timeout_ms} ms time limit. "
+                "Narrow it with filters or aggregate in SQL."
+            ) from exc
+        raise
+    finally:
+        stat.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        _record(stat)
+
+
+@contextmanager
+def question_scope() -> Iterator[list[QueryStat]]:
+    """Collects a QueryStat for every agent query run inside the block (one chat question)."""
+    stats: list[QueryStat] = []
+    token = _question_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _question_stats.reset(token)
+
+
+async def save_question_stats(
+    connection: Connection,
+    conversation_id: int,
+    message_id: Optional[int],
+    stats: Sequence[QueryStat],
+) -> None:
+    if not stats:
+        return
+    await connection.execute(
+        q.AGENT_QUERY_LOG_INSERT,
+        conversation_id,
+        message_id,
+        [stat.sql for stat in stats],
+        [stat.status for stat in stats],
+        [stat.estimated_cost for stat in stats],
+        [stat.row_count for stat in stats],
+        [stat.duration_ms for stat in stats],
+        [stat.error for stat in stats],
+    )
+    logger.info(
+        "Agent question in conversation %s: %d queries, %.0f ms, %s",
+        conversation_id,
+        len(stats),
+        sum(stat.duration_ms or 0 for stat in stats),
+        ",".join(stat.status for stat in stats),
+    )
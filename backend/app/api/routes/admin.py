@@ -0,0 +1,60 @@
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.db import profiling, queries
+from app.db.postgres import pool_report
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def _get_profiler() -> profiling.QueryProfiler:
+    if profiling.profiler is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Query profiling is disabled (set QUERY_PROFILING_ENABLED=true)",
+        )
+    return profiling.profiler
+
+
+@router.get("/queries")
+async def list_query_profiles(
+    sort: Literal["total_ms", "calls", "p50_ms", "p95_ms", "p99_ms", "max_ms", "slow_calls"] = Query(
+        "total_ms"
+    ),
+    limit: int = Query(50, ge=1, le=500),
+) -> dict:
+    """Statement fingerprints of this worker with call counts and latency percentiles."""
+    profiler = _get_profiler()
+    return {
+        "since": profiler.started_at.isoformat(),
+        "queries": profiler.summaries(sort=sort, limit=limit),
+    }
+
+
+@router.get("/queries/{fingerprint_id}")
+async def get_query_profile(fingerprint_id: str) -> dict:
+    """One fingerprint with its sampled EXPLAIN (ANALYZE, BUFFERS) plans."""
+    profile = _get_profiler().get(fingerprint_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Query fingerprint not found")
+    return profile
+
+
+@router.delete("/queries")
+async def reset_query_profiles() -> dict:
+    """Drop collected fingerprints and plans."""
+    _get_profiler().reset()
+    return {"success": True}
+
+
+@router.get("/statements")
+async def get_statement_cache() -> dict:
+    """Prepared-statement hit rates for the hot-query registry on this worker."""
+    return queries.cache_report()
+
+
+@router.get("/pools")
+async def get_pools() -> dict:
+    """Open, idle and maximum connections of every database pool on this worker."""
+    return pool_report()
@@ -2,7 +2,9 @@ import logging
 
 from fastapi import APIRouter, HTTPException
 
-from app.agents.sql_agent import get_sql_agent_executor
+from app.agents import intents
+from app.agents.context import AgentContext, build_context, estimate_tokens
+from app.agents.sql_guard import question_scope, save_question_stats
 from app.db.postgres import DataBasePool
 from app.schemas.chat import ChatRequest, SqlChatResponse
 
@@ -46,13 +48,24 @@ async def sql_chat(payload: ChatRequest) -> SqlChatResponse:
         else:
             conversation_id = payload.conversation_id
 
+        # Common dashboard questions are answered from templates without the agent.
+        intent_answer = await intents.answer(connection, payload.message)
+
+    # Outside the connection block: folding old turns into the summary calls a model.
+    if intent_answer is None and payload.conversation_id is not None:
+        context = await build_context(conversation_id)
+    else:
+        context = AgentContext()
+
+    async with pool.acquire() as connection:
         await connection.execute(
             """
-            INSERT INTO messages (conversation_id, role, content)
-            VALUES ($1, 'USER', $2)
+            INSERT INTO messages (conversation_id, role, content, token_count)
+            VALUES ($1, 'USER', $2, $3)
             """,
             conversation_id,
             payload.message,
+            estimate_tokens(payload.message),
         )
 
         title = _title_from_message(payload.message)
@@ -66,25 +79,35 @@ async def sql_chat(payload: ChatRequest) -> SqlChatResponse:
             title,
         )
 
-    try:
-        sql_agent = get_sql_agent_executor()
-        result = sql_agent.invoke({"input": payload.message})
-        response = result.get("output", "ขออภัย ไม่สามารถตอบคำถามได้")
-        sql_query = _extract_sql_query(result.get("intermediate_steps"))
-    except Exception as exc:
-        logger.error("SQL Agent error: %s", exc)
-        response = "เกิดข้อผิดพลาดในการประมวลผล"
-        sql_query = None
+    with question_scope() as query_stats:
+        if intent_answer is not None:
+            response = intent_answer.text
+            sql_query = intent_answer.sql
+        else:
+            try:
+                from app.agents.sql_agent import get_sql_agent_executor
+
+                sql_agent = get_sql_agent_executor()
+                result = sql_agent.invoke({"input": context.render(payload.message)})
+                response = result.get("output", "ขออภัย ไม่สามารถตอบคำถามได้")
+                sql_query = _extract_sql_query(result.get("intermediate_steps"))
+            except Exception as exc:
+                logger.error("SQL Agent error: %s", exc)
+                response = "เกิดข้อผิดพลาดในการประมวลผล"
+                sql_query = None
 
     async with pool.acquire() as connection:
-        await connection.execute(
+        message_id = await connection.fetchval(
             """
-            INSERT INTO messages (conversation_id, role, content)
-            VALUES ($1, 'SYSTEM', $2)
+            INSERT INTO messages (conversation_id, role, content, token_count)
+            VALUES ($1, 'SYSTEM', $2, $3)
+            RETURNING message_id
             """,
             conversation_id,
             response,
+            estimate_tokens(response),
         )
+        await save_question_stats(connection, conversation_id, message_id, query_stats)
 
     return SqlChatResponse(
         response=response,
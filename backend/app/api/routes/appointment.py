@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 
+import config
 from app.db.postgres import DataBasePool
 from app.schemas.appointment import (
     AppointmentCreateRequest,
@@ -7,12 +8,13 @@ from app.schemas.appointment import (
     AppointmentRow,
     AppointmentStatusUpdate,
 )
+from app.utils.fastjson import json_response
 
 router = APIRouter(prefix="/appointment", tags=["appointment"])
 
 
 @router.get("", response_model=AppointmentListResponse)
-async def list_appointments() -> AppointmentListResponse:
+async def list_appointments() -> AppointmentListResponse | Response:
     pool = await DataBasePool.get_pool()
     async with pool.acquire() as connection:
         rows = await connection.fetch(
@@ -30,6 +32,8 @@ async def list_appointments() -> AppointmentListResponse:
             """
         )
 
+    if config.FAST_JSON["enabled"]:
+        return json_response({"items": rows})
     return AppointmentListResponse(
         items=[AppointmentRow(**dict(row)) for row in rows]
     )
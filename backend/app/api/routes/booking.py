@@ -1,13 +1,40 @@
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
 from datetime import datetime
 from decimal import Decimal
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException, Response
 
+from app.db import queries as q
 from app.db.postgres import DataBasePool
 from app.schemas.booking import BookingRequest, BookingResponse
+from app.services.catalog import get_catalog
 
 router = APIRouter(prefix="/booking", tags=["booking"])
 
+# Idempotency-Key -> [lock, holders]. Duplicates that reach this worker queue here
+# without holding a pooled connection; the advisory lock covers other workers.
+_inflight_keys: dict[str, list] = {}
+
+
+@asynccontextmanager
+async def _inflight(idempotency_key: Optional[str]) -> AsyncIterator[None]:
+    if idempotency_key is None:
+        yield
+        return
+    entry = _inflight_keys.setdefault(idempotency_key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _inflight_keys[idempotency_key]
+
+
 def _compare_numeric(lhs: Decimal | None, op: str, rhs: Decimal | None) -> bool:
     if lhs is None or rhs is None:
         return False
@@ -27,44 +54,27 @@ async def _promotion_rules_satisfied(
     customer_id: int,
 ) -> bool:
     group_count = await connection.fetchval(
-        """
-        SELECT COUNT(*)
-        FROM promotion_condition_group
-        WHERE promotion_id = $1
-        """,
+        q.PROMOTION_GROUP_COUNT,
         promotion_id,
     )
     if not group_count:
         return True
 
     invoice_total = await connection.fetchval(
-        """
-        SELECT COALESCE(SUM(total_price), 0)
-        FROM sell_invoice_item
-        WHERE sell_invoice_id = $1
-        """,
+        q.INVOICE_ITEMS_TOTAL,
         sell_invoice_id,
     )
     invoice_total = Decimal(invoice_total or 0)
 
     groups = await connection.fetch(
-        """
-        SELECT condition_group_id
-        FROM promotion_condition_group
-        WHERE promotion_id = $1
-        ORDER BY sort_order
-        """,
+        q.PROMOTION_GROUPS,
         promotion_id,
     )
 
     for group in groups:
         group_ok = True
         rules = await connection.fetch(
-            """
-            SELECT rule_type, op, amount_value, item_id, qty_base_unit
-            FROM promotion_condition_rule
-            WHERE condition_group_id = $1
-            """,
+            q.PROMOTION_GROUP_RULES,
             group["condition_group_id"],
         )
 
@@ -81,14 +91,7 @@ async def _promotion_rules_satisfied(
                     rule_ok = False
                 else:
                     has_item = await connection.fetchval(
-                        """
-                        SELECT EXISTS (
-                          SELECT 1
-                          FROM sell_invoice_item
-                          WHERE sell_invoice_id = $1
-                            AND item_id = $2
-                        )
-                        """,
+                        q.INVOICE_HAS_ITEM,
                         sell_invoice_id,
                         rule["item_id"],
                     )
@@ -98,12 +101,7 @@ async def _promotion_rules_satisfied(
                     rule_ok = False
                 else:
                     item_qty = await connection.fetchval(
-                        """
-                        SELECT COALESCE(SUM(qty), 0)
-                        FROM sell_invoice_item
-                        WHERE sell_invoice_id = $1
-                          AND item_id = $2
-                        """,
+                        q.INVOICE_ITEM_QTY,
                         sell_invoice_id,
                         rule["item_id"],
                     )
@@ -114,24 +112,14 @@ async def _promotion_rules_satisfied(
                     )
             elif rule_type == "NEW_CUSTOMER_ONLY":
                 prior_invoices = await connection.fetchval(
-                    """
-                    SELECT COUNT(*)
-                    FROM sell_invoice
-                    WHERE customer_id = $1
-                      AND sell_invoice_id <> $2
-                    """,
+                    q.CUSTOMER_OTHER_INVOICE_COUNT,
                     customer_id,
                     sell_invoice_id,
                 )
                 rule_ok = (prior_invoices or 0) == 0
             elif rule_type == "MIN_WALLET_TOPUP":
                 wallet_topup = await connection.fetchval(
-                    """
-                    SELECT COALESCE(SUM(amount), 0)
-                    FROM wallet_movement
-                    WHERE customer_id = $1
-                      AND amount > 0
-                    """,
+                    q.CUSTOMER_WALLET_TOPUP,
                     customer_id,
                 )
                 rule_ok = _compare_numeric(
@@ -157,22 +145,13 @@ async def _apply_promotion_benefits(
     promotion_redemption_id: int,
 ):
     invoice_total = await connection.fetchval(
-        """
-        SELECT COALESCE(SUM(total_price), 0)
-        FROM sell_invoice_item
-        WHERE sell_invoice_id = $1
-        """,
+        q.INVOICE_ITEMS_TOTAL,
         sell_invoice_id,
     )
     invoice_total = Decimal(invoice_total or 0)
 
     benefits = await connection.fetch(
-        """
-        SELECT promotion_benefit_id, benefit_type, target_scope, target_item_id,
-               value_percent, value_amount, free_item_id, free_qty_base_unit
-        FROM promotion_benefit
-        WHERE promotion_id = $1
-        """,
+        q.PROMOTION_BENEFITS,
         promotion_id,
     )
 
@@ -180,12 +159,7 @@ async def _apply_promotion_benefits(
         target_total = invoice_total
         if benefit["target_scope"] != "INVOICE_TOTAL":
             target_total = await connection.fetchval(
-                """
-                SELECT COALESCE(SUM(total_price), 0)
-                FROM sell_invoice_item
-                WHERE sell_invoice_id = $1
-                  AND item_id = $2
-                """,
+                q.INVOICE_ITEM_TOTAL,
                 sell_invoice_id,
                 benefit["target_item_id"],
             )
@@ -198,18 +172,7 @@ async def _apply_promotion_benefits(
             discount_amount = (target_total * Decimal(benefit["value_percent"]) / 100).quantize(Decimal("0.01"))
             if discount_amount > 0:
                 await connection.execute(
-                    """
-                    INSERT INTO sell_invoice_promotion_line (
-                      sell_invoice_id,
-                      promotion_redemption_id,
-                      promotion_id,
-                      promotion_benefit_id,
-                      line_type,
-                      amount,
-                      created_at
-                    )
-                    VALUES ($1, $2, $3, $4, 'DISCOUNT', $5, now())
-                    """,
+                    q.INSERT_DISCOUNT_LINE,
                     sell_invoice_id,
                     promotion_redemption_id,
                     promotion_id,
@@ -222,18 +185,7 @@ async def _apply_promotion_benefits(
             discount_amount = min(Decimal(benefit["value_amount"]), target_total)
             if discount_amount > 0:
                 await connection.execute(
-                    """
-                    INSERT INTO sell_invoice_promotion_line (
-                      sell_invoice_id,
-                      promotion_redemption_id,
-                      promotion_id,
-                      promotion_benefit_id,
-                      line_type,
-                      amount,
-                      created_at
-                    )
-                    VALUES ($1, $2, $3, $4, 'DISCOUNT', $5, now())
-                    """,
+                    q.INSERT_DISCOUNT_LINE,
                     sell_invoice_id,
                     promotion_redemption_id,
                     promotion_id,
@@ -246,20 +198,7 @@ async def _apply_promotion_benefits(
             if not free_item_id or free_qty <= 0:
                 continue
             await connection.execute(
-                """
-                INSERT INTO sell_invoice_promotion_line (
-                  sell_invoice_id,
-                  promotion_redemption_id,
-                  promotion_id,
-                  promotion_benefit_id,
-                  line_type,
-                  amount,
-                  free_item_id,
-                  free_qty_base_unit,
-                  created_at
-                )
-                VALUES ($1, $2, $3, $4, 'FREE_ITEM', 0, $5, $6, now())
-                """,
+                q.INSERT_FREE_ITEM_LINE,
                 sell_invoice_id,
                 promotion_redemption_id,
                 promotion_id,
@@ -268,17 +207,7 @@ async def _apply_promotion_benefits(
                 free_qty,
             )
             await connection.execute(
-                """
-                INSERT INTO stock_movement (
-                  created_at,
-                  item_id,
-                  movement_type,
-                  qty,
-                  sell_invoice_id,
-                  purchase_invoice_id
-                )
-                VALUES (now(), $1, 'USE_FOR_PROMOTION', $2, $3, NULL)
-                """,
+                q.INSERT_PROMOTION_STOCK_MOVEMENT,
                 free_item_id,
                 -free_qty,
                 sell_invoice_id,
@@ -293,19 +222,7 @@ async def _apply_promotion_benefits(
             if credit_amount <= 0:
                 continue
             await connection.execute(
-                """
-                INSERT INTO sell_invoice_promotion_line (
-                  sell_invoice_id,
-                  promotion_redemption_id,
-                  promotion_id,
-                  promotion_benefit_id,
-                  line_type,
-                  amount,
-                  wallet_credit_amount,
-                  created_at
-                )
-                VALUES ($1, $2, $3, $4, 'WALLET_CREDIT', 0, $5, now())
-                """,
+                q.INSERT_WALLET_CREDIT_LINE,
                 sell_invoice_id,
                 promotion_redemption_id,
                 promotion_id,
@@ -316,23 +233,46 @@ async def _apply_promotion_benefits(
 
 
 @router.post("", response_model=BookingResponse)
-async def create_booking(request: BookingRequest) -> BookingResponse:
+async def create_booking(
+    request: BookingRequest,
+    response: Response,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", min_length=1, max_length=255),
+) -> BookingResponse:
     """
     Create a new booking and save to database.
     Supports multiple treatments in a single booking.
     Inserts into sell_invoice, sell_invoice_item, and treatment_session tables.
+
+    With an Idempotency-Key header the booking is made at most once per key:
+    a retry (or a concurrent duplicate, which waits for the first) gets the
+    original response with ``Idempotent-Replayed: true``. Failed bookings are
+    not recorded, so retrying them runs the booking again.
     """
     pool = await DataBasePool.get_pool()
+    request_hash = hashlib.sha256(request.model_dump_json().encode()).hexdigest()
 
     try:
-        async with pool.acquire() as connection:
+        async with _inflight(idempotency_key), pool.acquire() as connection:
             async with connection.transaction():
+                # 0. Replay a booking already completed with this key
+                if idempotency_key is not None:
+                    await connection.execute(q.BOOKING_IDEMPOTENCY_LOCK, idempotency_key)
+                    stored = await connection.fetchrow(q.BOOKING_IDEMPOTENCY_GET, idempotency_key)
+                    if stored:
+                        if stored["request_hash"] != request_hash:
+                            raise HTTPException(
+                                status_code=422,
+                                detail="Idempotency-Key was already used for a different booking",
+                            )
+                        response.headers["Idempotent-Replayed"] = "true"
+                        return BookingResponse.model_validate_json(stored["response"])
+
                 # 1. Find or create customer
                 customer_id = None
                 if request.customer_id:
                     # Try to find existing customer by customer_code
                     customer = await connection.fetchrow(
-                        "SELECT customer_id FROM customer WHERE customer_code = $1",
+                        q.CUSTOMER_ID_BY_CODE,
                         request.customer_id,
                     )
                     if customer:
@@ -341,21 +281,13 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
                 # If no customer found, create a new one
                 if not customer_id:
                     customer_id = await connection.fetchval(
-                        """
-                        INSERT INTO customer (full_name, member_wallet_remain)
-                        VALUES ($1, 0)
-                        RETURNING customer_id
-                        """,
+                        q.INSERT_BOOKING_CUSTOMER,
                         request.customer_name,
                     )
 
                 # 2. Create sell_invoice
                 sell_invoice_id = await connection.fetchval(
-                    """
-                    INSERT INTO sell_invoice (customer_id, issue_at, total_amount, discount_amount, final_amount, status)
-                    VALUES ($1, $2, $3, 0, $3, 'PAID')
-                    RETURNING sell_invoice_id
-                    """,
+                    q.INSERT_SELL_INVOICE,
                     customer_id,
                     datetime.now(),
                     request.total_amount,
@@ -363,7 +295,7 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
 
                 # 3. Get invoice_no
                 invoice_no = await connection.fetchval(
-                    "SELECT invoice_no FROM sell_invoice WHERE sell_invoice_id = $1",
+                    q.SELL_INVOICE_NO,
                     sell_invoice_id,
                 )
 
@@ -379,26 +311,16 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
                     session_time = datetime.now().time().replace(second=0, microsecond=0)
 
                 # 5. Create sell_invoice_item and treatment_session for each treatment
+                catalog = await get_catalog(connection)
                 for treatment in request.treatments:
                     item_total = treatment.price * treatment.quantity
-                    qty_per_session = await connection.fetchval(
-                        """
-                        SELECT qty_per_session
-                        FROM treatment_recipe
-                        WHERE treatment_id = $1
-                        LIMIT 1
-                        """,
-                        treatment.treatment_id,
-                    )
+                    qty_per_session = catalog.qty_per_session(treatment.treatment_id)
                     qty_per_session = 1 if qty_per_session is None else qty_per_session
                     line_qty = int(treatment.quantity * qty_per_session)
 
                     # Insert into sell_invoice_item
                     await connection.execute(
-                        """
-                        INSERT INTO sell_invoice_item (item_id, sell_invoice_id, description, qty, total_price)
-                        VALUES ($1, $2, $3, $4, $5)
-                        """,
+                        q.INSERT_SELL_INVOICE_ITEM,
                         treatment.treatment_id,
                         sell_invoice_id,
                         None,
@@ -408,17 +330,7 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
 
                     # Insert into treatment_session
                     await connection.execute(
-                        """
-                        INSERT INTO treatment_session (
-                          treatment_id,
-                          sell_invoice_id,
-                          customer_id,
-                          session_date,
-                          session_time,
-                          note
-                        )
-                        VALUES ($1, $2, $3, $4, $5, $6)
-                        """,
+                        q.INSERT_TREATMENT_SESSION,
                         treatment.treatment_id,
                         sell_invoice_id,
                         customer_id,
@@ -431,21 +343,12 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
                 promotion_ids = list({int(pid) for pid in (request.promotions or [])})
                 for promotion_id in promotion_ids:
                     is_stackable = await connection.fetchval(
-                        "SELECT is_stackable FROM promotion WHERE promotion_id = $1",
+                        q.PROMOTION_IS_STACKABLE,
                         promotion_id,
                     )
                     if is_stackable is False:
                         conflict = await connection.fetchval(
-                            """
-                            SELECT EXISTS (
-                              SELECT 1
-                              FROM sell_invoice_promotion_line sip
-                              JOIN promotion p ON p.promotion_id = sip.promotion_id
-                              WHERE sip.sell_invoice_id = $1
-                                AND p.is_stackable = false
-                                AND sip.promotion_id <> $2
-                            )
-                            """,
+                            q.PROMOTION_STACK_CONFLICT,
                             sell_invoice_id,
                             promotion_id,
                         )
@@ -458,16 +361,7 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
                         continue
 
                     promotion_redemption_id = await connection.fetchval(
-                        """
-                        INSERT INTO promotion_redemption (
-                          promotion_id,
-                          sell_invoice_id,
-                          customer_id,
-                          coupon_code_used
-                        )
-                        VALUES ($1, $2, $3, NULL)
-                        RETURNING promotion_redemption_id
-                        """,
+                        q.INSERT_PROMOTION_REDEMPTION,
                         promotion_id,
                         sell_invoice_id,
                         customer_id,
@@ -482,43 +376,43 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
 
                 # 7. Refresh sell_invoice totals from items + promo lines
                 items_total = await connection.fetchval(
-                    """
-                    SELECT COALESCE(SUM(total_price), 0)
-                    FROM sell_invoice_item
-                    WHERE sell_invoice_id = $1
-                    """,
+                    q.INVOICE_ITEMS_TOTAL,
                     sell_invoice_id,
                 )
                 discount_total = await connection.fetchval(
-                    """
-                    SELECT COALESCE(SUM(CASE WHEN amount < 0 THEN -amount ELSE 0 END), 0)
-                    FROM sell_invoice_promotion_line
-                    WHERE sell_invoice_id = $1
-                    """,
+                    q.INVOICE_DISCOUNT_TOTAL,
                     sell_invoice_id,
                 )
                 items_total = Decimal(items_total or 0)
                 discount_total = Decimal(discount_total or 0)
                 await connection.execute(
-                    """
-                    UPDATE sell_invoice
-                    SET total_amount = $2,
-                        discount_amount = $3,
-                        final_amount = $4
-                    WHERE sell_invoice_id = $1
-                    """,
+                    q.UPDATE_SELL_INVOICE_TOTALS,
                     sell_invoice_id,
                     items_total,
                     discount_total,
                     items_total - discount_total,
                 )
 
-        return BookingResponse(
-            success=True,
-            invoice_no=invoice_no,
-            sell_invoice_id=sell_invoice_id,
-        )
+                result = BookingResponse(
+                    success=True,
+                    invoice_no=invoice_no,
+                    sell_invoice_id=sell_invoice_id,
+                )
+
+                # 8. Record the key in the same transaction as the invoice it created
+                if idempotency_key is not None:
+                    await connection.execute(
+                        q.BOOKING_IDEMPOTENCY_INSERT,
+                        idempotency_key,
+                        request_hash,
+                        sell_invoice_id,
+                        result.model_dump_json(),
+                    )
+
+        return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         return BookingResponse(
             success=False,
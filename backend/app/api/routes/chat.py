@@ -1,6 +1,10 @@
 from fastapi import APIRouter, HTTPException, Query
 
+from app.agents import intents
+from app.agents.context import AgentContext, build_context, estimate_tokens
 from app.agents.runner import run_agent
+from app.agents.sql_guard import question_scope, save_question_stats
+from app.db import queries as q
 from app.db.postgres import DataBasePool
 from app.schemas.chat import (
     ChatRequest,
@@ -26,18 +30,7 @@ async def list_conversations(
     pool = await DataBasePool.get_pool()
     async with pool.acquire() as connection:
         if search:
-            rows = await connection.fetch(
-                """
-                SELECT DISTINCT c.conversation_id, c.title, c.updated_at
-                FROM conversations c
-                JOIN messages m
-                  ON m.conversation_id = c.conversation_id
-                WHERE m.content ILIKE $1
-                ORDER BY c.updated_at DESC
-                LIMIT 50
-                """,
-                f"%{search}%",
-            )
+            rows = await connection.fetch(q.CONVERSATIONS_MATCHING, f"%{search}%")
         else:
             rows = await connection.fetch(
                 """
@@ -51,18 +44,25 @@ async def list_conversations(
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=list[MessageItem])
-async def list_messages(conversation_id: int) -> list[MessageItem]:
+async def list_messages(
+    conversation_id: int,
+    before_id: int | None = Query(default=None, ge=1),
+    after_id: int | None = Query(default=None, ge=0),
+    limit: int = Query(default=50, ge=1, le=200),
+) -> list[MessageItem]:
+    """
+    One keyset page, oldest-first. No cursor returns the newest ``limit`` messages;
+    ``before_id`` pages back through history, ``after_id`` fetches what was added since.
+    """
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id, not both")
+
     pool = await DataBasePool.get_pool()
     async with pool.acquire() as connection:
-        rows = await connection.fetch(
-            """
-            SELECT message_id, role, content, created_at
-            FROM messages
-            WHERE conversation_id = $1
-            ORDER BY created_at ASC, message_id ASC
-            """,
-            conversation_id,
-        )
+        if after_id is not None:
+            rows = await connection.fetch(q.MESSAGES_AFTER, conversation_id, after_id, limit)
+        else:
+            rows = await connection.fetch(q.MESSAGES_BEFORE, conversation_id, before_id, limit)
     return [MessageItem(**dict(row)) for row in rows]
 
 
@@ -80,13 +80,24 @@ async def chat(payload: ChatRequest) -> ChatResponse:
         else:
             conversation_id = payload.conversation_id
 
+        # Common dashboard questions are answered from templates without the agent.
+        intent_answer = await intents.answer(connection, payload.message)
+
+    # Outside the connection block: folding old turns into the summary calls a model.
+    if intent_answer is None and payload.conversation_id is not None:
+        context = await build_context(conversation_id)
+    else:
+        context = AgentContext()
+
+    async with pool.acquire() as connection:
         await connection.execute(
             """
-            INSERT INTO messages (conversation_id, role, content)
-            VALUES ($1, 'USER', $2)
+            INSERT INTO messages (conversation_id, role, content, token_count)
+            VALUES ($1, 'USER', $2, $3)
             """,
             conversation_id,
             payload.message,
+            estimate_tokens(payload.message),
         )
 
         title = _title_from_message(payload.message)
@@ -100,15 +111,23 @@ async def chat(payload: ChatRequest) -> ChatResponse:
             title,
         )
 
-        response = run_agent(payload.message)
+    with question_scope() as query_stats:
+        if intent_answer is not None:
+            response = intent_answer.text
+        else:
+            response = run_agent(payload.message, context)
 
-        await connection.execute(
+    async with pool.acquire() as connection:
+        message_id = await connection.fetchval(
             """
-            INSERT INTO messages (conversation_id, role, content)
-            VALUES ($1, 'SYSTEM', $2)
+            INSERT INTO messages (conversation_id, role, content, token_count)
+            VALUES ($1, 'SYSTEM', $2, $3)
+            RETURNING message_id
             """,
             conversation_id,
             response,
+            estimate_tokens(response),
         )
+        await save_question_stats(connection, conversation_id, message_id, query_stats)
 
     return ChatResponse(response=response, conversation_id=conversation_id)
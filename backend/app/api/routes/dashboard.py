@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from decimal import Decimal
 from datetime import date, timedelta
 
-from app.db.postgres import DataBasePool
+import config
+from app.db import queries as q
+from app.db.postgres import DataBasePool, fan_out
+from app.services.stock import snapshot_daily_stock
+from app.utils.fastjson import json_response
 from app.schemas.dashboard import (
     StatsCard,
     RevenueDataPoint,
@@ -17,6 +21,7 @@ from app.schemas.dashboard import (
     OutOfStockResponse,
     DailyStockRow,
     DailyStockResponse,
+    DailyStockSnapshotResponse,
     CompletedTodayRow,
     CompletedTodayResponse,
     ExpiringItemRow,
@@ -34,61 +39,23 @@ async def get_stats(
     selected_date = target_date or date.today()
     prev_date = selected_date - timedelta(days=1)
 
-    pool = await DataBasePool.get_pool()
-    async with pool.acquire() as conn:
-        # Revenue for selected date
-        revenue_today = await conn.fetchval(
-            """
-            SELECT COALESCE(SUM(final_amount), 0)
-            FROM sell_invoice
-            WHERE DATE(issue_at) = $1 AND status = 'PAID'
-            """,
-            selected_date,
-        )
-
-        # Revenue previous day (for comparison)
-        revenue_yesterday = await conn.fetchval(
-            """
-            SELECT COALESCE(SUM(final_amount), 0)
-            FROM sell_invoice
-            WHERE DATE(issue_at) = $1 AND status = 'PAID'
-            """,
-            prev_date,
-        )
-
-        # Appointments for selected date
-        appointments_row = await conn.fetchrow(
-            """
-            SELECT
-                COUNT(*) AS total,
-                COUNT(*) FILTER (WHERE appointment_status = 'INCOMPLETE') AS incomplete,
-                COUNT(*) FILTER (WHERE appointment_status = 'COMPLETE') AS complete
-            FROM appointment
-            WHERE DATE(appointment_time) = $1
-            """,
-            selected_date,
-        )
-
-        # Promotions used on selected date
-        promo_row = await conn.fetchrow(
-            """
-            SELECT
-                COUNT(*) AS usage_count,
-                COALESCE(SUM(discount_total), 0) AS total_discount
-            FROM promotion_redemption
-            WHERE DATE(redeemed_at) = $1
-            """,
-            selected_date,
-        )
-
+    # Independent cards: run them on parallel pooled connections.
+    (
+        revenue_today,
+        revenue_yesterday,
+        appointments_row,
+        promo_row,
+        out_of_stock,
+    ) = await fan_out(
+        # Revenue for selected date, and the previous day for comparison
+        lambda conn: conn.fetchval(q.REVENUE_FOR_DATE, selected_date),
+        lambda conn: conn.fetchval(q.REVENUE_FOR_DATE, prev_date),
+        # Appointments and promotions used on selected date
+        lambda conn: conn.fetchrow(q.APPOINTMENT_COUNTS_FOR_DATE, selected_date),
+        lambda conn: conn.fetchrow(q.PROMOTIONS_USED_FOR_DATE, selected_date),
         # Out of stock count (current, not date-specific)
-        out_of_stock = await conn.fetchval(
-            """
-            SELECT COUNT(*)
-            FROM item_catalog
-            WHERE current_qty <= 0
-            """
-        )
+        lambda conn: conn.fetchval(q.OUT_OF_STOCK_COUNT),
+    )
 
     # Calculate change percent
     change_percent = None
@@ -207,23 +174,7 @@ async def get_top_treatments(
 
     pool = await DataBasePool.get_pool()
     async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """
-            SELECT
-                ts.treatment_id,
-                t.name AS treatment_name,
-                COUNT(*) AS count
-            FROM treatment_session ts
-            JOIN treatment t ON ts.treatment_id = t.treatment_id
-            WHERE DATE(ts.session_date) >= $1 AND DATE(ts.session_date) <= $2
-            GROUP BY ts.treatment_id, t.name
-            ORDER BY count DESC
-            LIMIT $3
-            """,
-            start_date,
-            selected_date,
-            limit,
-        )
+        rows = await conn.fetch(q.TOP_TREATMENTS, start_date, selected_date, limit)
 
     return TopTreatmentsResponse(
         treatments=[TopTreatmentRow(**dict(row)) for row in rows]
@@ -300,7 +251,7 @@ async def get_out_of_stock() -> OutOfStockResponse:
 @router.get("/daily-stock", response_model=DailyStockResponse)
 async def get_daily_stock(
     target_date: date | None = Query(None, description="Target date (default: today)"),
-) -> DailyStockResponse:
+) -> DailyStockResponse | Response:
     """Get daily stock for a specific date with comparison to previous day."""
     selected_date = target_date or date.today()
     prev_date = selected_date - timedelta(days=1)
@@ -315,7 +266,8 @@ async def get_daily_stock(
                 ic.name,
                 ic.variant_name,
                 CAST(ds.qty AS INTEGER) AS qty,
-                CAST(prev.qty AS INTEGER) AS prev_qty
+                CAST(prev.qty AS INTEGER) AS prev_qty,
+                CAST(ds.qty AS INTEGER) - CAST(prev.qty AS INTEGER) AS change
             FROM daily_stock ds
             JOIN item_catalog ic ON ds.item_id = ic.item_id
             LEFT JOIN daily_stock prev ON ds.item_id = prev.item_id AND prev.stock_date = $2
@@ -326,12 +278,20 @@ async def get_daily_stock(
             prev_date,
         )
 
+    if config.FAST_JSON["enabled"]:
+        return json_response({
+            "items": rows,
+            "total": len(rows),
+            # Count items with low stock (qty <= 10)
+            "low_stock_count": sum(1 for row in rows if row["qty"] <= 10),
+            "stock_date": selected_date,
+        })
+
     items = []
     low_stock_count = 0
     for row in rows:
         qty = row["qty"]
         prev_qty = row["prev_qty"]
-        change = (qty - prev_qty) if prev_qty is not None else None
         # Count items with low stock (qty <= 10)
         if qty <= 10:
             low_stock_count += 1
@@ -343,7 +303,7 @@ async def get_daily_stock(
                 variant_name=row["variant_name"],
                 qty=qty,
                 prev_qty=prev_qty,
-                change=change,
+                change=row["change"],
             )
         )
 
@@ -355,6 +315,26 @@ async def get_daily_stock(
     )
 
 
+@router.post("/daily-stock/snapshot", response_model=DailyStockSnapshotResponse)
+async def backfill_daily_stock(
+    date_from: date = Query(..., description="First day to snapshot"),
+    date_to: date | None = Query(None, description="Last day to snapshot (default: date_from)"),
+) -> DailyStockSnapshotResponse:
+    """Recompute daily_stock for a date range in one windowed pass."""
+    end_date = date_to or date_from
+    if end_date < date_from:
+        raise HTTPException(status_code=400, detail="date_to must not be before date_from")
+    if (end_date - date_from).days > 366:
+        raise HTTPException(status_code=400, detail="Range is limited to 366 days per call")
+
+    rows_written = await snapshot_daily_stock(date_from, end_date)
+    return DailyStockSnapshotResponse(
+        date_from=date_from,
+        date_to=end_date,
+        rows_written=rows_written,
+    )
+
+
 @router.get("/completed-today", response_model=CompletedTodayResponse)
 async def get_completed_today(
     target_date: date | None = Query(None, description="Target date (default: today)"),
@@ -400,33 +380,43 @@ async def get_expiring_items(
     days_ahead: int = Query(90, ge=1, le=365, description="Days ahead to check for expiration"),
     limit: int = Query(20, ge=1, le=50),
 ) -> ExpiringItemsResponse:
-    """Get items that are expiring soon or already expired relative to target_date."""
+    """Get lots that are expiring soon or already expired relative to target_date."""
     selected_date = target_date or date.today()
     future_date = selected_date + timedelta(days=days_ahead)
 
-    pool = await DataBasePool.get_pool()
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
+    # Only lots with stock left; both queries are served by the partial expire_date index.
+    rows, expired = await fan_out(
+        lambda conn: conn.fetch(
             """
             SELECT
-                pii.item_id,
+                sl.item_id,
                 ic.sku,
                 ic.name,
                 ic.variant_name,
-                pii.expire_date,
-                pii.qty
-            FROM purchase_invoice_item pii
-            JOIN item_catalog ic ON pii.item_id = ic.item_id
-            WHERE pii.expire_date IS NOT NULL
-                AND pii.expire_date > $1
-                AND pii.expire_date <= $2
-            ORDER BY pii.expire_date ASC
+                sl.expire_date,
+                CAST(sl.qty_remaining AS INTEGER) AS qty
+            FROM stock_lot sl
+            JOIN item_catalog ic ON sl.item_id = ic.item_id
+            WHERE sl.qty_remaining > 0
+                AND sl.expire_date > $1
+                AND sl.expire_date <= $2
+            ORDER BY sl.expire_date ASC
             LIMIT $3
             """,
             selected_date,
             future_date,
             limit,
-        )
+        ),
+        lambda conn: conn.fetchval(
+            """
+            SELECT COUNT(*)
+            FROM stock_lot
+            WHERE qty_remaining > 0
+                AND expire_date <= $1
+            """,
+            selected_date,
+        ),
+    )
 
     items = []
     expiring_soon = 0  # within 30 days
@@ -454,5 +444,5 @@ async def get_expiring_items(
         items=items,
         total=len(items),
         expiring_soon=expiring_soon,
-        expired=0,
+        expired=expired or 0,
     )
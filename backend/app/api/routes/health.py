@@ -1,9 +1,32 @@
 from fastapi import APIRouter, HTTPException, status
 
 from app.db.postgres import DataBasePool, UninitializedDatabasePoolError
+from app.services import warmup
 
 router = APIRouter(prefix="/health", tags=["health"])
 
+@router.get("/live")
+async def health_live() -> dict:
+    """Liveness: the process is up and serving, regardless of warm-up."""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def health_ready() -> dict:
+    """Readiness: warm-up has finished and the worker is not shutting down."""
+    report = warmup.state.report()
+    try:
+        await DataBasePool.get_pool()
+    except UninitializedDatabasePoolError:
+        report["ready"] = False
+    if not report["ready"]:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=report,
+        )
+    return {"status": "ok", **report}
+
+
 @router.get("/db")
 async def health_check_db() -> dict:
     try:
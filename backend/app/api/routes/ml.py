@@ -6,11 +6,6 @@ API endpoints สำหรับ Machine Learning features
 from fastapi import APIRouter, Query
 from pydantic import BaseModel
 
-from app.ml.apriori import (
-    get_bundle_recommendations,
-    get_recommended_bundles_simple,
-    save_bundles_to_promotions,
-)
 from app.services.scheduler import get_scheduler_status, trigger_job_now
 
 router = APIRouter(prefix="/ml", tags=["machine-learning"])
@@ -57,6 +52,9 @@ async def get_bundles(
     Returns:
     - recommendations: รายการ bundle ที่แนะนำ พร้อมค่า confidence และ lift
     """
+    # pandas/mlxtend load on the first ML request rather than at worker startup
+    from app.ml.apriori import get_bundle_recommendations
+
     result = await get_bundle_recommendations(
         min_support=min_support,
         min_confidence=min_confidence,
@@ -75,6 +73,8 @@ async def get_bundles_simple():
     Returns:
     - bundles: รายการ bundle พร้อม treatments และ description
     """
+    from app.ml.apriori import get_recommended_bundles_simple
+
     bundles = await get_recommended_bundles_simple()
 
     return SimpleBundleResponse(bundles=bundles)
@@ -88,51 +88,47 @@ async def get_bundles_for_treatment(treatment_id: int):
     - **treatment_id**: ID ของ treatment ที่ต้องการหา bundle
     """
     from app.db.postgres import DataBasePool
+    from app.services.catalog import get_catalog
 
-    pool = await DataBasePool.get_pool()
-
-    async with pool.acquire() as connection:
-        # หา treatment name
-        treatment = await connection.fetchrow(
-            "SELECT name FROM treatment WHERE treatment_id = $1",
-            treatment_id
-        )
+    catalog = await get_catalog()
+    treatment = catalog.get(treatment_id)
+    if not treatment:
+        return {"success": False, "message": "Treatment not found"}
 
-        if not treatment:
-            return {"success": False, "message": "Treatment not found"}
+    treatment_name = treatment.name
 
-        treatment_name = treatment["name"]
+    pool = await DataBasePool.get_pool()
 
-        # หา treatments ที่ถูกซื้อพร้อมกัน
+    async with pool.acquire() as connection:
+        # หา treatments ที่ถูกซื้อพร้อมกัน (ชื่อและราคาอ่านจาก catalog)
         rows = await connection.fetch(
             """
             SELECT
-                t2.treatment_id,
-                t2.name,
-                t2.price,
+                ts2.treatment_id,
                 COUNT(*) as co_purchase_count
             FROM treatment_session ts1
             JOIN treatment_session ts2 ON ts1.sell_invoice_id = ts2.sell_invoice_id
-            JOIN treatment t2 ON ts2.treatment_id = t2.treatment_id
             WHERE ts1.treatment_id = $1
               AND ts2.treatment_id != $1
-            GROUP BY t2.treatment_id, t2.name, t2.price
-            ORDER BY co_purchase_count DESC
+            GROUP BY ts2.treatment_id
+            ORDER BY co_purchase_count DESC, ts2.treatment_id
             LIMIT 5
             """,
             treatment_id
         )
 
-    recommendations = [
-        {
-            "treatment_id": row["treatment_id"],
-            "name": row["name"],
-            "price": float(row["price"]) if row["price"] else 0,
+    recommendations = []
+    for row in rows:
+        other = catalog.get(row["treatment_id"])
+        if other is None:
+            continue
+        recommendations.append({
+            "treatment_id": other.treatment_id,
+            "name": other.name,
+            "price": float(other.price) if other.price else 0,
             "co_purchase_count": row["co_purchase_count"],
-            "description": f"ลูกค้าที่ทำ {treatment_name} มักทำ {row['name']} ด้วย"
-        }
-        for row in rows
-    ]
+            "description": f"ลูกค้าที่ทำ {treatment_name} มักทำ {other.name} ด้วย"
+        })
 
     return {
         "success": True,
@@ -183,6 +179,8 @@ async def save_bundles_to_promotions_endpoint(
     Returns:
     - รายการ promotions ที่สร้างขึ้น
     """
+    from app.ml.apriori import save_bundles_to_promotions
+
     result = await save_bundles_to_promotions(
         discount_percent=request.discount_percent,
         valid_days=request.valid_days
@@ -246,9 +244,10 @@ async def get_ml_generated_promotions():
 @router.get("/scheduler/status")
 async def get_scheduler_status_endpoint():
     """
-    ดูสถานะ Scheduler และ Jobs ทั้งหมด
+    ดูสถานะ Scheduler, Jobs ทั้งหมด และประวัติการรันล่าสุด
+    (duration / status / worker ที่รัน)
     """
-    return get_scheduler_status()
+    return await get_scheduler_status()
 
 
 @router.post("/scheduler/trigger/{job_id}")
@@ -258,6 +257,8 @@ async def trigger_job_endpoint(job_id: str):
 
     Available job_ids:
     - **ml_bundle_weekly**: คำนวณ ML Bundle แล้วบันทึกลง promotion
+    - **waste_expired_daily**: ตัด lot ที่หมดอายุเป็น WASTE
+    - **daily_stock_snapshot**: snapshot daily_stock ทุกวันที่ขาดจนถึงวันนี้
     """
     result = await trigger_job_now(job_id)
     return result
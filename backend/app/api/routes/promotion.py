@@ -1,7 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 from pydantic import BaseModel
 
 from app.db.postgres import DataBasePool
+from app.services.http_cache import cached_json, prime
 
 router = APIRouter(prefix="/promotion", tags=["promotion"])
 
@@ -28,80 +29,69 @@ class PromotionBundleListResponse(BaseModel):
   total: int
 
 
+# Every table the bundle query reads; a write to any of them changes the ETag.
+BUNDLE_TABLES = (
+  "promotion",
+  "promotion_benefit",
+  "promotion_condition_group",
+  "promotion_condition_rule",
+  "item_catalog",
+  "treatment_recipe",
+  "treatment",
+)
+
+
 @router.get("/bundles", response_model=PromotionBundleListResponse)
-async def list_promotion_bundles() -> PromotionBundleListResponse:
+async def list_promotion_bundles(request: Request) -> Response:
   """
   Return promotions with their required treatment items (for UI/cart).
   """
+  return await cached_json(request, "promotion.bundles", _load_promotion_bundles, tables=BUNDLE_TABLES)
+
+
+async def prime_cache() -> None:
+  """Startup warm-up: build the bundle response before the first request."""
+  await prime("promotion.bundles", _load_promotion_bundles, tables=BUNDLE_TABLES)
+
+
+async def _load_promotion_bundles() -> bytes:
+  """
+  Build the whole response as JSON inside Postgres from promotion_bundle_view
+  (one row per promotion + treatment), so no per-row Python objects are created.
+  The result is cached as bytes by cached_json until a bundle table changes.
+  """
   pool = await DataBasePool.get_pool()
 
   async with pool.acquire() as connection:
-    rows = await connection.fetch(
+    body = await connection.fetchval(
       """
-      WITH promo_items AS (
+      SELECT json_build_object(
+        'promotions', COALESCE(json_agg(bundle ORDER BY promotion_id), '[]'::json),
+        'total', COUNT(*)
+      )::text
+      FROM (
         SELECT
-          p.promotion_id,
-          p.code,
-          p.name,
-          p.description,
-          COALESCE(pb.value_percent, 0) AS discount_percent,
-          t.treatment_id,
-          t.name AS treatment_name,
-          t.description AS treatment_description,
-          t.category AS treatment_category,
-          t.price AS treatment_price,
-          row_number() OVER (
-            PARTITION BY p.promotion_id, t.name
-            ORDER BY t.price ASC NULLS LAST, t.treatment_id ASC
-          ) AS rn
-        FROM promotion p
-        LEFT JOIN promotion_benefit pb
-          ON pb.promotion_id = p.promotion_id
-         AND pb.benefit_type = 'PERCENT_DISCOUNT'
-        JOIN promotion_condition_group pcg
-          ON pcg.promotion_id = p.promotion_id
-        JOIN promotion_condition_rule pcr
-          ON pcr.condition_group_id = pcg.condition_group_id
-         AND pcr.rule_type = 'HAS_ITEM'
-        JOIN item_catalog ic
-          ON ic.item_id = pcr.item_id
-        JOIN treatment_recipe tr
-          ON tr.item_id = ic.item_id
-        JOIN treatment t
-          ON t.treatment_id = tr.treatment_id
-        WHERE p.is_active = true
-      )
-      SELECT *
-      FROM promo_items
-      WHERE rn = 1
-      ORDER BY promotion_id, treatment_name
+          promotion_id,
+          json_build_object(
+            'promotion_id', promotion_id,
+            'code', code,
+            'name', name,
+            'description', description,
+            'discount_percent', ((array_agg(discount_percent ORDER BY treatment_name))[1])::float8,
+            'treatments', json_agg(
+              json_build_object(
+                'treatment_id', treatment_id,
+                'name', treatment_name,
+                'description', treatment_description,
+                'category', treatment_category,
+                'price', treatment_price::float8
+              )
+              ORDER BY treatment_name
+            )
+          ) AS bundle
+        FROM promotion_bundle_view
+        GROUP BY promotion_id, code, name, description
+      ) bundles
       """
     )
-
-  promotions: dict[int, PromotionBundle] = {}
-  for row in rows:
-    promotion_id = row["promotion_id"]
-    promo = promotions.get(promotion_id)
-    if promo is None:
-      promo = PromotionBundle(
-        promotion_id=promotion_id,
-        code=row["code"],
-        name=row["name"],
-        description=row["description"],
-        discount_percent=float(row["discount_percent"] or 0),
-        treatments=[],
-      )
-      promotions[promotion_id] = promo
-
-    promo.treatments.append(
-      PromotionTreatmentItem(
-        treatment_id=row["treatment_id"],
-        name=row["treatment_name"],
-        description=row["treatment_description"],
-        category=row["treatment_category"],
-        price=float(row["treatment_price"]) if row["treatment_price"] is not None else None,
-      )
-    )
-
-  promotion_list = list(promotions.values())
-  return PromotionBundleListResponse(promotions=promotion_list, total=len(promotion_list))
+  return body.encode()
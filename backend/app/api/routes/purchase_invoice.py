@@ -1,21 +1,48 @@
 import re
+from datetime import datetime
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, File, HTTPException, Query, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 
+import config
+from app.db import queries as q
 from app.db.postgres import DataBasePool
 from app.schemas.purchase import (
     PurchaseInvoiceDetailResponse,
     PurchaseInvoiceDraftRequest,
     PurchaseInvoiceDraftResponse,
     PurchaseInvoiceHeader,
+    PurchaseInvoiceImportLine,
+    PurchaseInvoiceImportResponse,
     PurchaseInvoiceItemRequest,
     PurchaseInvoiceItemResponse,
     PurchaseInvoiceItemsResponse,
 )
+from app.utils.spreadsheet import SpreadsheetError, iter_spreadsheet_rows
 
 router = APIRouter(prefix="/purchase-invoice", tags=["purchase-invoice"])
 
+ITEM_TYPES = {"MEDICINE", "MEDICAL_TOOL"}
+UNIT_TYPES = {"U", "CC", "MG", "PIECE"}
+MAX_IMPORT_LINES = 5000
+
+# Header aliases accepted in uploaded sheets (normalized to snake_case first).
+_IMPORT_COLUMN_ALIASES = {
+    "sku": "item_code",
+    "code": "item_code",
+    "name": "item_name",
+    "variant": "item_variant",
+    "variant_name": "item_variant",
+    "type": "item_type",
+    "quantity": "qty",
+    "price": "purchase_price_per_unit",
+    "buy_price": "purchase_price_per_unit",
+    "expire": "expire_date",
+    "expiry_date": "expire_date",
+}
+
 
 def _normalize_name(name: str) -> str:
     cleaned = re.sub(r"\s+", " ", name.strip().lower())
@@ -124,9 +151,16 @@ async def update_draft_header(
 
 
 @router.get("/{purchase_invoice_id}", response_model=PurchaseInvoiceDetailResponse)
-async def get_purchase_invoice(purchase_invoice_id: int) -> PurchaseInvoiceDetailResponse:
+async def get_purchase_invoice(purchase_invoice_id: int) -> PurchaseInvoiceDetailResponse | Response:
     pool = await DataBasePool.get_pool()
     async with pool.acquire() as connection:
+        if config.FAST_JSON["enabled"]:
+            # One round trip: Postgres returns the finished header + items document as text.
+            body = await connection.fetchval(q.PURCHASE_INVOICE_DOCUMENT, purchase_invoice_id)
+            if body is None:
+                raise HTTPException(status_code=404, detail="Purchase invoice not found")
+            return Response(content=body, media_type="application/json")
+
         header_row = await connection.fetchrow(
             """
             SELECT pi.purchase_invoice_id,
@@ -352,6 +386,259 @@ async def add_purchase_invoice_item(
     )
 
 
+def _parse_import_line(raw: dict[str, Any]) -> PurchaseInvoiceItemRequest:
+    data: dict[str, Any] = {}
+    for key, value in raw.items():
+        field = _IMPORT_COLUMN_ALIASES.get(key, key)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            continue
+        if field == "expire_date" and isinstance(value, datetime):
+            value = value.date()
+        data[field] = value
+
+    item = PurchaseInvoiceItemRequest(**data)
+    item.item_code = (item.item_code or "").strip() or None
+    item.item_name = (item.item_name or "").strip() or None
+    item.item_variant = (item.item_variant or "").strip() or None
+    item.item_type = item.item_type.strip().upper() if item.item_type else None
+    item.unit = item.unit.strip().upper() if item.unit else None
+
+    if not item.item_code and not item.item_name:
+        raise ValueError("item_code or item_name is required")
+    if item.qty <= 0:
+        raise ValueError("qty must be greater than 0")
+    if item.item_type is not None and item.item_type not in ITEM_TYPES:
+        raise ValueError(f"Invalid item_type: {item.item_type}")
+    if item.unit is not None and item.unit not in UNIT_TYPES:
+        raise ValueError(f"Invalid unit: {item.unit}")
+    return item
+
+
+def _parse_import_file(
+    upload: UploadFile,
+) -> tuple[list[tuple[int, PurchaseInvoiceItemRequest]], list[PurchaseInvoiceImportLine]]:
+    parsed: list[tuple[int, PurchaseInvoiceItemRequest]] = []
+    errors: list[PurchaseInvoiceImportLine] = []
+    rows = iter_spreadsheet_rows(upload.file, upload.filename, upload.content_type)
+    try:
+        for line_no, raw in rows:
+            if len(parsed) + len(errors) >= MAX_IMPORT_LINES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Import is limited to {MAX_IMPORT_LINES} lines",
+                )
+            try:
+                parsed.append((line_no, _parse_import_line(raw)))
+            except (ValidationError, ValueError) as exc:
+                errors.append(
+                    PurchaseInvoiceImportLine(
+                        line_no=line_no,
+                        status="error",
+                        item_code=str(raw.get("item_code") or raw.get("sku") or "") or None,
+                        item_name=str(raw.get("item_name") or raw.get("name") or "") or None,
+                        message=str(exc),
+                    )
+                )
+    except SpreadsheetError as exc:
+        raise HTTPException(status_code=400, detail=f"Could not read file: {exc}") from exc
+    return parsed, errors
+
+
+def _item_name_key(item: PurchaseInvoiceItemRequest) -> tuple:
+    return (item.item_name, item.item_variant, item.item_type)
+
+
+async def _bulk_resolve_items(
+    connection,
+    lines: list[tuple[int, PurchaseInvoiceItemRequest]],
+) -> tuple[dict[int, int], set[int]]:
+    """Resolve every line to an item_id with one lookup per strategy.
+
+    Mirrors the single-item endpoint: match by sku, then by name+variant+type,
+    and create the catalog item when nothing matches. Returns
+    ``{line_no: item_id}`` plus the set of item ids created by this import.
+    """
+    resolved: dict[int, int] = {}
+
+    codes = sorted({item.item_code for _, item in lines if item.item_code})
+    if codes:
+        rows = await connection.fetch(
+            "SELECT item_id, sku FROM item_catalog WHERE sku = ANY($1::text[])",
+            codes,
+        )
+        by_code = {row["sku"]: row["item_id"] for row in rows}
+        for line_no, item in lines:
+            if item.item_code in by_code:
+                resolved[line_no] = by_code[item.item_code]
+
+    name_keys = sorted(
+        {_item_name_key(item) for line_no, item in lines if line_no not in resolved and item.item_name},
+        key=str,
+    )
+    by_name: dict[tuple, int] = {}
+    if name_keys:
+        rows = await connection.fetch(
+            """
+            SELECT DISTINCT ON (k.ord) k.ord, ic.item_id
+            FROM unnest($1::text[], $2::text[], $3::text[])
+              WITH ORDINALITY AS k(name, variant_name, item_type, ord)
+            JOIN item_catalog ic
+              ON ic.name = k.name
+             AND ic.variant_name IS NOT DISTINCT FROM k.variant_name
+             AND ic.item_type IS NOT DISTINCT FROM k.item_type::item_type
+            ORDER BY k.ord, ic.item_id ASC
+            """,
+            [key[0] for key in name_keys],
+            [key[1] for key in name_keys],
+            [key[2] for key in name_keys],
+        )
+        for row in rows:
+            by_name[name_keys[row["ord"] - 1]] = row["item_id"]
+
+    to_create: dict[tuple, PurchaseInvoiceItemRequest] = {}
+    for line_no, item in lines:
+        if line_no in resolved or not item.item_name:
+            continue
+        key = _item_name_key(item)
+        if key not in by_name:
+            to_create.setdefault(key, item)
+
+    created_ids: set[int] = set()
+    if to_create:
+        keys = list(to_create)
+        # As in the single-item endpoint, trg_item_code replaces the sku with one
+        # generated from item_type, name, variant and item_id.
+        rows = await connection.fetch(
+            """
+            INSERT INTO item_catalog (sku, name, variant_name, item_type, unit)
+            SELECT k.sku, k.name, k.variant_name, k.item_type::item_type, k.unit::unit_type
+            FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[])
+              AS k(sku, name, variant_name, item_type, unit)
+            RETURNING item_id, name, variant_name, item_type::text AS item_type
+            """,
+            [to_create[key].item_code for key in keys],
+            [key[0] for key in keys],
+            [key[1] for key in keys],
+            [key[2] for key in keys],
+            [to_create[key].unit for key in keys],
+        )
+        for row in rows:
+            key = (row["name"], row["variant_name"], row["item_type"])
+            by_name[key] = row["item_id"]
+            created_ids.add(row["item_id"])
+
+    for line_no, item in lines:
+        if line_no not in resolved and item.item_name:
+            item_id = by_name.get(_item_name_key(item))
+            if item_id is not None:
+                resolved[line_no] = item_id
+
+    return resolved, created_ids
+
+
+@router.post(
+    "/{purchase_invoice_id}/items/import",
+    response_model=PurchaseInvoiceImportResponse,
+)
+async def import_purchase_invoice_items(
+    purchase_invoice_id: int,
+    file: UploadFile = File(...),
+) -> PurchaseInvoiceImportResponse:
+    """
+    Bulk-add invoice lines from a CSV/XLSX upload.
+
+    Expected columns match PurchaseInvoiceItemRequest (item_code, item_name,
+    item_variant, item_type, qty, unit, purchase_price_per_unit, expire_date).
+    Lines for the same item are merged the same way repeated calls to
+    POST /{purchase_invoice_id}/items would merge them.
+    """
+    parsed, errors = await run_in_threadpool(_parse_import_file, file)
+
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        async with connection.transaction():
+            exists = await connection.fetchval(
+                "SELECT 1 FROM purchase_invoice WHERE purchase_invoice_id = $1",
+                purchase_invoice_id,
+            )
+            if not exists:
+                raise HTTPException(status_code=404, detail="Purchase invoice not found")
+
+            resolved, created_ids = await _bulk_resolve_items(connection, parsed)
+
+            # Merge duplicate items first: ON CONFLICT can't touch a row twice per statement.
+            merged: dict[int, dict[str, Any]] = {}
+            for line_no, item in parsed:
+                item_id = resolved.get(line_no)
+                if item_id is None:
+                    continue
+                entry = merged.setdefault(
+                    item_id, {"qty": 0.0, "expire_date": None, "price": None}
+                )
+                entry["qty"] += item.qty
+                entry["expire_date"] = item.expire_date or entry["expire_date"]
+                entry["price"] = item.purchase_price_per_unit
+
+            if merged:
+                item_ids = list(merged)
+                await connection.execute(
+                    """
+                    INSERT INTO purchase_invoice_item (
+                      purchase_invoice_id,
+                      item_id,
+                      qty,
+                      expire_date,
+                      purchase_price_per_unit
+                    )
+                    SELECT $1, k.item_id, k.qty, k.expire_date, k.price
+                    FROM unnest($2::bigint[], $3::numeric[], $4::date[], $5::numeric[])
+                      AS k(item_id, qty, expire_date, price)
+                    ON CONFLICT (item_id, purchase_invoice_id)
+                    DO UPDATE SET
+                      qty = purchase_invoice_item.qty + EXCLUDED.qty,
+                      expire_date = COALESCE(EXCLUDED.expire_date, purchase_invoice_item.expire_date),
+                      purchase_price_per_unit = COALESCE(
+                        EXCLUDED.purchase_price_per_unit,
+                        purchase_invoice_item.purchase_price_per_unit
+                      )
+                    """,
+                    purchase_invoice_id,
+                    item_ids,
+                    [merged[item_id]["qty"] for item_id in item_ids],
+                    [merged[item_id]["expire_date"] for item_id in item_ids],
+                    [merged[item_id]["price"] for item_id in item_ids],
+                )
+
+    lines = list(errors)
+    for line_no, item in parsed:
+        item_id = resolved.get(line_no)
+        lines.append(
+            PurchaseInvoiceImportLine(
+                line_no=line_no,
+                status="ok" if item_id is not None else "error",
+                item_id=item_id,
+                item_code=item.item_code,
+                item_name=item.item_name,
+                qty=item.qty,
+                created_item=item_id in created_ids,
+                message=None if item_id is not None else "Item not found",
+            )
+        )
+    lines.sort(key=lambda line: line.line_no)
+    imported = sum(1 for line in lines if line.status == "ok")
+
+    return PurchaseInvoiceImportResponse(
+        purchase_invoice_id=purchase_invoice_id,
+        total_lines=len(lines),
+        imported=imported,
+        failed=len(lines) - imported,
+        items_created=len(created_ids),
+        lines=lines,
+    )
+
+
 @router.delete("/{purchase_invoice_id}/items/{purchase_invoice_item_id}")
 async def delete_purchase_invoice_item(
     purchase_invoice_id: int,
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException, Query
+import json
+import time
 
-from app.db.postgres import DataBasePool
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import BaseModel
+
+import config
+from app.db import queries as q
+from app.db.postgres import DataBasePool, fan_out
 from app.schemas.customer import (
     CustomerOption,
     CustomerSearchResponse,
@@ -12,16 +18,25 @@ from app.schemas.customer import (
 )
 from app.schemas.inventory import ItemCatalogItem, ItemCatalogPage
 from app.schemas.purchase import SupplierOption, SupplierOptionResponse
+from app.services.catalog import get_catalog
+from app.services.http_cache import cached_json
+from app.utils.fastjson import json_response
 from app.utils.storage import build_signed_url
 
 # Application domain resources will live under /api/v1/resource/*
 router = APIRouter(prefix="/resource", tags=["resource"])
 
 
-@router.get("/assets/service-bg")
-async def get_service_bg() -> dict:
-    url = build_signed_url("service-bg.png", bucket="assets")
-    return {"url": url}
+class AssetUrl(BaseModel):
+    url: str | None = None
+
+
+@router.get("/assets/service-bg", response_model=AssetUrl)
+async def get_service_bg(request: Request) -> Response:
+    async def build() -> AssetUrl:
+        return AssetUrl(url=build_signed_url("service-bg.png", bucket="assets"))
+
+    return await cached_json(request, "resource.service_bg", build, signed_urls=True)
 
 
 @router.get("/item-catalog", response_model=ItemCatalogPage)
@@ -38,65 +53,20 @@ async def list_item_catalog(
 ) -> ItemCatalogPage:
     offset = (page - 1) * limit
     pool = await DataBasePool.get_pool()
-    filters = []
-    values = []
-    if code:
-        filters.append("sku ILIKE $" + str(len(values) + 1))
-        values.append(f"%{code}%")
-    if name:
-        filters.append("name ILIKE $" + str(len(values) + 1))
-        values.append(f"%{name}%")
-    if variant:
-        filters.append("variant_name ILIKE $" + str(len(values) + 1))
-        values.append(f"%{variant}%")
-    if item_type and item_type != "All":
-        filters.append("item_type = $" + str(len(values) + 1))
-        values.append(item_type)
-    if status and status != "All":
-        if status == "Low":
-            filters.append(
-                "(current_qty IS NOT NULL AND restock_threshold IS NOT NULL AND current_qty <= restock_threshold)"
-            )
-        else:
-            filters.append(
-                "NOT (current_qty IS NOT NULL AND restock_threshold IS NOT NULL AND current_qty <= restock_threshold)"
-            )
-    if unit:
-        filters.append("unit::text ILIKE $" + str(len(values) + 1))
-        values.append(f"%{unit}%")
-    if price is not None:
-        filters.append("sell_price = $" + str(len(values) + 1))
-        values.append(price)
-    where_clause = " AND ".join(filters)
-    if where_clause:
-        where_clause = "WHERE " + where_clause
+    # Fixed parameter shape ($1..$7, NULL = no filter) so the listing stays one prepared statement.
+    filters = (
+        f"%{code}%" if code else None,
+        f"%{name}%" if name else None,
+        f"%{variant}%" if variant else None,
+        item_type if item_type and item_type != "All" else None,
+        status if status and status != "All" else None,
+        f"%{unit}%" if unit else None,
+        price,
+    )
 
     async with pool.acquire() as connection:
-        total = await connection.fetchval(
-            f"SELECT COUNT(*) FROM item_catalog {where_clause}",
-            *values,
-        )
-        rows = await connection.fetch(
-            f"""
-            SELECT
-              item_id,
-              sku,
-              name,
-              variant_name,
-              item_type,
-              sell_price,
-              unit,
-              current_qty,
-              restock_threshold
-            FROM item_catalog
-            {where_clause}
-            ORDER BY item_id ASC
-            LIMIT ${len(values) + 1} OFFSET ${len(values) + 2}
-            """,
-            *values,
-            limit,
-            offset,
-        )
+        total = await connection.fetchval(q.ITEM_CATALOG_COUNT, *filters)
+        rows = await connection.fetch(q.ITEM_CATALOG_PAGE, *filters, limit, offset)
     items = []
     for row in rows:
         item_type = row["item_type"]
@@ -135,24 +105,12 @@ async def list_item_catalog(
 
 
 @router.get("/customers", response_model=CustomerListResponse)
-async def list_customers() -> CustomerListResponse:
+async def list_customers() -> CustomerListResponse | Response:
     pool = await DataBasePool.get_pool()
     async with pool.acquire() as connection:
-        rows = await connection.fetch(
-            """
-            SELECT
-              customer_id,
-              customer_code,
-              full_name,
-              nickname,
-              phone,
-              date_of_birth,
-              gender,
-              member_wallet_remain
-            FROM customer
-            ORDER BY full_name ASC NULLS LAST, customer_id ASC
-            """
-        )
+        rows = await connection.fetch(q.CUSTOMER_LIST)
+    if config.FAST_JSON["enabled"]:
+        return json_response({"items": rows})
     return CustomerListResponse(items=[CustomerRow(**dict(row)) for row in rows])
 
 
@@ -191,78 +149,75 @@ async def create_customer(payload: CustomerCreateRequest) -> CustomerRow:
 async def get_customer(customer_id: int) -> CustomerRow:
     pool = await DataBasePool.get_pool()
     async with pool.acquire() as connection:
-        row = await connection.fetchrow(
-            """
-            SELECT
-              customer_id,
-              customer_code,
-              full_name,
-              nickname,
-              phone,
-              date_of_birth,
-              gender,
-              member_wallet_remain
-            FROM customer
-            WHERE customer_id = $1
-            """,
-            customer_id,
-        )
+        row = await connection.fetchrow(q.CUSTOMER_BY_ID, customer_id)
     if not row:
         raise HTTPException(status_code=404, detail="Customer not found")
     return CustomerRow(**dict(row))
 
 
+# Signed URL per treatment image key, as the JSON text passed to CUSTOMER_TREATMENTS_DOCUMENT.
+# Rebuilt for each new catalog snapshot and before the signed URLs get old.
+_image_urls: str | None = None
+_image_urls_version: str | None = None
+_image_urls_expire_at = 0.0
+
+
+async def _treatment_image_urls(connection) -> str:
+    global _image_urls, _image_urls_version, _image_urls_expire_at
+    catalog = await get_catalog(connection)
+    if (
+        _image_urls is None
+        or _image_urls_version != catalog.version
+        or _image_urls_expire_at <= time.monotonic()
+    ):
+        _image_urls = json.dumps({
+            key: build_signed_url(key, bucket="treatment") for key in sorted(catalog.image_keys)
+        })
+        _image_urls_version = catalog.version
+        _image_urls_expire_at = time.monotonic() + config.HTTP_CACHE["signed_url_ttl_seconds"]
+    return _image_urls
+
+
 @router.get("/customers/{customer_id}/treatments", response_model=CustomerTreatmentResponse)
-async def get_customer_treatments(customer_id: int) -> CustomerTreatmentResponse:
-    pool = await DataBasePool.get_pool()
-    async with pool.acquire() as connection:
-        customer_row = await connection.fetchrow(
-            """
-            SELECT
-              customer_id,
-              customer_code,
-              full_name,
-              nickname,
-              phone,
-              date_of_birth,
-              gender,
-              member_wallet_remain
-            FROM customer
-            WHERE customer_id = $1
-            """,
-            customer_id,
-        )
-        if not customer_row:
+async def get_customer_treatments(customer_id: int) -> CustomerTreatmentResponse | Response:
+    if config.FAST_JSON["enabled"]:
+        pool = await DataBasePool.get_pool()
+        async with pool.acquire() as connection:
+            # One round trip: Postgres returns the finished document as text.
+            body = await connection.fetchval(
+                q.CUSTOMER_TREATMENTS_DOCUMENT,
+                customer_id,
+                await _treatment_image_urls(connection),
+            )
+        if body is None:
             raise HTTPException(status_code=404, detail="Customer not found")
+        return Response(content=body, media_type="application/json")
 
-        rows = await connection.fetch(
-            """
-            SELECT
-              ts.treatment_id,
-              t.name AS treatment_name,
-              t.image_obj_key,
-              ts.session_date,
-              ts.age_at_session,
-              ts.note,
-              ts.session_time,
-              ts.sell_invoice_id
-            FROM treatment_session ts
-            JOIN treatment t ON t.treatment_id = ts.treatment_id
-            WHERE ts.customer_id = $1
-            ORDER BY ts.session_date DESC NULLS LAST, ts.treatment_id ASC
-            """,
-            customer_id,
-        )
+    # Customer and sessions are independent lookups; run them side by side.
+    customer_row, rows = await fan_out(
+        lambda conn: conn.fetchrow(q.CUSTOMER_BY_ID, customer_id),
+        lambda conn: conn.fetch(q.CUSTOMER_SESSIONS, customer_id),
+    )
+    if not customer_row:
+        raise HTTPException(status_code=404, detail="Customer not found")
 
-    return CustomerTreatmentResponse(
-        customer=CustomerRow(**dict(customer_row)),
-        treatments=[
+    catalog = await get_catalog()
+    treatments = []
+    for row in rows:
+        treatment = catalog.get(row["treatment_id"])
+        image_obj_key = treatment.image_obj_key if treatment else None
+        treatments.append(
             CustomerTreatmentRow(
                 **dict(row),
-                image_url=build_signed_url(row["image_obj_key"], bucket="treatment"),
+                treatment_name=treatment.name if treatment else None,
+                image_obj_key=image_obj_key,
+                image_url=build_signed_url(image_obj_key, bucket="treatment"),
             )
-            for row in rows
-        ],
+        )
+
+    return CustomerTreatmentResponse(
+        customer=CustomerRow(**dict(customer_row)),
+        treatments=treatments,
     )
 
 
@@ -1,8 +1,9 @@
-from datetime import date, datetime
-from typing import List, Optional
+from datetime import date, datetime, time
+from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Query
 
+from app.db import queries as q
 from app.db.postgres import DataBasePool
 from app.schemas.purchase import ImportItemRow, ImportItemsResponse
 from app.schemas.withdraw import (
@@ -34,90 +35,29 @@ async def list_import_items(
     expire_to: date | None = Query(None),
 ) -> ImportItemsResponse:
     pool = await DataBasePool.get_pool()
-    filters: List[str] = []
-    values: List[object] = []
-
-    if code:
-        filters.append(f"ic.sku ILIKE ${len(values) + 1}")
-        values.append(f"%{code}%")
-    if name:
-        filters.append(f"ic.name ILIKE ${len(values) + 1}")
-        values.append(f"%{name}%")
-    if variant:
-        filters.append(f"ic.variant_name ILIKE ${len(values) + 1}")
-        values.append(f"%{variant}%")
-    if item_type and item_type != "All":
-        filters.append(f"ic.item_type = ${len(values) + 1}")
-        values.append(item_type)
-    if supplier_name:
-        filters.append(f"s.name ILIKE ${len(values) + 1}")
-        values.append(f"%{supplier_name}%")
-    if time_from:
-        filters.append(f"sm.created_at >= ${len(values) + 1}")
-        values.append(time_from)
-    if time_to:
-        filters.append(f"sm.created_at <= ${len(values) + 1}")
-        values.append(time_to)
-    if qty_min is not None:
-        filters.append(f"sm.qty >= ${len(values) + 1}")
-        values.append(qty_min)
-    if qty_max is not None:
-        filters.append(f"sm.qty <= ${len(values) + 1}")
-        values.append(qty_max)
-    if buy_price_min is not None:
-        filters.append(f"pii.purchase_price_per_unit >= ${len(values) + 1}")
-        values.append(buy_price_min)
-    if buy_price_max is not None:
-        filters.append(f"pii.purchase_price_per_unit <= ${len(values) + 1}")
-        values.append(buy_price_max)
-    if expire_from:
-        filters.append(f"pii.expire_date >= ${len(values) + 1}")
-        values.append(expire_from)
-    if expire_to:
-        filters.append(f"pii.expire_date <= ${len(values) + 1}")
-        values.append(expire_to)
-
-    where_clause = " AND ".join(filters)
-    if where_clause:
-        where_clause = "WHERE " + where_clause
-
-    base_filter = "sm.movement_type = 'PURCHASE_IN'"
-    if where_clause:
-        where_clause = f"WHERE {base_filter} AND " + where_clause.replace("WHERE ", "")
-    else:
-        where_clause = f"WHERE {base_filter}"
+    # Fixed parameter shape (NULL = no filter) so each sort direction is one prepared statement.
+    filters = (
+        f"%{code}%" if code else None,
+        f"%{name}%" if name else None,
+        f"%{variant}%" if variant else None,
+        item_type if item_type and item_type != "All" else None,
+        f"%{supplier_name}%" if supplier_name else None,
+        datetime.combine(time_from, time.min) if time_from else None,
+        datetime.combine(time_to, time.min) if time_to else None,
+        qty_min,
+        qty_max,
+        buy_price_min,
+        buy_price_max,
+        expire_from,
+        expire_to,
+    )
 
     order_dir = "DESC"
     if isinstance(time_order, str) and time_order.lower() == "asc":
         order_dir = "ASC"
 
     async with pool.acquire() as connection:
-        rows = await connection.fetch(
-            f"""
-            SELECT
-              sm.created_at AS created_at,
-              s.name AS supplier_name,
-              ic.sku AS item_code,
-              ic.name AS item_name,
-              ic.variant_name AS item_variant,
-              ic.item_type AS item_type,
-              sm.qty,
-              pii.purchase_price_per_unit,
-              pii.expire_date
-            FROM stock_movement sm
-            JOIN purchase_invoice pi ON pi.purchase_invoice_id = sm.purchase_invoice_id
-            LEFT JOIN supplier s ON s.supplier_id = pi.supplier_id
-            JOIN item_catalog ic ON ic.item_id = sm.item_id
-            LEFT JOIN purchase_invoice_item pii
-              ON pii.purchase_invoice_id = sm.purchase_invoice_id
-             AND pii.item_id = sm.item_id
-            {where_clause}
-            ORDER BY sm.created_at {order_dir} NULLS LAST, sm.purchase_invoice_id {order_dir}
-            LIMIT ${len(values) + 1}
-            """,
-            *values,
-            limit,
-        )
+        rows = await connection.fetch(q.IMPORT_ITEMS[order_dir], *filters, limit)
 
     items = [ImportItemRow(**dict(row)) for row in rows]
     return ImportItemsResponse(items=items)
@@ -134,27 +74,11 @@ async def _resolve_item_id(
     if item_id:
         return item_id
     if item_code:
-        row = await connection.fetchrow(
-            "SELECT item_id FROM item_catalog WHERE sku = $1",
-            item_code,
-        )
+        row = await connection.fetchrow(q.ITEM_ID_BY_SKU, item_code)
         if row:
             return row["item_id"]
     if item_name:
-        row = await connection.fetchrow(
-            """
-            SELECT item_id
-            FROM item_catalog
-            WHERE name = $1
-              AND ($2::text IS NULL OR variant_name = $2)
-              AND ($3::text IS NULL OR item_type = $3)
-            ORDER BY item_id ASC
-            LIMIT 1
-            """,
-            item_name,
-            item_variant,
-            item_type,
-        )
+        row = await connection.fetchrow(q.ITEM_ID_BY_NAME, item_name, item_variant, item_type)
         if row:
             return row["item_id"]
     raise HTTPException(status_code=400, detail="Item not found")
@@ -175,68 +99,25 @@ async def list_withdraw_items(
     qty_max: float | None = Query(None),
 ) -> WithdrawHistoryResponse:
     pool = await DataBasePool.get_pool()
-    filters: List[str] = []
-    values: List[object] = []
-
-    if code:
-        filters.append(f"ic.sku ILIKE ${len(values) + 1}")
-        values.append(f"%{code}%")
-    if name:
-        filters.append(f"ic.name ILIKE ${len(values) + 1}")
-        values.append(f"%{name}%")
-    if variant:
-        filters.append(f"ic.variant_name ILIKE ${len(values) + 1}")
-        values.append(f"%{variant}%")
-    if item_type and item_type != "All":
-        filters.append(f"ic.item_type = ${len(values) + 1}")
-        values.append(item_type)
-    base_filter = "sm.movement_type = 'WITHDRAW'"
-    if movement_type and movement_type != "All" and movement_type != "WITHDRAW":
-        filters.append(f"sm.movement_type = ${len(values) + 1}")
-        values.append(movement_type)
-    if time_from:
-        filters.append(f"sm.created_at >= ${len(values) + 1}")
-        values.append(time_from)
-    if time_to:
-        filters.append(f"sm.created_at <= ${len(values) + 1}")
-        values.append(time_to)
-    if qty_min is not None:
-        filters.append(f"sm.qty >= ${len(values) + 1}")
-        values.append(qty_min)
-    if qty_max is not None:
-        filters.append(f"sm.qty <= ${len(values) + 1}")
-        values.append(qty_max)
-
-    where_clause = " AND ".join(filters)
-    if where_clause:
-        where_clause = f"WHERE {base_filter} AND " + where_clause
-    else:
-        where_clause = f"WHERE {base_filter}"
+    # Fixed parameter shape (NULL = no filter) so each sort direction is one prepared statement.
+    filters = (
+        f"%{code}%" if code else None,
+        f"%{name}%" if name else None,
+        f"%{variant}%" if variant else None,
+        item_type if item_type and item_type != "All" else None,
+        movement_type if movement_type and movement_type not in ("All", "WITHDRAW") else None,
+        time_from,
+        time_to,
+        qty_min,
+        qty_max,
+    )
 
     order_dir = "DESC"
     if isinstance(time_order, str) and time_order.lower() == "asc":
         order_dir = "ASC"
 
     async with pool.acquire() as connection:
-        rows = await connection.fetch(
-            f"""
-            SELECT
-              sm.created_at AS created_at,
-              sm.movement_type AS movement_type,
-              ic.sku AS item_code,
-              ic.name AS item_name,
-              ic.variant_name AS item_variant,
-              sm.qty,
-              ic.unit AS unit
-            FROM stock_movement sm
-            JOIN item_catalog ic ON ic.item_id = sm.item_id
-            {where_clause}
-            ORDER BY sm.created_at {order_dir} NULLS LAST, sm.item_id {order_dir}
-            LIMIT ${len(values) + 1}
-            """,
-            *values,
-            limit,
-        )
+        rows = await connection.fetch(q.WITHDRAW_ITEMS[order_dir], *filters, limit)
 
     items = [WithdrawHistoryRow(**dict(row)) for row in rows]
     return WithdrawHistoryResponse(items=items)
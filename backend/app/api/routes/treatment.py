@@ -1,42 +1,47 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request, Response
 
-from app.db.postgres import DataBasePool
 from app.schemas.treatment import (
     TreatmentCategory,
     TreatmentCategoryListResponse,
     TreatmentItem,
     TreatmentListResponse,
 )
+from app.services.catalog import get_catalog
+from app.services.http_cache import cached_json, prime
 from app.utils.storage import build_signed_url
 
 router = APIRouter(prefix="/treatment", tags=["treatment"])
 
 
 @router.get("/categories", response_model=TreatmentCategoryListResponse)
-async def list_categories() -> TreatmentCategoryListResponse:
+async def list_categories(request: Request) -> Response:
     """
     Get unique categories with an image key (if any).
     """
-    pool = await DataBasePool.get_pool()
-    async with pool.acquire() as connection:
-        rows = await connection.fetch(
-            """
-            SELECT DISTINCT ON (category)
-              category,
-              image_obj_key
-            FROM treatment
-            WHERE category IS NOT NULL
-            ORDER BY category, (image_obj_key IS NULL), treatment_id ASC
-            """
-        )
+    return await cached_json(
+        request,
+        "treatment.categories",
+        _load_categories,
+        tables=("treatment",),
+        signed_urls=True,
+    )
+
+
+async def prime_cache() -> None:
+    """Startup warm-up: build the category list and the unfiltered treatment list."""
+    await prime("treatment.categories", _load_categories, tables=("treatment",), signed_urls=True)
+    await prime("treatment.list", lambda: _load_treatments(None), tables=("treatment",), key="")
+
 
+async def _load_categories() -> TreatmentCategoryListResponse:
+    catalog = await get_catalog()
     categories = [
         TreatmentCategory(
-            category=row["category"],
-            image_obj_key=row["image_obj_key"],
-            image_url=build_signed_url(row["image_obj_key"], bucket="treatment"),
+            category=entry.category,
+            image_obj_key=entry.image_obj_key,
+            image_url=build_signed_url(entry.image_obj_key, bucket="treatment"),
         )
-        for row in rows
+        for entry in catalog.categories
     ]
 
     return TreatmentCategoryListResponse(categories=categories)
@@ -44,48 +49,34 @@ async def list_categories() -> TreatmentCategoryListResponse:
 
 @router.get("", response_model=TreatmentListResponse)
 async def list_treatments(
+    request: Request,
     category: str | None = Query(None, description="Filter by category"),
-) -> TreatmentListResponse:
+) -> Response:
     """
     Get list of treatments, optionally filtered by category.
 
     Categories: Shape, Meso Therapy, Booster, Botox, Lorient, Vaccine, Biosimulator, Filler
     """
-    pool = await DataBasePool.get_pool()
-    values = []
-    where_clause = ""
-
-    if category:
-        values.append(category)
-        where_clause = "WHERE category = $1"
-
-    async with pool.acquire() as connection:
-        rows = await connection.fetch(
-            f"""
-            SELECT
-              treatment_id,
-              name,
-              category,
-              price,
-              description
-            FROM treatment
-            {where_clause}
-            ORDER BY name ASC
-            """,
-            *values,
-        )
+    return await cached_json(
+        request,
+        "treatment.list",
+        lambda: _load_treatments(category),
+        tables=("treatment",),
+        key=category or "",
+    )
 
-        total = len(rows)
 
+async def _load_treatments(category: str | None) -> TreatmentListResponse:
+    catalog = await get_catalog()
     treatments = [
         TreatmentItem(
-            treatment_id=row["treatment_id"],
-            name=row["name"],
-            category=row["category"],
-            price=row["price"],
-            description=row["description"],
+            treatment_id=treatment.treatment_id,
+            name=treatment.name,
+            category=treatment.category,
+            price=treatment.price,
+            description=treatment.description,
         )
-        for row in rows
+        for treatment in catalog.in_category(category or None)
     ]
 
-    return TreatmentListResponse(treatments=treatments, total=total)
+    return TreatmentListResponse(treatments=treatments, total=len(treatments))
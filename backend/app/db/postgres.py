@@ -1,7 +1,17 @@
+import asyncio
 import asyncpg
+import functools
+import logging
+import time
 import config
-from asyncpg import Pool
-from typing import Optional
+from asyncpg import Connection, Pool
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+from app.db import queries
+from app.services.metrics import Gauge
+
+logger = logging.getLogger(__name__)
 
 class UninitializedDatabasePoolError(Exception):
     def __init__(
@@ -12,6 +22,168 @@ class UninitializedDatabasePoolError(Exception):
         super().__init__(self.message)
 
 
+def _connection_kwargs() -> dict:
+    return {
+        "database": config.POSTGRES["database"],
+        "user": config.POSTGRES["user"],
+        "password": config.POSTGRES["password"],
+        "host": config.POSTGRES["host"],
+        "port": config.POSTGRES["port"],
+    }
+
+
+def build_database_url(driver: str = "postgresql") -> str:
+    missing = [key for key, value in config.POSTGRES.items() if not value]
+    if missing:
+        missing_keys = ", ".join(missing)
+        raise ValueError(f"Missing database config values: {missing_keys}")
+
+    return (
+        f"{driver}://"
+        f"{config.POSTGRES['user']}:{config.POSTGRES['password']}"
+        f"@{config.POSTGRES['host']}:{config.POSTGRES['port']}/{config.POSTGRES['database']}"
+    )
+
+
+class QueryStats:
+    """SQL round trips and time spent waiting on Postgres within one request."""
+
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Set by the request middleware; None outside a request (scheduler, startup).
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Optional per-statement observer, called with (query, args, seconds); see app.db.profiling.
+_statement_hook: Optional[Callable[[str, tuple, float], None]] = None
+
+
+def set_statement_hook(hook: Optional[Callable[[str, tuple, float], None]]) -> None:
+    global _statement_hook
+    _statement_hook = hook
+
+
+def _timed(name: str):
+    method = getattr(Connection, name)
+    # executemany has no prepared-statement equivalent worth routing through
+    use_registry = name != "executemany"
+
+    @functools.wraps(method)
+    async def wrapper(self, query, *args, **kwargs):
+        statement_name = queries.NAMES_BY_SQL.get(query) if use_registry else None
+        if statement_name is not None:
+            call = self._run_prepared(name, statement_name, query, args, kwargs)
+        else:
+            queries.ADHOC_CALLS.inc(name)
+            call = method(self, query, *args, **kwargs)
+
+        stats = query_stats.get()
+        hook = _statement_hook
+        if stats is None and hook is None:
+            return await call
+        started = time.perf_counter()
+        try:
+            return await call
+        finally:
+            elapsed = time.perf_counter() - started
+            if stats is not None:
+                stats.queries += 1
+                stats.db_time += elapsed
+            if hook is not None:
+                hook(query, args, elapsed)
+
+    return wrapper
+
+
+class InstrumentedConnection(Connection):
+    """
+    Connection that counts round trips into the current request's QueryStats
+    and executes registered hot statements (app.db.queries) as prepared statements.
+    """
+
+    execute = _timed("execute")
+    executemany = _timed("executemany")
+    fetch = _timed("fetch")
+    fetchrow = _timed("fetchrow")
+    fetchval = _timed("fetchval")
+
+    def _prepared_names(self) -> set[str]:
+        names = self.__dict__.get("_registry_prepared")
+        if names is None:
+            names = self.__dict__["_registry_prepared"] = set()
+        return names
+
+    async def prepare_registry(self) -> int:
+        """
+        Prepare the hot registered statements on this connection; returns how many are
+        prepared. Cold ones are prepared on their first call (_run_prepared).
+
+        Statements live in asyncpg's per-connection statement cache rather than as
+        PreparedStatement objects: those are invalidated when the connection goes back
+        to the pool, while the cached server-side statements survive every checkout.
+        """
+        names = self._prepared_names()
+        for name in sorted(queries.HOT_STATEMENTS):
+            if name in names:
+                continue
+            try:
+                await self._prepare(queries.STATEMENTS[name], use_cache=True)
+                names.add(name)
+            except asyncpg.PostgresError as e:
+                # e.g. a table missing in this database; the call site will surface it.
+                logger.warning(f"[DB] Could not prepare statement {name}: {e}")
+        return len(names)
+
+    async def _run_prepared(self, method: str, name: str, query: str, args: tuple, kwargs: dict):
+        names = self._prepared_names()
+        if name in names:
+            queries.STATEMENT_CALLS.inc(name, "hit")
+        else:
+            queries.STATEMENT_CALLS.inc(name, "miss")
+            names.add(name)
+        # The base methods look the statement up in the cache (preparing it on a miss)
+        # and re-prepare it themselves after DDL invalidates the cached plan.
+        return await getattr(Connection, method)(self, query, *args, **kwargs)
+
+
+async def _init_connection(connection: InstrumentedConnection) -> None:
+    if config.DB_POOL["prepare_on_connect"]:
+        await connection.prepare_registry()
+
+
+# Connection pools of this process by name -> () -> {"open", "idle", "max"}; see register_pool.
+_pool_reporters: dict[str, Callable[[], dict[str, int]]] = {}
+
+
+def register_pool(name: str, report: Callable[[], dict[str, int]]) -> None:
+    """Expose another connection pool (e.g. the SQL agent's engine) in db_pool_connections."""
+    _pool_reporters[name] = report
+
+
+def pool_report() -> dict[str, dict[str, int]]:
+    return {name: report() for name, report in _pool_reporters.items()}
+
+
+def _collect_pool_connections() -> dict[tuple, float]:
+    return {
+        (name, state): value
+        for name, states in pool_report().items()
+        for state, value in states.items()
+    }
+
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections per pool in this worker; state is open, idle or max",
+    label_names=("pool", "state"),
+    collect=_collect_pool_connections,
+)
+
+
 class DataBasePool:
 
     _db_pool: Optional[Pool] = None
@@ -19,15 +191,27 @@ class DataBasePool:
     @classmethod
     async def setup(cls, timeout: Optional[float] = None):
         cls._db_pool = await asyncpg.create_pool(
-            database=config.POSTGRES["database"],
-            user=config.POSTGRES["user"],
-            password=config.POSTGRES["password"],
-            host=config.POSTGRES["host"],
-            port=config.POSTGRES["port"],
-            min_size=1,
-            max_size=5,
+            **_connection_kwargs(),
+            min_size=config.DB_POOL["min_size"],
+            max_size=config.DB_POOL["max_size"],
+            connection_class=InstrumentedConnection,
+            init=_init_connection,
+            # Room for every registered statement besides asyncpg's default 100 ad-hoc ones.
+            statement_cache_size=len(queries.STATEMENTS) + 100,
         )
         cls._timeout = timeout
+        register_pool("asyncpg", cls._report)
+
+    @classmethod
+    def _report(cls) -> dict[str, int]:
+        pool = cls._db_pool
+        if pool is None:
+            return {}
+        return {
+            "open": pool.get_size(),
+            "idle": pool.get_idle_size(),
+            "max": pool.get_max_size(),
+        }
 
     @classmethod
     async def get_pool(cls):
@@ -35,8 +219,49 @@ class DataBasePool:
             raise UninitializedDatabasePoolError()
         return cls._db_pool
 
+    @classmethod
+    async def connect(cls) -> Connection:
+        """Open a dedicated connection outside the pool (advisory locks, listeners)."""
+        return await asyncpg.connect(**_connection_kwargs())
+
     @classmethod
     async def teardown(cls):
         if not cls._db_pool:
             raise UninitializedDatabasePoolError()
         await cls._db_pool.close()
+
+
+async def fan_out(
+    *calls: Callable[[Connection], Awaitable[Any]],
+    budget: Optional[int] = None,
+) -> list:
+    """
+    Run independent queries concurrently on separate pooled connections.
+
+    Each call receives a connection, e.g. ``lambda conn: conn.fetchval(q.OUT_OF_STOCK_COUNT)``;
+    results come back in call order. At most ``budget`` connections
+    (DB_POOL["fan_out_budget"]) are used per request, and never more than the pool
+    has free, so a busy pool degrades to the sequential single-connection path
+    instead of queueing requests behind each other's fan-outs. Calls must not
+    depend on each other or share a transaction.
+    """
+    pool = await DataBasePool.get_pool()
+    if budget is None:
+        budget = config.DB_POOL["fan_out_budget"]
+    free = pool.get_max_size() - pool.get_size() + pool.get_idle_size()
+    width = max(1, min(budget, len(calls), free))
+
+    if width == 1:
+        async with pool.acquire() as connection:
+            return [await call(connection) for call in calls]
+
+    async def run_lane(lane: tuple) -> list:
+        async with pool.acquire() as connection:
+            return [await call(connection) for call in lane]
+
+    # Calls are dealt round-robin into `width` lanes, each on its own connection.
+    lanes = [calls[offset::width] for offset in range(width)]
+    results: list = [None] * len(calls)
+    for offset, lane_results in enumerate(await asyncio.gather(*(run_lane(lane) for lane in lanes))):
+        results[offset::width] = lane_results
+    return results
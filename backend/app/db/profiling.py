@@ -0,0 +1,208 @@
+"""
+Query profiling (opt-in, config.QUERY_PROFILING).
+
+Every statement that goes through InstrumentedConnection is reduced to a
+fingerprint (literals replaced by ``?``, ``$n`` placeholders kept) and timed.
+Per fingerprint we keep a fixed-size reservoir of durations for p50/p95/p99.
+Slow SELECTs are sampled and re-run under ``EXPLAIN (ANALYZE, BUFFERS)`` on a
+separate pooled connection in the background, inside a read-only transaction.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Optional
+
+import config
+from app.db import postgres
+
+logger = logging.getLogger(__name__)
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_READ_ONLY = re.compile(r"^\s*(?:SELECT|WITH)\b", re.I)
+_WRITES = re.compile(r"\b(?:INSERT|UPDATE|DELETE|MERGE|TRUNCATE|FOR\s+UPDATE|FOR\s+SHARE)\b", re.I)
+
+OVERFLOW_FINGERPRINT = "<other statements>"
+
+# Set inside the EXPLAIN task so its own statements are not profiled.
+_capturing: ContextVar[bool] = ContextVar("profiling_capturing", default=False)
+
+# The event loop only keeps weak references to tasks; hold EXPLAIN tasks until they finish.
+_explain_tasks: set[asyncio.Task] = set()
+
+
+def fingerprint(query: str) -> str:
+    """Normalize a statement so executions with different literals share one shape."""
+    text = _COMMENT.sub(" ", query)
+    text = _STRING.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _IN_LIST.sub("(?...)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def fingerprint_id(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class QueryProfile:
+    __slots__ = ("fingerprint", "count", "total", "max", "reservoir", "slow", "explains", "explaining")
+
+    def __init__(self, text: str) -> None:
+        self.fingerprint = text
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.reservoir: list[float] = []
+        self.slow = 0
+        self.explains: deque = deque(maxlen=config.QUERY_PROFILING["explains_per_fingerprint"])
+        self.explaining = False
+
+    def add(self, seconds: float, reservoir_size: int) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        # Algorithm R: uniform sample of every execution seen so far.
+        if len(self.reservoir) < reservoir_size:
+            self.reservoir.append(seconds)
+        else:
+            slot = random.randrange(self.count)
+            if slot < reservoir_size:
+                self.reservoir[slot] = seconds
+
+    def summary(self) -> dict:
+        ordered = sorted(self.reservoir)
+        return {
+            "id": fingerprint_id(self.fingerprint),
+            "fingerprint": self.fingerprint,
+            "calls": self.count,
+            "slow_calls": self.slow,
+            "total_ms": round(self.total * 1000, 2),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "explains": len(self.explains),
+        }
+
+
+class QueryProfiler:
+    def __init__(self) -> None:
+        self._profiles: dict[str, QueryProfile] = {}
+        self._fingerprints: dict[str, str] = {}
+        self._explain_slots = asyncio.Semaphore(1)
+        self.started_at = datetime.now()
+
+    def _fingerprint(self, query: str) -> str:
+        # Static statements are fingerprinted once; dynamic ones are bounded by max_fingerprints.
+        text = self._fingerprints.get(query)
+        if text is None:
+            text = fingerprint(query)
+            if len(self._fingerprints) < config.QUERY_PROFILING["max_fingerprints"] * 4:
+                self._fingerprints[query] = text
+        return text
+
+    def record(self, query: str, args: tuple, seconds: float) -> None:
+        if _capturing.get():
+            return
+        text = self._fingerprint(query)
+        profile = self._profiles.get(text)
+        if profile is None:
+            if len(self._profiles) >= config.QUERY_PROFILING["max_fingerprints"]:
+                text = OVERFLOW_FINGERPRINT
+                profile = self._profiles.get(text)
+            if profile is None:
+                profile = self._profiles[text] = QueryProfile(text)
+        profile.add(seconds, config.QUERY_PROFILING["reservoir_size"])
+
+        if seconds * 1000 < config.QUERY_PROFILING["slow_ms"]:
+            return
+        profile.slow += 1
+        if (
+            profile.explaining
+            or text == OVERFLOW_FINGERPRINT
+            or random.random() >= config.QUERY_PROFILING["explain_sample_rate"]
+            or not _READ_ONLY.match(query)
+            or _WRITES.search(query)
+        ):
+            return
+        profile.explaining = True
+        task = asyncio.get_running_loop().create_task(
+            self._capture_explain(profile, query, args, seconds)
+        )
+        _explain_tasks.add(task)
+        task.add_done_callback(_explain_tasks.discard)
+
+    async def _capture_explain(
+        self, profile: QueryProfile, query: str, args: tuple, seconds: float
+    ) -> None:
+        # Runs in its own task: don't charge the EXPLAIN to the request that triggered it.
+        postgres.query_stats.set(None)
+        _capturing.set(True)
+        try:
+            async with self._explain_slots:
+                pool = await postgres.DataBasePool.get_pool()
+                async with pool.acquire(timeout=5) as connection:
+                    async with connection.transaction(readonly=True):
+                        timeout_ms = int(config.QUERY_PROFILING["explain_timeout_ms"])
+                        await connection.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+                        raw = await connection.fetchval(
+                            f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}",
+                            *args,
+                        )
+            plan = json.loads(raw) if isinstance(raw, str) else raw
+            profile.explains.append({
+                "captured_at": datetime.now().isoformat(),
+                "observed_ms": round(seconds * 1000, 3),
+                "plan": plan,
+            })
+        except Exception as e:
+            logger.warning(f"[Profiling] EXPLAIN failed for {fingerprint_id(profile.fingerprint)}: {e}")
+        finally:
+            profile.explaining = False
+
+    def summaries(self, sort: str = "total_ms", limit: int = 50) -> list[dict]:
+        rows = [profile.summary() for profile in self._profiles.values()]
+        rows.sort(key=lambda row: row.get(sort, 0), reverse=True)
+        return rows[:limit]
+
+    def get(self, profile_id: str) -> Optional[dict[str, Any]]:
+        for profile in self._profiles.values():
+            if fingerprint_id(profile.fingerprint) == profile_id:
+                return {**profile.summary(), "explain_samples": list(profile.explains)}
+        return None
+
+    def reset(self) -> None:
+        self._profiles.clear()
+        self._fingerprints.clear()
+        self.started_at = datetime.now()
+
+
+profiler: Optional[QueryProfiler] = None
+
+
+def enable_profiling() -> QueryProfiler:
+    """Install the profiler as the statement hook on InstrumentedConnection."""
+    global profiler
+    if profiler is None:
+        profiler = QueryProfiler()
+        postgres.set_statement_hook(profiler.record)
+        logger.info("[Profiling] Query profiling enabled")
+    return profiler
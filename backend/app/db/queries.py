@@ -0,0 +1,893 @@
+"""
+Hot statement registry.
+
+Statements registered here are executed through prepared statements kept per
+connection, so they never compete with ad-hoc SQL for asyncpg's per-connection
+statement cache. Those registered with ``hot=True`` (booking, promotion
+evaluation, dashboard cards, customer lookup, cache versions) are prepared as
+soon as a pooled connection opens (the pool ``init`` callback in app.db.postgres);
+the rest are prepared the first time a connection runs them. Route handlers pass the constants to the usual
+``connection.fetch/fetchrow/fetchval/execute`` calls; InstrumentedConnection
+recognises registered text and routes it to the prepared statement.
+
+Dynamic filters use a fixed shape (``$n::type IS NULL OR ...``) so each
+endpoint maps to a bounded set of statements instead of one per filter
+combination.
+"""
+
+from app.services.metrics import Counter
+
+# name -> SQL, and the reverse lookup used on every call
+STATEMENTS: dict[str, str] = {}
+NAMES_BY_SQL: dict[str, str] = {}
+# Names prepared up front on every new pooled connection.
+HOT_STATEMENTS: set[str] = set()
+
+STATEMENT_CALLS = Counter(
+    "db_registered_statement_calls_total",
+    "Registered statement executions; result=hit used a statement prepared on the connection",
+    label_names=("statement", "result"),
+)
+ADHOC_CALLS = Counter(
+    "db_adhoc_statement_calls_total",
+    "Executions of SQL that is not in the statement registry",
+    label_names=("method",),
+)
+
+
+def register(name: str, sql: str, *, hot: bool = False) -> str:
+    if name in STATEMENTS:
+        raise ValueError(f"Statement '{name}' is already registered")
+    STATEMENTS[name] = sql
+    NAMES_BY_SQL[sql] = name
+    if hot:
+        HOT_STATEMENTS.add(name)
+    return sql
+
+
+# ==================== Booking ====================
+
+# Serializes bookings that share an Idempotency-Key until the holder's transaction ends.
+BOOKING_IDEMPOTENCY_LOCK = register(
+    "booking.idempotency_lock",
+    "SELECT pg_advisory_xact_lock(hashtextextended($1, 0))",
+    hot=True,
+)
+
+BOOKING_IDEMPOTENCY_GET = register(
+    "booking.idempotency_get",
+    """
+    SELECT request_hash, response::text AS response
+    FROM booking_idempotency
+    WHERE idempotency_key = $1
+    """,
+    hot=True,
+)
+
+BOOKING_IDEMPOTENCY_INSERT = register(
+    "booking.idempotency_insert",
+    """
+    INSERT INTO booking_idempotency (idempotency_key, request_hash, sell_invoice_id, response)
+    VALUES ($1, $2, $3, $4::jsonb)
+    """,
+    hot=True,
+)
+
+CUSTOMER_ID_BY_CODE = register(
+    "booking.customer_id_by_code",
+    "SELECT customer_id FROM customer WHERE customer_code = $1",
+    hot=True,
+)
+
+INSERT_BOOKING_CUSTOMER = register(
+    "booking.insert_customer",
+    """
+    INSERT INTO customer (full_name, member_wallet_remain)
+    VALUES ($1, 0)
+    RETURNING customer_id
+    """,
+    hot=True,
+)
+
+INSERT_SELL_INVOICE = register(
+    "booking.insert_sell_invoice",
+    """
+    INSERT INTO sell_invoice (customer_id, issue_at, total_amount, discount_amount, final_amount, status)
+    VALUES ($1, $2, $3, 0, $3, 'PAID')
+    RETURNING sell_invoice_id
+    """,
+    hot=True,
+)
+
+SELL_INVOICE_NO = register(
+    "booking.invoice_no",
+    "SELECT invoice_no FROM sell_invoice WHERE sell_invoice_id = $1",
+    hot=True,
+)
+
+INSERT_SELL_INVOICE_ITEM = register(
+    "booking.insert_sell_invoice_item",
+    """
+    INSERT INTO sell_invoice_item (item_id, sell_invoice_id, description, qty, total_price)
+    VALUES ($1, $2, $3, $4, $5)
+    """,
+    hot=True,
+)
+
+INSERT_TREATMENT_SESSION = register(
+    "booking.insert_treatment_session",
+    """
+    INSERT INTO treatment_session (
+      treatment_id,
+      sell_invoice_id,
+      customer_id,
+      session_date,
+      session_time,
+      note
+    )
+    VALUES ($1, $2, $3, $4, $5, $6)
+    """,
+    hot=True,
+)
+
+INVOICE_ITEMS_TOTAL = register(
+    "booking.invoice_items_total",
+    """
+    SELECT COALESCE(SUM(total_price), 0)
+    FROM sell_invoice_item
+    WHERE sell_invoice_id = $1
+    """,
+    hot=True,
+)
+
+INVOICE_DISCOUNT_TOTAL = register(
+    "booking.invoice_discount_total",
+    """
+    SELECT COALESCE(SUM(CASE WHEN amount < 0 THEN -amount ELSE 0 END), 0)
+    FROM sell_invoice_promotion_line
+    WHERE sell_invoice_id = $1
+    """,
+    hot=True,
+)
+
+UPDATE_SELL_INVOICE_TOTALS = register(
+    "booking.update_invoice_totals",
+    """
+    UPDATE sell_invoice
+    SET total_amount = $2,
+        discount_amount = $3,
+        final_amount = $4
+    WHERE sell_invoice_id = $1
+    """,
+    hot=True,
+)
+
+# ==================== Promotion evaluation ====================
+
+PROMOTION_IS_STACKABLE = register(
+    "promotion.is_stackable",
+    "SELECT is_stackable FROM promotion WHERE promotion_id = $1",
+    hot=True,
+)
+
+PROMOTION_STACK_CONFLICT = register(
+    "promotion.stack_conflict",
+    """
+    SELECT EXISTS (
+      SELECT 1
+      FROM sell_invoice_promotion_line sip
+      JOIN promotion p ON p.promotion_id = sip.promotion_id
+      WHERE sip.sell_invoice_id = $1
+        AND p.is_stackable = false
+        AND sip.promotion_id <> $2
+    )
+    """,
+    hot=True,
+)
+
+PROMOTION_GROUP_COUNT = register(
+    "promotion.condition_group_count",
+    """
+    SELECT COUNT(*)
+    FROM promotion_condition_group
+    WHERE promotion_id = $1
+    """,
+    hot=True,
+)
+
+PROMOTION_GROUPS = register(
+    "promotion.condition_groups",
+    """
+    SELECT condition_group_id
+    FROM promotion_condition_group
+    WHERE promotion_id = $1
+    ORDER BY sort_order
+    """,
+    hot=True,
+)
+
+PROMOTION_GROUP_RULES = register(
+    "promotion.condition_rules",
+    """
+    SELECT rule_type, op, amount_value, item_id, qty_base_unit
+    FROM promotion_condition_rule
+    WHERE condition_group_id = $1
+    """,
+    hot=True,
+)
+
+INVOICE_HAS_ITEM = register(
+    "promotion.invoice_has_item",
+    """
+    SELECT EXISTS (
+      SELECT 1
+      FROM sell_invoice_item
+      WHERE sell_invoice_id = $1
+        AND item_id = $2
+    )
+    """,
+    hot=True,
+)
+
+INVOICE_ITEM_QTY = register(
+    "promotion.invoice_item_qty",
+    """
+    SELECT COALESCE(SUM(qty), 0)
+    FROM sell_invoice_item
+    WHERE sell_invoice_id = $1
+      AND item_id = $2
+    """,
+    hot=True,
+)
+
+INVOICE_ITEM_TOTAL = register(
+    "promotion.invoice_item_total",
+    """
+    SELECT COALESCE(SUM(total_price), 0)
+    FROM sell_invoice_item
+    WHERE sell_invoice_id = $1
+      AND item_id = $2
+    """,
+    hot=True,
+)
+
+CUSTOMER_OTHER_INVOICE_COUNT = register(
+    "promotion.customer_other_invoice_count",
+    """
+    SELECT COUNT(*)
+    FROM sell_invoice
+    WHERE customer_id = $1
+      AND sell_invoice_id <> $2
+    """,
+    hot=True,
+)
+
+CUSTOMER_WALLET_TOPUP = register(
+    "promotion.customer_wallet_topup",
+    """
+    SELECT COALESCE(SUM(amount), 0)
+    FROM wallet_movement
+    WHERE customer_id = $1
+      AND amount > 0
+    """,
+    hot=True,
+)
+
+PROMOTION_BENEFITS = register(
+    "promotion.benefits",
+    """
+    SELECT promotion_benefit_id, benefit_type, target_scope, target_item_id,
+           value_percent, value_amount, free_item_id, free_qty_base_unit
+    FROM promotion_benefit
+    WHERE promotion_id = $1
+    """,
+    hot=True,
+)
+
+INSERT_PROMOTION_REDEMPTION = register(
+    "promotion.insert_redemption",
+    """
+    INSERT INTO promotion_redemption (
+      promotion_id,
+      sell_invoice_id,
+      customer_id,
+      coupon_code_used
+    )
+    VALUES ($1, $2, $3, NULL)
+    RETURNING promotion_redemption_id
+    """,
+    hot=True,
+)
+
+INSERT_DISCOUNT_LINE = register(
+    "promotion.insert_discount_line",
+    """
+    INSERT INTO sell_invoice_promotion_line (
+      sell_invoice_id,
+      promotion_redemption_id,
+      promotion_id,
+      promotion_benefit_id,
+      line_type,
+      amount,
+      created_at
+    )
+    VALUES ($1, $2, $3, $4, 'DISCOUNT', $5, now())
+    """,
+    hot=True,
+)
+
+INSERT_FREE_ITEM_LINE = register(
+    "promotion.insert_free_item_line",
+    """
+    INSERT INTO sell_invoice_promotion_line (
+      sell_invoice_id,
+      promotion_redemption_id,
+      promotion_id,
+      promotion_benefit_id,
+      line_type,
+      amount,
+      free_item_id,
+      free_qty_base_unit,
+      created_at
+    )
+    VALUES ($1, $2, $3, $4, 'FREE_ITEM', 0, $5, $6, now())
+    """,
+    hot=True,
+)
+
+INSERT_PROMOTION_STOCK_MOVEMENT = register(
+    "promotion.insert_stock_movement",
+    """
+    INSERT INTO stock_movement (
+      created_at,
+      item_id,
+      movement_type,
+      qty,
+      sell_invoice_id,
+      purchase_invoice_id
+    )
+    VALUES (now(), $1, 'USE_FOR_PROMOTION', $2, $3, NULL)
+    """,
+    hot=True,
+)
+
+INSERT_WALLET_CREDIT_LINE = register(
+    "promotion.insert_wallet_credit_line",
+    """
+    INSERT INTO sell_invoice_promotion_line (
+      sell_invoice_id,
+      promotion_redemption_id,
+      promotion_id,
+      promotion_benefit_id,
+      line_type,
+      amount,
+      wallet_credit_amount,
+      created_at
+    )
+    VALUES ($1, $2, $3, $4, 'WALLET_CREDIT', 0, $5, now())
+    """,
+    hot=True,
+)
+
+# ==================== Dashboard cards ====================
+
+REVENUE_FOR_DATE = register(
+    "dashboard.revenue_for_date",
+    """
+    SELECT COALESCE(SUM(final_amount), 0)
+    FROM sell_invoice
+    WHERE DATE(issue_at) = $1 AND status = 'PAID'
+    """,
+    hot=True,
+)
+
+APPOINTMENT_COUNTS_FOR_DATE = register(
+    "dashboard.appointment_counts_for_date",
+    """
+    SELECT
+        COUNT(*) AS total,
+        COUNT(*) FILTER (WHERE appointment_status = 'INCOMPLETE') AS incomplete,
+        COUNT(*) FILTER (WHERE appointment_status = 'COMPLETE') AS complete
+    FROM appointment
+    WHERE DATE(appointment_time) = $1
+    """,
+    hot=True,
+)
+
+PROMOTIONS_USED_FOR_DATE = register(
+    "dashboard.promotions_used_for_date",
+    """
+    SELECT
+        COUNT(*) AS usage_count,
+        COALESCE(SUM(discount_total), 0) AS total_discount
+    FROM promotion_redemption
+    WHERE DATE(redeemed_at) = $1
+    """,
+    hot=True,
+)
+
+REVENUE_FOR_RANGE = register(
+    "dashboard.revenue_for_range",
+    """
+    SELECT COALESCE(SUM(final_amount), 0)
+    FROM sell_invoice
+    WHERE DATE(issue_at) BETWEEN $1 AND $2 AND status = 'PAID'
+    """,
+    hot=True,
+)
+
+TOP_TREATMENTS = register(
+    "dashboard.top_treatments",
+    """
+    SELECT
+        ts.treatment_id,
+        t.name AS treatment_name,
+        COUNT(*) AS count
+    FROM treatment_session ts
+    JOIN treatment t ON ts.treatment_id = t.treatment_id
+    WHERE DATE(ts.session_date) >= $1 AND DATE(ts.session_date) <= $2
+    GROUP BY ts.treatment_id, t.name
+    ORDER BY count DESC
+    LIMIT $3
+    """,
+    hot=True,
+)
+
+# Items at or below their restock threshold, emptiest first.
+LOW_STOCK_ITEMS = register(
+    "dashboard.low_stock_items",
+    """
+    SELECT item_id, name, variant_name, current_qty, restock_threshold
+    FROM item_catalog
+    WHERE current_qty <= restock_threshold
+    ORDER BY current_qty ASC, name ASC
+    LIMIT $1
+    """,
+    hot=True,
+)
+
+OUT_OF_STOCK_COUNT = register(
+    "dashboard.out_of_stock_count",
+    """
+    SELECT COUNT(*)
+    FROM item_catalog
+    WHERE current_qty <= 0
+    """,
+    hot=True,
+)
+
+# ==================== Customer lookup ====================
+
+_CUSTOMER_COLUMNS = """
+      customer_id,
+      customer_code,
+      full_name,
+      nickname,
+      phone,
+      date_of_birth,
+      gender,
+      member_wallet_remain"""
+
+CUSTOMER_LIST = register(
+    "customer.list",
+    f"""
+    SELECT{_CUSTOMER_COLUMNS}
+    FROM customer
+    ORDER BY full_name ASC NULLS LAST, customer_id ASC
+    """,
+    hot=True,
+)
+
+CUSTOMER_BY_ID = register(
+    "customer.by_id",
+    f"""
+    SELECT{_CUSTOMER_COLUMNS}
+    FROM customer
+    WHERE customer_id = $1
+    """,
+    hot=True,
+)
+
+# Treatment names and image keys come from the in-process catalog (app.services.catalog).
+CUSTOMER_SESSIONS = register(
+    "customer.sessions",
+    """
+    SELECT
+      treatment_id,
+      session_date,
+      age_at_session,
+      note,
+      session_time,
+      sell_invoice_id
+    FROM treatment_session
+    WHERE customer_id = $1
+    ORDER BY session_date DESC NULLS LAST, treatment_id ASC
+    """,
+    hot=True,
+)
+
+# Whole GET /resource/customers/{id}/treatments body, built in Postgres.
+# $1 customer_id, $2 jsonb map image_obj_key -> signed URL. NULL when the customer does not exist.
+CUSTOMER_TREATMENTS_DOCUMENT = register(
+    "customer.treatments_document",
+    """
+    SELECT json_build_object(
+      'customer', json_build_object(
+        'customer_id', c.customer_id,
+        'customer_code', c.customer_code,
+        'full_name', c.full_name,
+        'nickname', c.nickname,
+        'phone', c.phone,
+        'date_of_birth', c.date_of_birth,
+        'gender', c.gender,
+        'member_wallet_remain', c.member_wallet_remain::float8
+      ),
+      'treatments', COALESCE((
+        SELECT json_agg(
+          json_build_object(
+            'treatment_id', ts.treatment_id,
+            'treatment_name', t.name,
+            'image_obj_key', t.image_obj_key,
+            'image_url', $2::jsonb ->> t.image_obj_key,
+            'session_date', ts.session_date,
+            'session_time', ts.session_time,
+            'age_at_session', ts.age_at_session,
+            'note', ts.note,
+            'sell_invoice_id', ts.sell_invoice_id
+          )
+          ORDER BY ts.session_date DESC NULLS LAST, ts.treatment_id ASC
+        )
+        FROM treatment_session ts
+        JOIN treatment t ON t.treatment_id = ts.treatment_id
+        WHERE ts.customer_id = c.customer_id
+      ), '[]'::json)
+    )::text
+    FROM customer c
+    WHERE c.customer_id = $1
+    """,
+    hot=True,
+)
+
+# ==================== Purchase invoices ====================
+
+# Whole GET /purchase-invoice/{id} body (header + items), built in Postgres; NULL when not found.
+PURCHASE_INVOICE_DOCUMENT = register(
+    "purchase.invoice_document",
+    """
+    SELECT json_build_object(
+      'header', json_build_object(
+        'purchase_invoice_id', pi.purchase_invoice_id,
+        'purchase_no', pi.purchase_no,
+        'supplier_id', pi.supplier_id,
+        'supplier_name', s.name,
+        'issue_at', pi.issue_at
+      ),
+      'items', COALESCE((
+        SELECT json_agg(
+          json_build_object(
+            'purchase_invoice_item_id', pii.item_id,
+            'purchase_invoice_id', pii.purchase_invoice_id,
+            'item_id', pii.item_id,
+            'item_code', ic.sku,
+            'item_name', ic.name,
+            'item_variant', ic.variant_name,
+            'item_type', ic.item_type,
+            'qty', pii.qty::float8,
+            'unit', ic.unit,
+            'purchase_price_per_unit', pii.purchase_price_per_unit::float8,
+            'expire_date', pii.expire_date
+          )
+          ORDER BY pii.item_id ASC
+        )
+        FROM purchase_invoice_item pii
+        JOIN item_catalog ic ON ic.item_id = pii.item_id
+        WHERE pii.purchase_invoice_id = pi.purchase_invoice_id
+      ), '[]'::json)
+    )::text
+    FROM purchase_invoice pi
+    LEFT JOIN supplier s ON s.supplier_id = pi.supplier_id
+    WHERE pi.purchase_invoice_id = $1
+    """,
+)
+
+# ==================== Catalog / stock listings (normalized filters) ====================
+
+ITEM_ID_BY_SKU = register(
+    "catalog.item_id_by_sku",
+    "SELECT item_id FROM item_catalog WHERE sku = $1",
+)
+
+ITEM_ID_BY_NAME = register(
+    "catalog.item_id_by_name",
+    """
+    SELECT item_id
+    FROM item_catalog
+    WHERE name = $1
+      AND ($2::text IS NULL OR variant_name = $2)
+      AND ($3::text IS NULL OR item_type::text = $3)
+    ORDER BY item_id ASC
+    LIMIT 1
+    """,
+)
+
+# $1 sku, $2 name, $3 variant (ILIKE patterns), $4 item_type, $5 'Low'/'Ready' status,
+# $6 unit pattern, $7 sell_price
+_ITEM_CATALOG_FILTER = """
+    WHERE ($1::text IS NULL OR sku ILIKE $1)
+      AND ($2::text IS NULL OR name ILIKE $2)
+      AND ($3::text IS NULL OR variant_name ILIKE $3)
+      AND ($4::text IS NULL OR item_type::text = $4)
+      AND ($5::text IS NULL OR ($5 = 'Low') = (
+            current_qty IS NOT NULL
+            AND restock_threshold IS NOT NULL
+            AND current_qty <= restock_threshold
+          ))
+      AND ($6::text IS NULL OR unit::text ILIKE $6)
+      AND ($7::numeric IS NULL OR sell_price = $7)"""
+
+ITEM_CATALOG_COUNT = register(
+    "catalog.item_catalog_count",
+    f"SELECT COUNT(*) FROM item_catalog{_ITEM_CATALOG_FILTER}",
+)
+
+ITEM_CATALOG_PAGE = register(
+    "catalog.item_catalog_page",
+    f"""
+    SELECT
+      item_id,
+      sku,
+      name,
+      variant_name,
+      item_type,
+      sell_price,
+      unit,
+      current_qty,
+      restock_threshold
+    FROM item_catalog{_ITEM_CATALOG_FILTER}
+    ORDER BY item_id ASC
+    LIMIT $8 OFFSET $9
+    """,
+)
+
+# $1 sku, $2 name, $3 variant, $5 supplier (ILIKE patterns), $4 item_type,
+# $6/$7 created_at range, $8/$9 qty range, $10/$11 buy price range,
+# $12/$13 expire_date range, $14 limit
+_IMPORT_ITEMS_SQL = """
+    SELECT
+      sm.created_at AS created_at,
+      s.name AS supplier_name,
+      ic.sku AS item_code,
+      ic.name AS item_name,
+      ic.variant_name AS item_variant,
+      ic.item_type AS item_type,
+      sm.qty,
+      pii.purchase_price_per_unit,
+      pii.expire_date
+    FROM stock_movement sm
+    JOIN purchase_invoice pi ON pi.purchase_invoice_id = sm.purchase_invoice_id
+    LEFT JOIN supplier s ON s.supplier_id = pi.supplier_id
+    JOIN item_catalog ic ON ic.item_id = sm.item_id
+    LEFT JOIN purchase_invoice_item pii
+      ON pii.purchase_invoice_id = sm.purchase_invoice_id
+     AND pii.item_id = sm.item_id
+    WHERE sm.movement_type = 'PURCHASE_IN'
+      AND ($1::text IS NULL OR ic.sku ILIKE $1)
+      AND ($2::text IS NULL OR ic.name ILIKE $2)
+      AND ($3::text IS NULL OR ic.variant_name ILIKE $3)
+      AND ($4::text IS NULL OR ic.item_type::text = $4)
+      AND ($5::text IS NULL OR s.name ILIKE $5)
+      AND ($6::timestamp IS NULL OR sm.created_at >= $6)
+      AND ($7::timestamp IS NULL OR sm.created_at <= $7)
+      AND ($8::numeric IS NULL OR sm.qty >= $8)
+      AND ($9::numeric IS NULL OR sm.qty <= $9)
+      AND ($10::numeric IS NULL OR pii.purchase_price_per_unit >= $10)
+      AND ($11::numeric IS NULL OR pii.purchase_price_per_unit <= $11)
+      AND ($12::date IS NULL OR pii.expire_date >= $12)
+      AND ($13::date IS NULL OR pii.expire_date <= $13)
+    ORDER BY sm.created_at {direction} NULLS LAST, sm.purchase_invoice_id {direction}
+    LIMIT $14
+    """
+
+IMPORT_ITEMS = {
+    direction: register(f"catalog.import_items_{direction.lower()}", _IMPORT_ITEMS_SQL.format(direction=direction))
+    for direction in ("ASC", "DESC")
+}
+
+# $1 sku, $2 name, $3 variant (ILIKE patterns), $4 item_type, $5 movement_type,
+# $6/$7 created_at range, $8/$9 qty range, $10 limit
+_WITHDRAW_ITEMS_SQL = """
+    SELECT
+      sm.created_at AS created_at,
+      sm.movement_type AS movement_type,
+      ic.sku AS item_code,
+      ic.name AS item_name,
+      ic.variant_name AS item_variant,
+      sm.qty,
+      ic.unit AS unit
+    FROM stock_movement sm
+    JOIN item_catalog ic ON ic.item_id = sm.item_id
+    WHERE sm.movement_type = 'WITHDRAW'
+      AND ($1::text IS NULL OR ic.sku ILIKE $1)
+      AND ($2::text IS NULL OR ic.name ILIKE $2)
+      AND ($3::text IS NULL OR ic.variant_name ILIKE $3)
+      AND ($4::text IS NULL OR ic.item_type::text = $4)
+      AND ($5::text IS NULL OR sm.movement_type::text = $5)
+      AND ($6::timestamp IS NULL OR sm.created_at >= $6)
+      AND ($7::timestamp IS NULL OR sm.created_at <= $7)
+      AND ($8::numeric IS NULL OR sm.qty >= $8)
+      AND ($9::numeric IS NULL OR sm.qty <= $9)
+    ORDER BY sm.created_at {direction} NULLS LAST, sm.item_id {direction}
+    LIMIT $10
+    """
+
+WITHDRAW_ITEMS = {
+    direction: register(f"catalog.withdraw_items_{direction.lower()}", _WITHDRAW_ITEMS_SQL.format(direction=direction))
+    for direction in ("ASC", "DESC")
+}
+
+# Full treatment catalog snapshot (app.services.catalog), listing order included.
+CATALOG_TREATMENTS = register(
+    "catalog.treatments",
+    """
+    SELECT
+      treatment_id,
+      name,
+      category,
+      price,
+      description,
+      image_obj_key
+    FROM treatment
+    ORDER BY name ASC, treatment_id ASC
+    """,
+)
+
+CATALOG_RECIPES = register(
+    "catalog.recipes",
+    """
+    SELECT treatment_id, item_id, qty_per_session, sell_price, description
+    FROM treatment_recipe
+    ORDER BY treatment_id ASC, item_id ASC
+    """,
+)
+
+# ==================== Chat ====================
+
+# Newest page ($2 NULL) or the page older than message $2, returned oldest-first.
+MESSAGES_BEFORE = register(
+    "chat.messages_before",
+    """
+    SELECT message_id, role, content, created_at
+    FROM (
+      SELECT message_id, role, content, created_at
+      FROM messages
+      WHERE conversation_id = $1
+        AND ($2::bigint IS NULL OR message_id < $2)
+      ORDER BY message_id DESC
+      LIMIT $3
+    ) page
+    ORDER BY message_id ASC
+    """,
+)
+
+MESSAGES_AFTER = register(
+    "chat.messages_after",
+    """
+    SELECT message_id, role, content, created_at
+    FROM messages
+    WHERE conversation_id = $1
+      AND message_id > $2
+    ORDER BY message_id ASC
+    LIMIT $3
+    """,
+)
+
+# EXISTS stops at the first matching message per conversation (trigram index on content).
+CONVERSATIONS_MATCHING = register(
+    "chat.conversations_matching",
+    """
+    SELECT c.conversation_id, c.title, c.updated_at
+    FROM conversations c
+    WHERE EXISTS (
+      SELECT 1
+      FROM messages m
+      WHERE m.conversation_id = c.conversation_id
+        AND m.content ILIKE $1
+    )
+    ORDER BY c.updated_at DESC
+    LIMIT 50
+    """,
+)
+
+# ==================== Chat agent (context, query log) ====================
+
+CONTEXT_SUMMARY = register(
+    "agent.context_summary",
+    """
+    SELECT summary, summary_message_id
+    FROM conversations
+    WHERE conversation_id = $1
+    """,
+)
+
+# Turns not yet folded into the summary, newest first. $2 summary_message_id (NULL = none), $3 scan cap.
+CONTEXT_RECENT = register(
+    "agent.context_recent",
+    """
+    SELECT message_id, role, content, token_count
+    FROM messages
+    WHERE conversation_id = $1
+      AND message_id > COALESCE($2::bigint, 0)
+    ORDER BY message_id DESC
+    LIMIT $3
+    """,
+)
+
+# Compare-and-set on summary_message_id so two concurrent folds do not overwrite each other.
+CONTEXT_SUMMARY_UPDATE = register(
+    "agent.context_summary_update",
+    """
+    UPDATE conversations
+    SET summary = $2, summary_message_id = $3
+    WHERE conversation_id = $1
+      AND summary_message_id IS NOT DISTINCT FROM $4::bigint
+    """,
+)
+
+# One row per agent query of a question; arrays are aligned by position.
+AGENT_QUERY_LOG_INSERT = register(
+    "agent.query_log_insert",
+    """
+    INSERT INTO agent_query_log (
+      conversation_id, message_id, sql_text, status, estimated_cost, row_count, duration_ms, error
+    )
+    SELECT $1, $2, q.sql_text, q.status, q.estimated_cost, q.row_count, q.duration_ms, q.error
+    FROM unnest(
+      $3::text[], $4::text[], $5::numeric[], $6::int[], $7::numeric[], $8::text[]
+    ) AS q(sql_text, status, estimated_cost, row_count, duration_ms, error)
+    """,
+)
+
+# ==================== HTTP cache ====================
+
+TABLE_VERSIONS = register(
+    "cache.table_versions",
+    """
+    SELECT table_name, version, updated_at
+    FROM table_version
+    WHERE table_name = ANY($1::text[])
+    """,
+    hot=True,
+)
+
+
+def cache_report() -> dict:
+    """Hit rates of registered statements (this worker) plus the ad-hoc share."""
+    calls: dict[str, dict[str, float]] = {name: {"hit": 0, "miss": 0} for name in STATEMENTS}
+    for (name, result), value in STATEMENT_CALLS.snapshot().items():
+        calls.setdefault(name, {"hit": 0, "miss": 0})[result] = value
+
+    statements = []
+    for name, counts in calls.items():
+        total = counts["hit"] + counts["miss"]
+        statements.append({
+            "name": name,
+            "calls": int(total),
+            "hits": int(counts["hit"]),
+            "misses": int(counts["miss"]),
+            "hit_rate": round(counts["hit"] / total, 4) if total else None,
+        })
+    statements.sort(key=lambda row: row["calls"], reverse=True)
+
+    registered_calls = sum(row["calls"] for row in statements)
+    registered_hits = sum(row["hits"] for row in statements)
+    adhoc_calls = int(sum(ADHOC_CALLS.snapshot().values()))
+    all_calls = registered_calls + adhoc_calls
+    return {
+        "registered_statements": len(STATEMENTS),
+        "hot_statements": len(HOT_STATEMENTS),
+        "registered_calls": registered_calls,
+        "adhoc_calls": adhoc_calls,
+        "hit_rate": round(registered_hits / registered_calls, 4) if registered_calls else None,
+        "registry_coverage": round(registered_calls / all_calls, 4) if all_calls else None,
+        "statements": statements,
+    }
@@ -1,3 +1,7 @@
+-- EXTENSIONS
+-- pg_trgm backs chat search: trigram GIN serves ILIKE '%term%' and, unlike tsvector parsers, needs no word breaks (Thai).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- ENUM
 CREATE TYPE "gender" AS ENUM (
   'MALE',
@@ -31,6 +35,8 @@ CREATE TYPE "unit_type" AS ENUM (
 CREATE TYPE "stock_movement_type" AS ENUM (
   'OPENING_BALANCE',
   'IMPORT',
+  'PURCHASE_IN',
+  'WITHDRAW',
   'USE_FOR_PROMOTION',
   'USE_FOR_TREATMENT',
   'WASTE',
@@ -70,6 +76,11 @@ CREATE TYPE "invoice_promo_line_type" AS ENUM (
   'WALLET_CREDIT'
 );
 
+CREATE TYPE "appointment_status" AS ENUM (
+  'INCOMPLETE',
+  'COMPLETE'
+);
+
 CREATE TYPE "chat_role" AS ENUM (
   'USER',
   'SYSTEM'
@@ -80,9 +91,13 @@ CREATE TYPE "chat_role" AS ENUM (
 CREATE TABLE conversations (
   conversation_id            bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
   title         TEXT,
+  -- Rolling summary of every message up to summary_message_id (agent context, app/agents/context.py)
+  summary       TEXT,
+  summary_message_id bigint,
   created_at    timestamp DEFAULT (now()),
   updated_at    timestamp DEFAULT (now())
 );
+CREATE INDEX idx_conversations_updated_at ON conversations (updated_at DESC);
 
 -- One message per turn (user/system)
 CREATE TABLE messages (
@@ -94,7 +109,25 @@ CREATE TABLE messages (
   model           TEXT,
   created_at      timestamp DEFAULT (now())
 );
-CREATE INDEX idx_messages_conversation_id ON messages (conversation_id);
+-- Keyset pages within a conversation ("messages before/after message_id X")
+CREATE INDEX idx_messages_conversation_message ON messages (conversation_id, message_id);
+CREATE INDEX idx_messages_content_trgm ON messages USING gin (content gin_trgm_ops);
+
+-- SQL executed by the chat agent, one row per query attempt (app/agents/sql_guard.py).
+-- status: OK, TRUNCATED (row limit hit), REJECTED (guard or cost check), TIMEOUT, ERROR
+CREATE TABLE agent_query_log (
+  agent_query_id   bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  conversation_id  bigint NOT NULL REFERENCES conversations(conversation_id) ON DELETE CASCADE,
+  message_id       bigint REFERENCES messages(message_id) ON DELETE CASCADE,
+  sql_text         TEXT NOT NULL,
+  status           TEXT NOT NULL,
+  estimated_cost   numeric,
+  row_count        INT,
+  duration_ms      numeric,
+  error            TEXT,
+  created_at       timestamp DEFAULT (now())
+);
+CREATE INDEX idx_agent_query_log_conversation_id ON agent_query_log (conversation_id);
 
 CREATE TABLE "customer" (
   "customer_id" bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
@@ -107,6 +140,15 @@ CREATE TABLE "customer" (
   "member_wallet_remain" decimal(10,2) DEFAULT 0
 );
 
+CREATE TABLE "appointment" (
+  "appointment_id" bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  "customer_id" bigint REFERENCES "customer" ("customer_id"),
+  "appointment_time" timestamp NOT NULL,
+  "appointment_status" appointment_status NOT NULL DEFAULT 'INCOMPLETE'
+);
+CREATE INDEX idx_appointment_customer_id ON appointment (customer_id);
+CREATE INDEX idx_appointment_time ON appointment (appointment_time);
+
 CREATE TABLE supplier (
   supplier_id   BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
   supplier_code VARCHAR(50) UNIQUE,
@@ -177,6 +219,17 @@ CREATE TABLE "sell_invoice" (
 );
 CREATE INDEX idx_sell_invoice_customer_id ON sell_invoice (customer_id);
 
+-- POST /booking retries: Idempotency-Key header -> the invoice it created and the response sent.
+-- request_hash detects a key reused for a different booking.
+CREATE TABLE booking_idempotency (
+  idempotency_key  varchar(255) PRIMARY KEY,
+  request_hash     text NOT NULL,
+  sell_invoice_id  bigint NOT NULL REFERENCES sell_invoice (sell_invoice_id) ON DELETE CASCADE,
+  response         jsonb NOT NULL,
+  created_at       timestamp DEFAULT (now())
+);
+CREATE INDEX idx_booking_idempotency_sell_invoice_id ON booking_idempotency (sell_invoice_id);
+
 CREATE TABLE "wallet_movement" (
   "created_at" timestamp DEFAULT (now()),
   "customer_id" bigint REFERENCES "customer" ("customer_id") ON DELETE CASCADE,
@@ -230,11 +283,25 @@ CREATE INDEX idx_stock_movement_item_id ON stock_movement (item_id);
 CREATE INDEX idx_stock_movement_sell_invoice_id ON stock_movement (sell_invoice_id);
 CREATE INDEX idx_stock_movement_purchase_invoice_id ON stock_movement (purchase_invoice_id);
 
+-- Remaining quantity per purchase lot, maintained incrementally by triggers (see trigger.sql).
+CREATE TABLE "stock_lot" (
+  "purchase_invoice_id" bigint REFERENCES "purchase_invoice" ("purchase_invoice_id") ON DELETE CASCADE,
+  "item_id" bigint REFERENCES "item_catalog" ("item_id") ON DELETE CASCADE,
+  "expire_date" date,
+  "qty_received" decimal(12,2) NOT NULL DEFAULT 0,
+  "qty_remaining" decimal(12,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY ("purchase_invoice_id", "item_id")
+);
+CREATE INDEX idx_stock_lot_expire_date ON stock_lot (expire_date) WHERE qty_remaining > 0;
+CREATE INDEX idx_stock_lot_item_fefo ON stock_lot (item_id, expire_date) WHERE qty_remaining > 0;
+
 CREATE TABLE "treatment" (
   "treatment_id" bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
   "name" varchar,
   "image_obj_key" text,
-  "description" varchar
+  "description" varchar,
+  "category" text,
+  "price" bigint
 );
 
 CREATE TABLE "treatment_recipe" (
@@ -325,3 +392,80 @@ CREATE TABLE "sell_invoice_promotion_line" (
 CREATE INDEX idx_sell_invoice_promo_line_sell_invoice_id ON sell_invoice_promotion_line (sell_invoice_id);
 CREATE INDEX idx_sell_invoice_promo_line_promotion_id ON sell_invoice_promotion_line (promotion_id);
 CREATE INDEX idx_sell_invoice_promo_line_promotion_redemption_id ON sell_invoice_promotion_line (promotion_redemption_id);
+
+-- Scheduler run history: one row per job execution across all workers.
+-- (job_id, scheduled_for) is the claim key that keeps each run exactly-once.
+CREATE TABLE scheduler_job_run (
+  run_id         bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  job_id         TEXT NOT NULL,
+  scheduled_for  timestamp NOT NULL,
+  worker         TEXT,
+  status         TEXT NOT NULL DEFAULT 'RUNNING',
+  attempts       INT NOT NULL DEFAULT 1,
+  started_at     timestamp DEFAULT (now()),
+  finished_at    timestamp,
+  duration_ms    INT,
+  message        TEXT,
+  UNIQUE (job_id, scheduled_for)
+);
+CREATE INDEX idx_scheduler_job_run_started_at ON scheduler_job_run (started_at DESC);
+
+-- Change counters for cacheable reference data (treatments, promotions, catalog).
+-- Bumped once per writing statement by bump_table_version() in trigger.sql;
+-- the HTTP cache derives ETags from these versions.
+CREATE TABLE table_version (
+  table_name  TEXT PRIMARY KEY,
+  version     bigint NOT NULL DEFAULT 0,
+  updated_at  timestamptz NOT NULL DEFAULT (now())
+);
+
+-- Active promotions with the treatments their HAS_ITEM rules require, one row per
+-- promotion + treatment name (cheapest treatment wins). Serialized to JSON by
+-- GET /promotion/bundles and cached in memory until a source table changes.
+CREATE VIEW promotion_bundle_view AS
+WITH promo_items AS (
+  SELECT
+    p.promotion_id,
+    p.code,
+    p.name,
+    p.description,
+    COALESCE(pb.value_percent, 0) AS discount_percent,
+    t.treatment_id,
+    t.name AS treatment_name,
+    t.description AS treatment_description,
+    t.category AS treatment_category,
+    t.price AS treatment_price,
+    row_number() OVER (
+      PARTITION BY p.promotion_id, t.name
+      ORDER BY t.price ASC NULLS LAST, t.treatment_id ASC
+    ) AS rn
+  FROM promotion p
+  LEFT JOIN promotion_benefit pb
+    ON pb.promotion_id = p.promotion_id
+   AND pb.benefit_type = 'PERCENT_DISCOUNT'
+  JOIN promotion_condition_group pcg
+    ON pcg.promotion_id = p.promotion_id
+  JOIN promotion_condition_rule pcr
+    ON pcr.condition_group_id = pcg.condition_group_id
+   AND pcr.rule_type = 'HAS_ITEM'
+  JOIN item_catalog ic
+    ON ic.item_id = pcr.item_id
+  JOIN treatment_recipe tr
+    ON tr.item_id = ic.item_id
+  JOIN treatment t
+    ON t.treatment_id = tr.treatment_id
+  WHERE p.is_active = true
+)
+SELECT
+  promotion_id,
+  code,
+  name,
+  description,
+  discount_percent,
+  treatment_id,
+  treatment_name,
+  treatment_description,
+  treatment_category,
+  treatment_price
+FROM promo_items
+WHERE rn = 1;
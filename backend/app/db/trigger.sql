@@ -530,71 +530,419 @@ ON "item_catalog"
 FOR EACH ROW
 EXECUTE FUNCTION sync_item_quantity_from_item_catalog();
 
--- MAINTENANCE (expired stock)
--- waste_expired_stock: write WASTE movements for expired purchase lots.
-CREATE OR REPLACE FUNCTION waste_expired_stock()
-RETURNS void AS $$
-INSERT INTO stock_movement (
-  created_at,
-  item_id,
-  movement_type,
-  qty,
-  sell_invoice_id,
-  purchase_invoice_id
+-- STOCK LOTS (remaining qty per purchase lot)
+-- sync_stock_lot_from_purchase_item: open/adjust/close a lot when its purchase line changes.
+CREATE OR REPLACE FUNCTION sync_stock_lot_from_purchase_item()
+RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    DELETE FROM "stock_lot"
+    WHERE purchase_invoice_id = OLD.purchase_invoice_id
+      AND item_id = OLD.item_id;
+    RETURN OLD;
+  END IF;
+
+  IF TG_OP = 'UPDATE'
+    AND (OLD.item_id IS DISTINCT FROM NEW.item_id
+      OR OLD.purchase_invoice_id IS DISTINCT FROM NEW.purchase_invoice_id) THEN
+    DELETE FROM "stock_lot"
+    WHERE purchase_invoice_id = OLD.purchase_invoice_id
+      AND item_id = OLD.item_id;
+  END IF;
+
+  IF NEW.item_id IS NULL OR NEW.purchase_invoice_id IS NULL THEN
+    RETURN NEW;
+  END IF;
+
+  INSERT INTO "stock_lot" (
+    "purchase_invoice_id",
+    "item_id",
+    "expire_date",
+    "qty_received",
+    "qty_remaining"
+  )
+  VALUES (
+    NEW.purchase_invoice_id,
+    NEW.item_id,
+    NEW.expire_date,
+    COALESCE(NEW.qty, 0),
+    COALESCE(NEW.qty, 0)
+  )
+  ON CONFLICT ("purchase_invoice_id", "item_id")
+  DO UPDATE SET
+    "expire_date" = EXCLUDED.expire_date,
+    "qty_remaining" = GREATEST(
+      "stock_lot".qty_remaining + EXCLUDED.qty_received - "stock_lot".qty_received,
+      0
+    ),
+    "qty_received" = EXCLUDED.qty_received;
+
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_purchase_item_stock_lot
+AFTER INSERT OR UPDATE OR DELETE
+ON "purchase_invoice_item"
+FOR EACH ROW
+EXECUTE FUNCTION sync_stock_lot_from_purchase_item();
+
+-- consume_stock_lots_from_movement: draw outgoing stock from lots.
+-- Movements tied to a purchase lot (e.g. WASTE) draw that lot; everything else
+-- (treatment, promotion, withdraw) draws unexpired lots first-expiry-first-out.
+CREATE OR REPLACE FUNCTION consume_stock_lots_from_movement()
+RETURNS trigger AS $$
+DECLARE
+  remaining decimal(12,2);
+  take decimal(12,2);
+  lot record;
+BEGIN
+  IF NEW.item_id IS NULL OR COALESCE(NEW.qty, 0) >= 0 THEN
+    RETURN NEW;
+  END IF;
+
+  remaining := -NEW.qty;
+
+  IF NEW.purchase_invoice_id IS NOT NULL THEN
+    UPDATE "stock_lot"
+    SET qty_remaining = GREATEST(qty_remaining - remaining, 0)
+    WHERE purchase_invoice_id = NEW.purchase_invoice_id
+      AND item_id = NEW.item_id;
+    RETURN NEW;
+  END IF;
+
+  FOR lot IN
+    SELECT purchase_invoice_id, qty_remaining
+    FROM "stock_lot"
+    WHERE item_id = NEW.item_id
+      AND qty_remaining > 0
+      AND (expire_date IS NULL OR expire_date >= CURRENT_DATE)
+    ORDER BY expire_date ASC NULLS LAST, purchase_invoice_id ASC
+    FOR UPDATE
+  LOOP
+    EXIT WHEN remaining <= 0;
+    take := LEAST(lot.qty_remaining, remaining);
+
+    UPDATE "stock_lot"
+    SET qty_remaining = qty_remaining - take
+    WHERE purchase_invoice_id = lot.purchase_invoice_id
+      AND item_id = NEW.item_id;
+
+    remaining := remaining - take;
+  END LOOP;
+
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_stock_movement_consume_lots
+AFTER INSERT
+ON "stock_movement"
+FOR EACH ROW
+EXECUTE FUNCTION consume_stock_lots_from_movement();
+
+-- Backfill lots for purchase lines recorded before stock_lot existed.
+-- Past WASTE movements are netted out; past treatment usage cannot be
+-- attributed to a lot and is not replayed.
+INSERT INTO "stock_lot" (
+  "purchase_invoice_id",
+  "item_id",
+  "expire_date",
+  "qty_received",
+  "qty_remaining"
 )
 SELECT
-  now(),
+  pii.purchase_invoice_id,
   pii.item_id,
-  'WASTE',
-  -pii.qty,
-  NULL,
-  pii.purchase_invoice_id
+  pii.expire_date,
+  COALESCE(pii.qty, 0),
+  GREATEST(COALESCE(pii.qty, 0) + COALESCE(w.wasted, 0), 0)
 FROM "purchase_invoice_item" pii
-WHERE pii.expire_date IS NOT NULL
-  AND pii.expire_date < CURRENT_DATE
-  AND NOT EXISTS (
-    SELECT 1
-    FROM "stock_movement" sm
-    WHERE sm.item_id = pii.item_id
-      AND sm.purchase_invoice_id = pii.purchase_invoice_id
-      AND sm.movement_type = 'WASTE'
-  );
-$$ LANGUAGE sql;
+LEFT JOIN (
+  SELECT item_id, purchase_invoice_id, SUM(qty) AS wasted
+  FROM "stock_movement"
+  WHERE movement_type = 'WASTE'
+    AND purchase_invoice_id IS NOT NULL
+  GROUP BY item_id, purchase_invoice_id
+) w
+  ON w.item_id = pii.item_id
+ AND w.purchase_invoice_id = pii.purchase_invoice_id
+ON CONFLICT ("purchase_invoice_id", "item_id") DO NOTHING;
 
-CREATE EXTENSION IF NOT EXISTS pg_cron;
-
-SELECT cron.schedule(
-  'waste-expired-daily',
-  '0 0 * * *',
-  $$SELECT waste_expired_stock();$$
-);
+-- MAINTENANCE (expired stock)
+-- waste_expired_stock: write WASTE movements for whatever is left in expired lots
+-- and return how many lots were written off.
+-- clock_timestamp() keeps (created_at, item_id) unique when one item has several expired lots.
+DROP FUNCTION IF EXISTS waste_expired_stock();
+CREATE FUNCTION waste_expired_stock()
+RETURNS integer AS $$
+WITH wasted AS (
+  INSERT INTO stock_movement (
+    created_at,
+    item_id,
+    movement_type,
+    qty,
+    sell_invoice_id,
+    purchase_invoice_id
+  )
+  SELECT
+    clock_timestamp(),
+    sl.item_id,
+    'WASTE',
+    -ceil(sl.qty_remaining),
+    NULL,
+    sl.purchase_invoice_id
+  FROM "stock_lot" sl
+  WHERE sl.expire_date < CURRENT_DATE
+    AND sl.qty_remaining > 0
+  RETURNING 1
+)
+SELECT COUNT(*)::int FROM wasted;
+$$ LANGUAGE sql;
 
 -- DAILY STOCK SNAPSHOT
--- snapshot_daily_stock: store daily item totals from stock_movement.
-CREATE OR REPLACE FUNCTION snapshot_daily_stock(p_stock_date date DEFAULT CURRENT_DATE)
-RETURNS void AS $$
+-- snapshot_daily_stock_range: write daily_stock for every day in [p_from, p_to] in one pass.
+-- Starts from the (p_from - 1) snapshot, falling back to full history only for items
+-- without one, then adds each day's movement deltas through a running window sum.
+CREATE OR REPLACE FUNCTION snapshot_daily_stock_range(p_from date, p_to date)
+RETURNS integer AS $$
+DECLARE
+  affected integer;
 BEGIN
+  IF p_from IS NULL OR p_to IS NULL OR p_to < p_from THEN
+    RETURN 0;
+  END IF;
+
   INSERT INTO "daily_stock" (
     "stock_date",
     "item_id",
     "qty"
   )
+  WITH base AS (
+    SELECT
+      ic.item_id,
+      COALESCE(ic.unit_per_package, 1) AS factor,
+      COALESCE(
+        prev.qty,
+        (
+          SELECT COALESCE(SUM(sm.qty), 0)
+          FROM "stock_movement" sm
+          WHERE sm.item_id = ic.item_id
+            AND sm.created_at < p_from
+        ) * COALESCE(ic.unit_per_package, 1)
+      ) AS opening_qty
+    FROM "item_catalog" ic
+    LEFT JOIN "daily_stock" prev
+      ON prev.item_id = ic.item_id
+      AND prev.stock_date = p_from - 1
+  ),
+  deltas AS (
+    SELECT
+      sm.item_id,
+      sm.created_at::date AS delta_date,
+      SUM(sm.qty) AS delta_qty
+    FROM "stock_movement" sm
+    WHERE sm.created_at >= p_from
+      AND sm.created_at < p_to + 1
+    GROUP BY sm.item_id, sm.created_at::date
+  ),
+  days AS (
+    SELECT d::date AS day
+    FROM generate_series(p_from, p_to, INTERVAL '1 day') AS d
+  )
   SELECT
-    p_stock_date,
-    ic.item_id,
-    COALESCE(SUM(sm.qty * COALESCE(ic.unit_per_package, 1)), 0)
-  FROM "item_catalog" ic
-  LEFT JOIN "stock_movement" sm
-    ON sm.item_id = ic.item_id
-    AND sm.created_at < (p_stock_date + INTERVAL '1 day')
-  GROUP BY ic.item_id
+    days.day,
+    base.item_id,
+    base.opening_qty + SUM(COALESCE(deltas.delta_qty, 0) * base.factor) OVER (
+      PARTITION BY base.item_id
+      ORDER BY days.day
+    )
+  FROM base
+  CROSS JOIN days
+  LEFT JOIN deltas
+    ON deltas.item_id = base.item_id
+    AND deltas.delta_date = days.day
   ON CONFLICT ("stock_date", "item_id")
   DO UPDATE SET "qty" = EXCLUDED."qty";
+
+  GET DIAGNOSTICS affected = ROW_COUNT;
+  RETURN affected;
+END;
+$$ LANGUAGE plpgsql;
+
+-- snapshot_daily_stock: single-day wrapper (previous snapshot + that day's deltas).
+CREATE OR REPLACE FUNCTION snapshot_daily_stock(p_stock_date date DEFAULT CURRENT_DATE)
+RETURNS void AS $$
+BEGIN
+  PERFORM snapshot_daily_stock_range(p_stock_date, p_stock_date);
+END;
+$$ LANGUAGE plpgsql;
+
+-- SCHEDULING
+-- waste_expired_stock and snapshot_daily_stock run from the app scheduler
+-- (app/services/scheduler.py). Drop the legacy pg_cron jobs if pg_cron is installed
+-- so they do not run twice.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.unschedule(jobid)
+    FROM cron.job
+    WHERE jobname IN ('waste-expired-daily', 'daily-stock-snapshot');
+  END IF;
+END;
+$$;
+
+-- REFERENCE DATA VERSIONS (HTTP cache)
+-- bump_table_version: one bump per writing statement; ETags of cached responses derive from it.
+CREATE OR REPLACE FUNCTION bump_table_version()
+RETURNS trigger AS $$
+BEGIN
+  INSERT INTO table_version (table_name, version, updated_at)
+  VALUES (TG_TABLE_NAME, 1, now())
+  ON CONFLICT (table_name) DO UPDATE
+  SET version = table_version.version + 1,
+      updated_at = now();
+
+  RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-SELECT cron.schedule(
-  'daily-stock-snapshot',
-  '5 0 * * *',
-  $$SELECT snapshot_daily_stock();$$
-);
+CREATE TRIGGER trg_treatment_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON "treatment"
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+CREATE TRIGGER trg_treatment_recipe_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON "treatment_recipe"
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+CREATE TRIGGER trg_promotion_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON "promotion"
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+CREATE TRIGGER trg_promotion_benefit_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON "promotion_benefit"
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+CREATE TRIGGER trg_promotion_condition_group_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON "promotion_condition_group"
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+CREATE TRIGGER trg_promotion_condition_rule_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+ON "promotion_condition_rule"
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+-- Bundles only join item_catalog by id; stock quantity updates must not invalidate them.
+CREATE TRIGGER trg_item_catalog_version
+AFTER INSERT OR DELETE OR TRUNCATE
+ON "item_catalog"
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_table_version();
+
+-- CACHE INVALIDATION BUS (LISTEN table_change)
+-- notify_table_change: publish {table, op, pk} for each changed row; trigger arguments name the PK columns.
+-- Statement-level (TRUNCATE) events carry no pk and make listeners drop everything for the table.
+CREATE OR REPLACE FUNCTION notify_table_change()
+RETURNS trigger AS $$
+DECLARE
+  row_data jsonb;
+  pk jsonb := '{}'::jsonb;
+  pk_column text;
+BEGIN
+  IF TG_LEVEL = 'STATEMENT' THEN
+    PERFORM pg_notify(
+      'table_change',
+      jsonb_build_object('table', TG_TABLE_NAME, 'op', TG_OP)::text
+    );
+    RETURN NULL;
+  END IF;
+
+  IF TG_OP = 'DELETE' THEN
+    row_data := to_jsonb(OLD);
+  ELSE
+    row_data := to_jsonb(NEW);
+  END IF;
+
+  FOREACH pk_column IN ARRAY TG_ARGV LOOP
+    pk := pk || jsonb_build_object(pk_column, row_data -> pk_column);
+  END LOOP;
+
+  PERFORM pg_notify(
+    'table_change',
+    jsonb_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'pk', pk)::text
+  );
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_treatment_notify
+AFTER INSERT OR UPDATE OR DELETE
+ON "treatment"
+FOR EACH ROW
+EXECUTE FUNCTION notify_table_change('treatment_id');
+
+CREATE TRIGGER trg_treatment_recipe_notify
+AFTER INSERT OR UPDATE OR DELETE
+ON "treatment_recipe"
+FOR EACH ROW
+EXECUTE FUNCTION notify_table_change('treatment_id', 'item_id');
+
+CREATE TRIGGER trg_promotion_notify
+AFTER INSERT OR UPDATE OR DELETE
+ON "promotion"
+FOR EACH ROW
+EXECUTE FUNCTION notify_table_change('promotion_id');
+
+CREATE TRIGGER trg_promotion_benefit_notify
+AFTER INSERT OR UPDATE OR DELETE
+ON "promotion_benefit"
+FOR EACH ROW
+EXECUTE FUNCTION notify_table_change('promotion_benefit_id');
+
+CREATE TRIGGER trg_promotion_condition_group_notify
+AFTER INSERT OR UPDATE OR DELETE
+ON "promotion_condition_group"
+FOR EACH ROW
+EXECUTE FUNCTION notify_table_change('condition_group_id');
+
+CREATE TRIGGER trg_promotion_condition_rule_notify
+AFTER INSERT OR UPDATE OR DELETE
+ON "promotion_condition_rule"
+FOR EACH ROW
+EXECUTE FUNCTION notify_table_change('condition_rule_id');
+
+-- current_qty is rewritten by every stock movement; only catalog attributes are broadcast.
+CREATE TRIGGER trg_item_catalog_notify
+AFTER INSERT OR DELETE OR UPDATE OF sku, name, variant_name, item_type, sell_price, restock_threshold, unit, unit_per_package
+ON "item_catalog"
+FOR EACH ROW
+EXECUTE FUNCTION notify_table_change('item_id');
+
+CREATE TRIGGER trg_treatment_truncate_notify
+AFTER TRUNCATE
+ON "treatment"
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_table_change();
+
+CREATE TRIGGER trg_promotion_truncate_notify
+AFTER TRUNCATE
+ON "promotion"
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_table_change();
+
+CREATE TRIGGER trg_item_catalog_truncate_notify
+AFTER TRUNCATE
+ON "item_catalog"
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_table_change();
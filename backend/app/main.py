@@ -5,9 +5,14 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 
+import config
 from app.api.router import router as api_router
+from app.api.routes.metrics import router as metrics_router
 from app.db.postgres import DataBasePool
+from app.services.invalidation import start_invalidation_bus, stop_invalidation_bus
+from app.services.request_timing import timing_middleware
 from app.services.scheduler import start_scheduler, stop_scheduler
+from app.services.warmup import start_warmup, stop_warmup
 
 logging.basicConfig(level=logging.INFO)
 
@@ -26,22 +31,39 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Server-Timing", "Idempotent-Replayed"],
     )
+    if config.METRICS["enabled"]:
+        # Per-route latency + SQL round trips, reported as Server-Timing
+        app.middleware("http")(timing_middleware)
 
     # API routers
     app.include_router(api_router, prefix="/api/v1")
+    if config.METRICS["enabled"]:
+        app.include_router(metrics_router)
 
     @app.on_event("startup")
     async def startup() -> None:
+        if config.QUERY_PROFILING["enabled"]:
+            from app.db.profiling import enable_profiling
+
+            enable_profiling()
         # Create a database connection pool
         await DataBasePool.setup()
-        # Start the scheduler for ML jobs
-        start_scheduler()
+        # Listen for table_change notifications that invalidate in-process caches
+        await start_invalidation_bus()
+        # Start the scheduler for ML and stock jobs
+        await start_scheduler()
+        # Open connections and prime caches in the background; /health/ready waits for it
+        await start_warmup()
 
     @app.on_event("shutdown")
     async def shutdown() -> None:
-        # Stop the scheduler
-        stop_scheduler()
+        # Fail readiness first so the load balancer stops routing here while we drain
+        await stop_warmup()
+        # Stop the scheduler (releases leadership in distributed mode)
+        await stop_scheduler()
+        await stop_invalidation_bus()
         # Close the database connection pool on shutdown
         await DataBasePool.teardown()
 
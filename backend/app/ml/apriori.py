@@ -8,6 +8,7 @@ from mlxtend.frequent_patterns import apriori, association_rules
 from mlxtend.preprocessing import TransactionEncoder
 
 from app.db.postgres import DataBasePool
+from app.services.catalog import get_catalog
 
 
 async def get_transactions() -> list[list[str]]:
@@ -18,23 +19,23 @@ async def get_transactions() -> list[list[str]]:
     pool = await DataBasePool.get_pool()
 
     async with pool.acquire() as connection:
-        # ดึง treatments ที่อยู่ใน invoice เดียวกัน
+        # ดึง treatments ที่อยู่ใน invoice เดียวกัน (ชื่อ treatment อ่านจาก catalog แทนการ JOIN)
         rows = await connection.fetch(
             """
-            SELECT
-                ts.sell_invoice_id,
-                t.name as treatment_name
-            FROM treatment_session ts
-            JOIN treatment t ON ts.treatment_id = t.treatment_id
-            ORDER BY ts.sell_invoice_id
+            SELECT sell_invoice_id, treatment_id
+            FROM treatment_session
+            ORDER BY sell_invoice_id
             """
         )
+        catalog = await get_catalog(connection)
 
     # Group by sell_invoice_id
     transactions_dict: dict[int, list[str]] = {}
     for row in rows:
         invoice_id = row["sell_invoice_id"]
-        treatment_name = row["treatment_name"]
+        treatment_name = catalog.name_of(row["treatment_id"])
+        if treatment_name is None:
+            continue
 
         if invoice_id not in transactions_dict:
             transactions_dict[invoice_id] = []
@@ -220,6 +221,7 @@ async def save_bundles_to_promotions(
     created_promotions = []
 
     async with pool.acquire() as connection:
+        catalog = await get_catalog(connection)
         for i, rec in enumerate(result["recommendations"]):
             bundle_treatments = rec["bundle"]
             confidence = rec["confidence"]
@@ -283,10 +285,7 @@ async def save_bundles_to_promotions(
                     # 4. Create condition rules for each treatment in bundle
                     for treatment_name in bundle_treatments:
                         # Get treatment_id from name
-                        treatment = await connection.fetchrow(
-                            "SELECT treatment_id FROM treatment WHERE name = $1",
-                            treatment_name
-                        )
+                        treatment = catalog.by_name(treatment_name)
 
                         if treatment:
                             # Use HAS_ITEM rule with treatment_id as item_id
@@ -296,7 +295,7 @@ async def save_bundles_to_promotions(
                                 (condition_group_id, rule_type, op, item_id, qty_base_unit)
                                 VALUES ($1, 'HAS_ITEM', 'GTE', $2, 1)
                                 """,
-                                condition_group_id, treatment["treatment_id"]
+                                condition_group_id, treatment.treatment_id
                             )
 
                     created_promotions.append({
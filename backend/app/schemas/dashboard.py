@@ -94,6 +94,12 @@ class DailyStockResponse(BaseModel):
     stock_date: date
 
 
+class DailyStockSnapshotResponse(BaseModel):
+    date_from: date
+    date_to: date
+    rows_written: int
+
+
 class CompletedTodayRow(BaseModel):
     sell_invoice_id: int
     invoice_no: str | None
@@ -57,6 +57,26 @@ class PurchaseInvoiceDetailResponse(BaseModel):
     items: List[PurchaseInvoiceItemResponse]
 
 
+class PurchaseInvoiceImportLine(BaseModel):
+    line_no: int
+    status: str
+    item_id: Optional[int] = None
+    item_code: Optional[str] = None
+    item_name: Optional[str] = None
+    qty: Optional[float] = None
+    created_item: bool = False
+    message: Optional[str] = None
+
+
+class PurchaseInvoiceImportResponse(BaseModel):
+    purchase_invoice_id: int
+    total_lines: int
+    imported: int
+    failed: int
+    items_created: int
+    lines: List[PurchaseInvoiceImportLine]
+
+
 class SupplierOption(BaseModel):
     supplier_id: int
     name: str
@@ -0,0 +1,216 @@
+"""
+Treatment Catalog
+Process-local snapshot of treatment and treatment_recipe, indexed by id and name.
+
+A snapshot is built from two full-table reads and never mutated afterwards;
+a change to either table produces a new snapshot that replaces the old one in
+a single assignment, so a reader always sees one consistent version even while
+a rebuild is in flight. Freshness follows the HTTP cache (app.services.http_cache):
+while the invalidation bus is listening, table_change events mark the snapshot
+stale and reads need no database access at all; otherwise each read compares the
+table_version counters (one primary-key lookup) before reusing the snapshot.
+"""
+
+import asyncio
+import time
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+
+from asyncpg import Connection
+
+from app.db import queries as q
+from app.db.postgres import DataBasePool
+from app.services.invalidation import TableChange, bus
+from app.services.metrics import Counter
+
+# Every table the snapshot reads, in version-token order.
+CATALOG_TABLES = ("treatment", "treatment_recipe")
+
+CATALOG_LOADS = Counter(
+    "treatment_catalog_loads_total",
+    "Treatment catalog snapshots built; reason is initial or changed",
+    label_names=("reason",),
+)
+
+
+class Treatment(NamedTuple):
+    treatment_id: int
+    name: Optional[str]
+    category: Optional[str]
+    price: Optional[int]
+    description: Optional[str]
+    image_obj_key: Optional[str]
+
+
+class Recipe(NamedTuple):
+    treatment_id: int
+    item_id: int
+    qty_per_session: Optional[Decimal]
+    sell_price: Optional[Decimal]
+    description: Optional[str]
+
+
+class Category(NamedTuple):
+    category: str
+    # Image of the category's lowest treatment_id that has one, if any does.
+    image_obj_key: Optional[str]
+
+
+class CatalogSnapshot:
+    """One immutable version of the catalog; read-only mappings over tuples of rows."""
+
+    __slots__ = (
+        "version",
+        "loaded_at",
+        "treatments",
+        "categories",
+        "image_keys",
+        "_by_id",
+        "_by_name",
+        "_recipes",
+    )
+
+    def __init__(
+        self,
+        version: str,
+        treatments: tuple[Treatment, ...],
+        recipes: tuple[Recipe, ...],
+    ) -> None:
+        self.version = version
+        self.loaded_at = time.time()
+        # Listing order: name, then treatment_id (as CATALOG_TREATMENTS returns them).
+        self.treatments = treatments
+
+        by_id: dict[int, Treatment] = {}
+        by_name: dict[str, Treatment] = {}
+        first_in_category: dict[str, Treatment] = {}
+        for treatment in treatments:
+            by_id[treatment.treatment_id] = treatment
+            if treatment.name is not None:
+                # Duplicate names resolve to the lowest treatment_id.
+                current = by_name.get(treatment.name)
+                if current is None or treatment.treatment_id < current.treatment_id:
+                    by_name[treatment.name] = treatment
+            if treatment.category is not None:
+                current = first_in_category.get(treatment.category)
+                if current is None or _category_rank(treatment) < _category_rank(current):
+                    first_in_category[treatment.category] = treatment
+
+        recipes_by_treatment: dict[int, list[Recipe]] = {}
+        for recipe in recipes:
+            recipes_by_treatment.setdefault(recipe.treatment_id, []).append(recipe)
+
+        self._by_id: Mapping[int, Treatment] = MappingProxyType(by_id)
+        self._by_name: Mapping[str, Treatment] = MappingProxyType(by_name)
+        self._recipes: Mapping[int, tuple[Recipe, ...]] = MappingProxyType(
+            {treatment_id: tuple(rows) for treatment_id, rows in recipes_by_treatment.items()}
+        )
+        self.categories = tuple(
+            Category(category, treatment.image_obj_key)
+            for category, treatment in sorted(first_in_category.items())
+        )
+        self.image_keys = frozenset(
+            treatment.image_obj_key for treatment in treatments if treatment.image_obj_key
+        )
+
+    def get(self, treatment_id: int) -> Optional[Treatment]:
+        return self._by_id.get(treatment_id)
+
+    def by_name(self, name: str) -> Optional[Treatment]:
+        return self._by_name.get(name)
+
+    def name_of(self, treatment_id: int) -> Optional[str]:
+        treatment = self._by_id.get(treatment_id)
+        return treatment.name if treatment is not None else None
+
+    def in_category(self, category: Optional[str]) -> tuple[Treatment, ...]:
+        """Treatments in listing order, optionally only one category."""
+        if category is None:
+            return self.treatments
+        return tuple(treatment for treatment in self.treatments if treatment.category == category)
+
+    def recipes(self, treatment_id: int) -> tuple[Recipe, ...]:
+        """Recipe lines of a treatment ordered by item_id; empty when it has none."""
+        return self._recipes.get(treatment_id, ())
+
+    def qty_per_session(self, treatment_id: int) -> Optional[Decimal]:
+        """qty_per_session of the treatment's first recipe line, None without a recipe."""
+        recipes = self._recipes.get(treatment_id)
+        return recipes[0].qty_per_session if recipes else None
+
+
+def _category_rank(treatment: Treatment) -> tuple[bool, int]:
+    # Treatments with an image represent their category first, then the lowest treatment_id.
+    return treatment.image_obj_key is None, treatment.treatment_id
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_lock: Optional[asyncio.Lock] = None
+
+# Bumped on every table_change event for a catalog table; _verified_generation is
+# the generation at which _snapshot was last confirmed against table_version.
+_generation = 0
+_verified_generation = -1
+
+
+def _on_table_change(_change: TableChange) -> None:
+    global _generation
+    _generation += 1
+
+
+bus.subscribe(CATALOG_TABLES, _on_table_change)
+
+
+async def _version(connection: Connection) -> str:
+    rows = await connection.fetch(q.TABLE_VERSIONS, list(CATALOG_TABLES))
+    versions = {row["table_name"]: row["version"] for row in rows}
+    return ".".join(str(versions.get(table, 0)) for table in CATALOG_TABLES)
+
+
+async def _load(connection: Connection, version: str) -> CatalogSnapshot:
+    treatments = await connection.fetch(q.CATALOG_TREATMENTS)
+    recipes = await connection.fetch(q.CATALOG_RECIPES)
+    return CatalogSnapshot(
+        version=version,
+        treatments=tuple(Treatment(*row.values()) for row in treatments),
+        recipes=tuple(Recipe(*row.values()) for row in recipes),
+    )
+
+
+async def _refresh(connection: Connection) -> CatalogSnapshot:
+    global _snapshot, _lock, _verified_generation
+    # An event that arrives after this point leaves _verified_generation behind,
+    # so the next read checks the table versions again.
+    generation = _generation
+    version = await _version(connection)
+    if _snapshot is not None and _snapshot.version == version:
+        _verified_generation = generation
+        return _snapshot
+
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        # Concurrent readers wait for the first rebuild instead of each loading the tables.
+        if _snapshot is None or _snapshot.version != version:
+            reason = "initial" if _snapshot is None else "changed"
+            _snapshot = await _load(connection, version)
+            CATALOG_LOADS.inc(reason)
+        _verified_generation = generation
+        return _snapshot
+
+
+async def get_catalog(connection: Optional[Connection] = None) -> CatalogSnapshot:
+    """
+    Current catalog snapshot. Pass the caller's connection when it already holds one
+    (e.g. inside a transaction); otherwise one is acquired only if a check is needed.
+    Keep the returned snapshot for the whole request rather than calling this per row.
+    """
+    snapshot = _snapshot
+    if snapshot is not None and bus.is_live and _verified_generation == _generation:
+        return snapshot
+    if connection is not None:
+        return await _refresh(connection)
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        return await _refresh(connection)
@@ -0,0 +1,253 @@
+"""
+HTTP Cache
+Response cache for reference-data endpoints (treatments, promotion bundles,
+static assets) with strong ETags, Last-Modified, 304 handling and Cache-Control.
+
+Freshness comes from the table_version counters bumped by statement triggers
+(trigger.sql), so a write through any endpoint or worker invalidates every
+cached copy: one primary-key lookup per request replaces the full query and
+URL signing. While the invalidation bus is listening, table_change events evict
+entries directly and cached hits skip that lookup as well. Responses that embed
+presigned storage URLs are additionally rebuilt after
+HTTP_CACHE["signed_url_ttl_seconds"] so clients never receive links close to
+expiry.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, Sequence
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+import config
+from app.db import queries
+from app.db.postgres import DataBasePool
+from app.services.invalidation import TableChange, bus
+from app.services.metrics import Counter
+
+CACHE_REQUESTS = Counter(
+    "http_cache_requests_total",
+    "Cached endpoint requests; result is hit, miss or not_modified (304)",
+    label_names=("cache", "result"),
+)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class _Entry:
+    __slots__ = ("tables", "version_token", "etag", "body", "last_modified", "expires_at")
+
+    def __init__(
+        self,
+        tables: Sequence[str],
+        version_token: str,
+        etag: str,
+        body: bytes,
+        last_modified: datetime,
+        expires_at: Optional[float],
+    ) -> None:
+        self.tables = tables
+        self.version_token = version_token
+        self.etag = etag
+        self.body = body
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+
+_entries: OrderedDict[str, _Entry] = OrderedDict()
+_build_locks: dict[str, asyncio.Lock] = {}
+
+# Bumped per table on every invalidation event; a build that overlaps an event is not stored.
+_generations: dict[str, int] = {}
+_subscribed: set[str] = set()
+
+
+def _on_table_change(change: TableChange) -> None:
+    _generations[change.table] = _generations.get(change.table, 0) + 1
+    for key in [key for key, entry in _entries.items() if change.table in entry.tables]:
+        del _entries[key]
+
+
+def _subscribe(tables: Sequence[str]) -> None:
+    new_tables = [table for table in tables if table not in _subscribed]
+    if new_tables:
+        _subscribed.update(new_tables)
+        bus.subscribe(new_tables, _on_table_change)
+
+
+def _generation_of(tables: Sequence[str]) -> tuple[int, ...]:
+    return tuple(_generations.get(table, 0) for table in tables)
+
+
+async def table_versions(tables: Sequence[str]) -> tuple[str, datetime]:
+    """Version token ("3.0.12", one counter per table in order) and the latest change time."""
+    if not tables:
+        return "", _EPOCH
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        rows = await connection.fetch(queries.TABLE_VERSIONS, list(tables))
+    versions = {row["table_name"]: row["version"] for row in rows}
+    token = ".".join(str(versions.get(table, 0)) for table in tables)
+    last_modified = max((row["updated_at"] for row in rows), default=_EPOCH)
+    return token, last_modified
+
+
+def _fresh_entry(key: str, version_token: Optional[str]) -> Optional[_Entry]:
+    """Cached entry if still valid; version_token None trusts the invalidation bus instead."""
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+    if version_token is not None and entry.version_token != version_token:
+        return None
+    if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+        return None
+    _entries.move_to_end(key)
+    return entry
+
+
+def _store(key: str, entry: _Entry) -> None:
+    _entries[key] = entry
+    _entries.move_to_end(key)
+    while len(_entries) > config.HTTP_CACHE["max_entries"]:
+        evicted, _ = _entries.popitem(last=False)
+        _build_locks.pop(evicted, None)
+
+
+async def _build_entry(
+    key: str,
+    tables: Sequence[str],
+    version_token: str,
+    last_modified: datetime,
+    build: Callable[[], Awaitable[BaseModel | bytes]],
+    signed_urls: bool,
+) -> _Entry:
+    body = _encode(await build())
+    version_digest = hashlib.sha1(f"{key}|{version_token}".encode()).hexdigest()[:10]
+    body_digest = hashlib.sha1(body).hexdigest()[:16]
+    expires_at = None
+    if signed_urls:
+        # Each rebuild re-signs the URLs, so the body (and its ETag) changes with it.
+        last_modified = max(last_modified, datetime.now(timezone.utc))
+        expires_at = time.monotonic() + config.HTTP_CACHE["signed_url_ttl_seconds"]
+    return _Entry(
+        tables=tables,
+        version_token=version_token,
+        etag=f'"{version_digest}-{body_digest}"',
+        body=body,
+        last_modified=last_modified.replace(microsecond=0),
+        expires_at=expires_at,
+    )
+
+
+def _encode(result: BaseModel | bytes) -> bytes:
+    # Builders that already produce JSON (e.g. json_agg in SQL) skip model serialization.
+    return result if isinstance(result, bytes) else result.model_dump_json().encode()
+
+
+def _not_modified(request: Request, entry: _Entry) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses weak comparison, so a W/ prefix added by a proxy still matches.
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or entry.etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return entry.last_modified <= since
+
+
+def _headers(entry: _Entry, signed_urls: bool) -> dict[str, str]:
+    # Presigned URLs are bearer links; keep them out of shared caches.
+    visibility = "private" if signed_urls else "public"
+    return {
+        "ETag": entry.etag,
+        "Last-Modified": format_datetime(entry.last_modified.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": f"{visibility}, max-age={config.HTTP_CACHE['max_age_seconds']}",
+    }
+
+
+async def _resolve(
+    cache_key: str,
+    build: Callable[[], Awaitable[BaseModel | bytes]],
+    tables: Sequence[str],
+    signed_urls: bool,
+) -> tuple[_Entry, str]:
+    """Current entry for ``cache_key`` (built if needed) and whether it was a hit or a miss."""
+    _subscribe(tables)
+
+    # With the listener up, evictions arrive as events and a cached entry is current as is.
+    entry = _fresh_entry(cache_key, None) if bus.is_live else None
+    if entry is not None:
+        return entry, "hit"
+
+    generation = _generation_of(tables)
+    version_token, last_modified = await table_versions(tables)
+    entry = _fresh_entry(cache_key, version_token)
+    if entry is not None:
+        return entry, "hit"
+
+    lock = _build_locks.setdefault(cache_key, asyncio.Lock())
+    async with lock:
+        # Concurrent misses wait for the first rebuild instead of stampeding the database.
+        entry = _fresh_entry(cache_key, version_token)
+        if entry is not None:
+            return entry, "hit"
+        entry = await _build_entry(cache_key, tables, version_token, last_modified, build, signed_urls)
+        if _generation_of(tables) == generation:
+            _store(cache_key, entry)
+    return entry, "miss"
+
+
+async def prime(
+    name: str,
+    build: Callable[[], Awaitable[BaseModel | bytes]],
+    *,
+    tables: Sequence[str] = (),
+    key: Optional[str] = None,
+    signed_urls: bool = False,
+) -> None:
+    """Build an endpoint's response into the cache before the first request (startup warm-up)."""
+    if config.HTTP_CACHE["enabled"]:
+        await _resolve(name if key is None else f"{name}:{key}", build, tables, signed_urls)
+
+
+async def cached_json(
+    request: Request,
+    name: str,
+    build: Callable[[], Awaitable[BaseModel | bytes]],
+    *,
+    tables: Sequence[str] = (),
+    key: Optional[str] = None,
+    signed_urls: bool = False,
+) -> Response:
+    """
+    Serve ``build()`` (a response model or ready JSON bytes) through the cache.
+
+    ``name`` identifies the endpoint (metrics label), ``key`` its variant (query
+    parameters), ``tables`` the tables whose versions decide freshness.
+    """
+    if not config.HTTP_CACHE["enabled"]:
+        return Response(content=_encode(await build()), media_type="application/json")
+
+    cache_key = name if key is None else f"{name}:{key}"
+    entry, result = await _resolve(cache_key, build, tables, signed_urls)
+
+    headers = _headers(entry, signed_urls)
+    if _not_modified(request, entry):
+        CACHE_REQUESTS.inc(name, "not_modified")
+        return Response(status_code=304, headers=headers)
+
+    CACHE_REQUESTS.inc(name, result)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,193 @@
+"""
+Cache Invalidation Bus
+ฟัง NOTIFY table_change (จาก notify_table_change ใน trigger.sql) ผ่าน connection เฉพาะหนึ่งเส้นต่อ process
+แล้วกระจาย event {table, op, pk} ให้ cache ในหน่วยความจำที่ลงทะเบียนไว้
+ถ้า connection หลุด จะ reconnect แบบ backoff และสั่ง full flush เพราะอาจพลาด event ระหว่างนั้น
+"""
+
+import asyncio
+import json
+import logging
+import random
+from typing import Callable, Optional
+
+from asyncpg import Connection
+
+import config
+from app.db.postgres import DataBasePool
+from app.services.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_EVENTS = Counter(
+    "cache_invalidation_events_total",
+    "table_change notifications received by this worker",
+    label_names=("table", "op"),
+)
+INVALIDATION_FLUSHES = Counter(
+    "cache_invalidation_flushes_total",
+    "Full cache flushes; reason is connect, reconnect or bad_payload",
+    label_names=("reason",),
+)
+
+# ต้องตรงกับ channel ใน notify_table_change()
+CHANNEL = "table_change"
+
+# op ของ event ที่ถูกสร้างเองเมื่อ flush ทั้งตาราง (ไม่มี pk)
+FLUSH = "FLUSH"
+
+
+class TableChange:
+    """การเปลี่ยนแปลงหนึ่งแถว (pk = {column: value}) หรือทั้งตาราง (pk = None)"""
+
+    __slots__ = ("table", "op", "pk")
+
+    def __init__(self, table: str, op: str, pk: Optional[dict] = None) -> None:
+        self.table = table
+        self.op = op
+        self.pk = pk
+
+    def __repr__(self) -> str:
+        return f"TableChange({self.table!r}, {self.op!r}, {self.pk!r})"
+
+
+Subscriber = Callable[[TableChange], None]
+
+
+class InvalidationBus:
+    def __init__(
+        self,
+        channel: str = CHANNEL,
+        keepalive_seconds: float = 30.0,
+        reconnect_max_seconds: float = 30.0,
+    ) -> None:
+        self._channel = channel
+        self._keepalive_seconds = keepalive_seconds
+        self._reconnect_max_seconds = reconnect_max_seconds
+        self._subscribers: dict[str, list[Subscriber]] = {}
+        self._connection: Optional[Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lost: Optional[asyncio.Event] = None
+        self._live = False
+
+    @property
+    def is_live(self) -> bool:
+        """True เมื่อกำลัง LISTEN อยู่ cache เชื่อ event ได้โดยไม่ต้องตรวจกับฐานข้อมูลทุกครั้ง"""
+        return self._live
+
+    def subscribe(self, tables: tuple[str, ...] | list[str], callback: Subscriber) -> None:
+        """
+        ลงทะเบียน callback ต่อตาราง callback ต้องเร็วและไม่ block (เช่น ลบ entry ออกจาก dict)
+        เมื่อ flush จะได้รับ TableChange(table, FLUSH) หนึ่งครั้งต่อตาราง
+        """
+        for table in tables:
+            self._subscribers.setdefault(table, []).append(callback)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close()
+
+    def flush(self, reason: str) -> None:
+        """ส่ง FLUSH ให้ทุกตารางที่มีผู้ลงทะเบียน"""
+        INVALIDATION_FLUSHES.inc(reason)
+        for table in list(self._subscribers):
+            self._dispatch(TableChange(table, FLUSH))
+
+    async def _run(self) -> None:
+        attempt = 0
+        first_connect = True
+        while True:
+            try:
+                await self._listen()
+                attempt = 0
+                # event ที่เกิดก่อน LISTEN (หรือระหว่างหลุด) ไม่มีทางได้รับ จึงล้างทั้งหมด
+                self.flush("connect" if first_connect else "reconnect")
+                first_connect = False
+                logger.info(f"[Invalidation] Listening on '{self._channel}'")
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[Invalidation] Listener connection lost: {e}")
+
+            self._live = False
+            await self._close()
+            attempt += 1
+            delay = min(self._reconnect_max_seconds, 2 ** min(attempt, 10) / 2)
+            await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+
+    async def _listen(self) -> None:
+        self._lost = asyncio.Event()
+        self._connection = await DataBasePool.connect()
+        self._connection.add_termination_listener(lambda _connection: self._lost.set())
+        await self._connection.add_listener(self._channel, self._on_notify)
+        self._live = True
+
+    async def _watch(self) -> None:
+        """รอจนกว่า connection จะหลุด และ ping เป็นระยะเพื่อจับ connection ที่ตายเงียบ"""
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), timeout=self._keepalive_seconds)
+                raise ConnectionError("listener connection terminated")
+            except asyncio.TimeoutError:
+                await asyncio.wait_for(
+                    self._connection.fetchval("SELECT 1"),
+                    timeout=self._keepalive_seconds,
+                )
+
+    async def _close(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            try:
+                await asyncio.wait_for(connection.close(), timeout=5)
+            except Exception:
+                connection.terminate()
+
+    def _on_notify(self, _connection, _pid: int, _channel: str, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            change = TableChange(data["table"], data["op"], data.get("pk"))
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"[Invalidation] Unreadable payload, flushing caches: {payload!r}")
+            self.flush("bad_payload")
+            return
+
+        INVALIDATION_EVENTS.inc(change.table, change.op)
+        if change.pk is None:
+            # TRUNCATE ไม่มี pk ให้ผู้ฟังล้างทั้งตาราง
+            change.op = FLUSH
+        self._dispatch(change)
+
+    def _dispatch(self, change: TableChange) -> None:
+        for callback in self._subscribers.get(change.table, ()):
+            try:
+                callback(change)
+            except Exception:
+                logger.exception(f"[Invalidation] Subscriber failed for {change!r}")
+
+
+bus = InvalidationBus(
+    keepalive_seconds=config.INVALIDATION["keepalive_seconds"],
+    reconnect_max_seconds=config.INVALIDATION["reconnect_max_seconds"],
+)
+
+
+async def start_invalidation_bus() -> None:
+    if not config.INVALIDATION["enabled"]:
+        logger.info("[Invalidation] Disabled by config")
+        return
+    bus.start()
+
+
+async def stop_invalidation_bus() -> None:
+    await bus.stop()
@@ -0,0 +1,90 @@
+"""
+Leader Election Service
+เลือก worker เดียวทั้ง fleet ด้วย Postgres session advisory lock
+lock ผูกกับ connection เฉพาะ ถ้า connection หลุด lock จะถูกปล่อยให้ worker อื่นทันที
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from asyncpg import Connection
+
+from app.db.postgres import DataBasePool
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    def __init__(
+        self,
+        lock_key: int,
+        on_elected: Callable[[], None],
+        on_demoted: Callable[[], Awaitable[None]],
+        poll_seconds: float = 15.0,
+    ) -> None:
+        self._lock_key = lock_key
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._poll_seconds = poll_seconds
+        self._connection: Optional[Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._is_leader = False
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._connection is None or self._connection.is_closed():
+                    self._connection = await DataBasePool.connect()
+
+                if not self._is_leader:
+                    acquired = await self._connection.fetchval(
+                        "SELECT pg_try_advisory_lock($1)",
+                        self._lock_key,
+                    )
+                    if acquired:
+                        self._is_leader = True
+                        logger.info("[Leader] Acquired scheduler leadership")
+                        self._on_elected()
+                else:
+                    # Keep the session (and therefore the lock) alive.
+                    await self._connection.fetchval("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[Leader] Lost database session: {e}")
+                await self._release()
+
+            await asyncio.sleep(self._poll_seconds)
+
+    async def _release(self) -> None:
+        if self._is_leader:
+            self._is_leader = False
+            logger.info("[Leader] Giving up scheduler leadership")
+            await self._on_demoted()
+
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            try:
+                await connection.execute("SELECT pg_advisory_unlock_all()")
+                await asyncio.wait_for(connection.close(), timeout=5)
+            except Exception:
+                connection.terminate()
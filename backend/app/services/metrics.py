@@ -0,0 +1,182 @@
+"""
+Metrics Service
+In-process metric primitives (per worker). Values reset when the process restarts.
+Every metric registers itself so ``render_prometheus()`` can expose them on /metrics.
+"""
+
+import bisect
+import math
+import threading
+from typing import Callable, Iterable, Optional
+
+# Seconds; tuned for request/query latencies.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY: list["_Metric"] = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: Iterable[str] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        with _REGISTRY_LOCK:
+            _REGISTRY.append(self)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+
+class Counter(_Metric):
+    """Monotonic counter keyed by a fixed tuple of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, label_names: Iterable[str] = ()) -> None:
+        super().__init__(name, description, label_names)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self) -> dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.snapshot().items())
+        ]
+
+
+class Gauge(_Metric):
+    """
+    Point-in-time value keyed by a fixed tuple of label values. ``collect``, when
+    given, is called at render time and returns ``{labels: value}`` (e.g. pool sizes).
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Iterable[str] = (),
+        collect: Optional[Callable[[], dict[tuple, float]]] = None,
+    ) -> None:
+        super().__init__(name, description, label_names)
+        self._values: dict[tuple, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+    def snapshot(self) -> dict[tuple, float]:
+        with self._lock:
+            values = dict(self._values)
+        if self._collect is not None:
+            values.update(self._collect())
+        return values
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.snapshot().items())
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram keyed by a fixed tuple of label values."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # [per-bucket counts (+Inf last), count, sum]
+                series = [[0] * (len(self.buckets) + 1), 0, 0.0]
+                self._series[label_values] = series
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def snapshot(self) -> dict[tuple, dict]:
+        """Return ``{labels: {"count", "sum", "buckets": {le: cumulative}}}``."""
+        with self._lock:
+            items = [(labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items()]
+
+        result = {}
+        for labels, (counts, count, total) in items:
+            cumulative = 0
+            buckets = {}
+            for le, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                buckets["+Inf" if le == float("inf") else str(le)] = cumulative
+            result[labels] = {"count": count, "sum": total, "buckets": buckets}
+        return result
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for labels, series in sorted(self.snapshot().items()):
+            for le, cumulative in series["buckets"].items():
+                bucket_labels = _format_labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{series_labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{series_labels} {series['count']}")
+        return lines
+
+
+def render_prometheus() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+"""
+Request Timing
+HTTP middleware that records per-route latency and SQL round trips
+(via InstrumentedConnection) and reports them in a Server-Timing header.
+"""
+
+import logging
+import time
+
+from fastapi import Request
+from starlette.routing import Match
+
+import config
+from app.db.postgres import QueryStats, query_stats
+from app.services.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    label_names=("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL round trips per HTTP request",
+    label_names=("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds",
+    "Time spent waiting on Postgres per HTTP request",
+    label_names=("method", "route"),
+)
+
+QUERY_BUDGET_EXCEEDED = Counter(
+    "http_requests_over_query_budget_total",
+    "Requests that issued more SQL round trips than METRICS['query_count_warning']",
+    label_names=("method", "route"),
+)
+
+
+def route_template(request: Request) -> str:
+    """Path template of the matched route (``/api/v1/booking/{id}``) to keep label cardinality low."""
+    route = request.scope.get("route")
+    if route is None:
+        for candidate in request.app.router.routes:
+            match, _ = candidate.matches(request.scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+
+async def timing_middleware(request: Request, call_next):
+    stats = QueryStats()
+    token = query_stats.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        query_stats.reset(token)
+    elapsed = time.perf_counter() - started
+
+    method = request.method
+    route = route_template(request)
+    REQUEST_DURATION.observe(elapsed, method, route, str(response.status_code))
+    REQUEST_QUERIES.observe(stats.queries, method, route)
+    REQUEST_DB_TIME.observe(stats.db_time, method, route)
+
+    if stats.queries > config.METRICS["query_count_warning"]:
+        QUERY_BUDGET_EXCEEDED.inc(method, route)
+        logger.warning(
+            f"[Timing] {method} {route} issued {stats.queries} SQL queries "
+            f"({stats.db_time * 1000:.1f}ms in DB)"
+        )
+
+    response.headers["Server-Timing"] = (
+        f"app;dur={elapsed * 1000:.1f}, "
+        f'db;dur={stats.db_time * 1000:.1f};desc="queries={stats.queries}"'
+    )
+    return response
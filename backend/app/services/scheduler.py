@@ -1,125 +1,560 @@
 """
 Scheduler Service
-จัดการ scheduled jobs สำหรับ ML และงานอัตโนมัติอื่นๆ
+จัดการ scheduled jobs สำหรับ ML, สต็อก และงานอัตโนมัติอื่นๆ (แทน pg_cron)
+
+โหมด (config.SCHEDULER["mode"]):
+- local: ทุก worker รัน scheduler ของตัวเอง (เหมาะกับ process เดียว)
+- distributed: เลือก leader ด้วย Postgres advisory lock, เก็บ jobs ใน job store
+  บน Postgres และ claim แต่ละรอบใน scheduler_job_run ให้รันครั้งเดียวทั้ง fleet
+- disabled: ไม่รัน scheduled jobs ใน process นี้
+
+ทุกรอบบันทึก duration / status / จำนวน attempt ลง scheduler_job_run และ histogram
+ใน process, retry ด้วย exponential backoff และ cron trigger มี jitter
+เมื่อ scheduler เริ่ม (หรือได้เป็น leader) จะ catch-up รอบที่พลาดไประหว่าง downtime
 """
 
 import asyncio
 import logging
-from datetime import datetime
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
+import config
+from app.db.postgres import DataBasePool
+from app.services.leader import LeaderElection
+from app.services.metrics import Histogram
+
 logger = logging.getLogger(__name__)
 
 # Global scheduler instance
 scheduler: AsyncIOScheduler | None = None
+leader: LeaderElection | None = None
+# The loop only keeps weak references to tasks; hold the catch-up run until it finishes.
+_catch_up_task: asyncio.Task | None = None
+
+# Advisory lock key shared by every worker competing for scheduler leadership.
+SCHEDULER_LOCK_KEY = 7210431001
 
+# Late runs (downtime, leader hand-over) still execute within this window.
+MISFIRE_GRACE_SECONDS = 3600
 
-async def run_ml_bundle_job():
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+JOB_DURATION = Histogram(
+    "scheduler_job_duration_seconds",
+    "Scheduled job run duration",
+    label_names=("job_id", "status"),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+
+
+async def run_ml_bundle_job() -> str:
     """
     Job: คำนวณ ML Bundle แล้วบันทึกลง promotion table
     รันอัตโนมัติตาม schedule ที่กำหนด
     """
     from app.ml.apriori import save_bundles_to_promotions
 
-    logger.info(f"[Scheduler] Starting ML Bundle job at {datetime.now()}")
+    result = await save_bundles_to_promotions(
+        discount_percent=15.0,
+        valid_days=30
+    )
 
-    try:
-        result = await save_bundles_to_promotions(
-            discount_percent=15.0,
-            valid_days=30
+    if result["success"]:
+        return f"Created {result['promotions_created']} promotions"
+    return result["message"]
+
+
+async def run_waste_expired_job() -> str:
+    """
+    Job: ตัด lot ที่หมดอายุเป็น WASTE (แทน pg_cron 'waste-expired-daily')
+    idempotent - รอบ catch-up รอบเดียวครอบคลุมทุกวันที่พลาดไป
+    """
+    from app.services.stock import waste_expired_stock
+
+    lots = await waste_expired_stock()
+    return f"{lots} expired lots written off"
+
+
+async def run_daily_stock_job() -> str:
+    """
+    Job: snapshot daily_stock แบบ incremental (แทน pg_cron 'daily-stock-snapshot')
+    เติมทุกวันที่ขาดตั้งแต่ snapshot ล่าสุดจนถึงวันนี้ใน pass เดียว
+    """
+    from app.services.stock import snapshot_recent_daily_stock
+
+    rows = await snapshot_recent_daily_stock()
+    return f"{rows} rows written"
+
+
+# job_id -> (coroutine function, display name, trigger factory(jitter))
+JOBS = {
+    # Waste Expired Stock - รันทุกวัน เวลา 00:00 น.
+    "waste_expired_daily": (
+        run_waste_expired_job,
+        "Waste Expired Stock (Daily)",
+        lambda jitter=None: CronTrigger(hour=0, minute=0, jitter=jitter),
+    ),
+    # Daily Stock Snapshot - รันทุกวัน เวลา 00:05 น. (หลังตัดของหมดอายุ)
+    "daily_stock_snapshot": (
+        run_daily_stock_job,
+        "Daily Stock Snapshot",
+        lambda jitter=None: CronTrigger(hour=0, minute=5, jitter=jitter),
+    ),
+    # ML Bundle Job - รันทุกวันจันทร์ เวลา 03:00 น.
+    "ml_bundle_weekly": (
+        run_ml_bundle_job,
+        "ML Bundle Recommendations (Weekly)",
+        lambda jitter=None: CronTrigger(day_of_week="mon", hour=3, minute=0, jitter=jitter),
+    ),
+}
+if "ml" in config.DISABLED_SUBSYSTEMS:
+    del JOBS["ml_bundle_weekly"]
+
+
+def _scheduled_slot(job_id: str, now: datetime) -> datetime:
+    """
+    fire time ตาม cron (ไม่รวม jitter) ของรอบที่กำลังรัน ใช้เป็น claim key
+    ถ้าหาไม่ได้ (รันช้ากว่า grace) ใช้นาทีปัจจุบันแทน
+    """
+    _, _, make_trigger = JOBS[job_id]
+    trigger = make_trigger()
+    lookback = now - timedelta(seconds=config.SCHEDULER["jitter_seconds"] + MISFIRE_GRACE_SECONDS)
+
+    slot = None
+    fire = trigger.get_next_fire_time(None, lookback)
+    while fire is not None and fire <= now:
+        slot = fire
+        fire = trigger.get_next_fire_time(fire, fire + timedelta(seconds=1))
+    return slot or now.replace(second=0, microsecond=0)
+
+
+def _last_missed_slot(job_id: str, last_slot: datetime, now: datetime) -> datetime | None:
+    """
+    fire time ล่าสุดหลัง last_slot ที่ผ่านไปแล้ว (None = ไม่พลาดรอบไหน)
+    """
+    _, _, make_trigger = JOBS[job_id]
+    trigger = make_trigger()
+
+    missed = None
+    fire = trigger.get_next_fire_time(None, last_slot + timedelta(seconds=1))
+    while fire is not None and fire <= now:
+        missed = fire
+        fire = trigger.get_next_fire_time(fire, fire + timedelta(seconds=1))
+    return missed
+
+
+async def _claim_run(job_id: str, scheduled_for: datetime) -> int | None:
+    """
+    จอง (job_id, scheduled_for) ใน scheduler_job_run
+    คืน run_id ถ้าจองได้, None ถ้ามี worker อื่นจองรอบนี้ไปแล้ว
+    """
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        return await connection.fetchval(
+            """
+            INSERT INTO scheduler_job_run (job_id, scheduled_for, worker, status, started_at)
+            VALUES ($1, $2, $3, 'RUNNING', $4)
+            ON CONFLICT (job_id, scheduled_for) DO NOTHING
+            RETURNING run_id
+            """,
+            job_id,
+            scheduled_for.replace(tzinfo=None),
+            WORKER_ID,
+            datetime.now(),
+        )
+
+
+async def _finish_run(
+    run_id: int,
+    status: str,
+    duration_ms: int,
+    attempts: int,
+    message: str | None,
+) -> None:
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        await connection.execute(
+            """
+            UPDATE scheduler_job_run
+            SET status = $2,
+                finished_at = $3,
+                duration_ms = $4,
+                attempts = $5,
+                message = $6
+            WHERE run_id = $1
+            """,
+            run_id,
+            status,
+            datetime.now(),
+            duration_ms,
+            attempts,
+            message,
         )
 
-        if result["success"]:
-            logger.info(
-                f"[Scheduler] ML Bundle job completed: "
-                f"Created {result['promotions_created']} promotions"
+
+async def _run_with_retries(job_id: str, max_retries: int) -> tuple[str, str | None, int]:
+    """
+    รัน job พร้อม retry แบบ exponential backoff (+ สุ่ม ±20% กันทุก job retry พร้อมกัน)
+    คืน (status, message, attempts)
+    """
+    job_func, job_name, _ = JOBS[job_id]
+    backoff = config.SCHEDULER["retry_backoff_seconds"]
+
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            message = await job_func()
+            logger.info(f"[Scheduler] {job_name} completed: {message}")
+            return "SUCCESS", message, attempts
+        except Exception as e:
+            if attempts > max_retries:
+                logger.error(f"[Scheduler] {job_name} failed after {attempts} attempts: {e}")
+                return "FAILED", str(e), attempts
+            delay = backoff * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            logger.warning(
+                f"[Scheduler] {job_name} attempt {attempts} failed: {e}; retrying in {delay:.0f}s"
             )
-        else:
-            logger.warning(f"[Scheduler] ML Bundle job: {result['message']}")
+            await asyncio.sleep(delay)
+
 
+async def execute_job(
+    job_id: str,
+    manual: bool = False,
+    slot: datetime | None = None,
+) -> dict:
+    """
+    รัน job หนึ่งรอบพร้อมบันทึกผล (duration / status / attempts) ลง scheduler_job_run
+    รอบตาม schedule ใช้ cron slot เป็น key จึงรันได้ครั้งเดียวแม้หลาย worker
+    """
+    _, job_name, _ = JOBS[job_id]
+    now = datetime.now().astimezone()
+    if manual:
+        scheduled_for = now
+    else:
+        scheduled_for = slot or _scheduled_slot(job_id, now)
+
+    run_id = None
+    try:
+        run_id = await _claim_run(job_id, scheduled_for)
+        if run_id is None:
+            logger.info(f"[Scheduler] {job_name} for {scheduled_for} already claimed, skipping")
+            return {"success": False, "message": f"{job_name} already ran for {scheduled_for}"}
     except Exception as e:
-        logger.error(f"[Scheduler] ML Bundle job failed: {e}")
+        if config.SCHEDULER["mode"] == "distributed":
+            logger.error(f"[Scheduler] Could not claim {job_name}, skipping: {e}")
+            return {"success": False, "message": f"Could not claim run: {e}"}
+        logger.warning(f"[Scheduler] Could not record run of {job_name}: {e}")
+
+    logger.info(f"[Scheduler] Starting {job_name} (slot {scheduled_for})")
+    started = time.perf_counter()
+    max_retries = 0 if manual else config.SCHEDULER["max_retries"]
+    status, message, attempts = await _run_with_retries(job_id, max_retries)
+    duration = time.perf_counter() - started
+    duration_ms = int(duration * 1000)
+    JOB_DURATION.observe(duration, job_id, status)
+
+    if run_id is not None:
+        try:
+            await _finish_run(run_id, status, duration_ms, attempts, message)
+        except Exception as e:
+            logger.warning(f"[Scheduler] Could not record result of {job_name}: {e}")
+
+    return {
+        "success": status == "SUCCESS",
+        "message": message or f"{job_name} completed",
+        "duration_ms": duration_ms,
+        "attempts": attempts,
+    }
+
+
+async def _last_successful_slots() -> dict[str, datetime]:
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        rows = await connection.fetch(
+            """
+            SELECT job_id, MAX(scheduled_for) AS last_slot
+            FROM scheduler_job_run
+            WHERE status = 'SUCCESS'
+            GROUP BY job_id
+            """
+        )
+    return {row["job_id"]: row["last_slot"] for row in rows}
 
 
-def start_scheduler():
+async def catch_up_missed_runs() -> list[str]:
     """
-    เริ่ม scheduler พร้อม jobs ที่กำหนด
+    รันรอบที่พลาดไประหว่าง downtime ครั้งเดียวต่อ job (รวบหลายรอบเป็นรอบล่าสุด)
+    job ที่ยังไม่เคยรันสำเร็จจะไม่ถูก catch-up
     """
-    global scheduler
+    try:
+        last_slots = await _last_successful_slots()
+    except Exception as e:
+        logger.warning(f"[Scheduler] Catch-up skipped, could not load run history: {e}")
+        return []
+
+    now = datetime.now().astimezone()
+    caught_up = []
+    for job_id, (_, job_name, _) in JOBS.items():
+        last_slot = last_slots.get(job_id)
+        if last_slot is None:
+            continue
+        # scheduled_for เก็บเป็น local time แบบ naive
+        missed = _last_missed_slot(job_id, last_slot.astimezone(), now)
+        if missed is None:
+            continue
+        logger.info(f"[Scheduler] Catching up {job_name} (missed slot {missed})")
+        await execute_job(job_id, slot=missed)
+        caught_up.append(job_id)
+    return caught_up
+
+
+def _create_scheduler() -> AsyncIOScheduler:
+    job_defaults = {
+        "coalesce": True,
+        "max_instances": 1,
+        "misfire_grace_time": MISFIRE_GRACE_SECONDS,
+    }
+
+    if config.SCHEDULER["mode"] == "distributed":
+        # เก็บ next_run_time ไว้ใน Postgres เพื่อให้ leader คนใหม่รันรอบที่พลาดต่อได้
+        from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+
+        from app.db.postgres import build_database_url
+
+        jobstores = {
+            "default": SQLAlchemyJobStore(
+                url=build_database_url(),
+                tablename="apscheduler_jobs",
+            )
+        }
+        return AsyncIOScheduler(jobstores=jobstores, job_defaults=job_defaults)
+
+    return AsyncIOScheduler(job_defaults=job_defaults)
+
+
+def _start_local_scheduler() -> None:
+    global scheduler, _catch_up_task
 
     if scheduler is not None:
         logger.warning("[Scheduler] Scheduler already running")
         return
 
-    scheduler = AsyncIOScheduler()
+    scheduler = _create_scheduler()
+    # Start paused so jobs already in a persistent store keep their next_run_time
+    # (misfired runs are then coalesced into one run on resume).
+    scheduler.start(paused=True)
 
-    # ML Bundle Job - รันทุกวันจันทร์ เวลา 03:00 น.
-    scheduler.add_job(
-        run_ml_bundle_job,
-        CronTrigger(day_of_week="mon", hour=3, minute=0),
-        id="ml_bundle_weekly",
-        name="ML Bundle Recommendations (Weekly)",
-        replace_existing=True,
-    )
+    jitter = config.SCHEDULER["jitter_seconds"] or None
+    for job_id, (_, job_name, make_trigger) in JOBS.items():
+        trigger = make_trigger(jitter)
+        existing = scheduler.get_job(job_id)
+        if existing is None:
+            scheduler.add_job(
+                execute_job,
+                trigger,
+                args=[job_id],
+                id=job_id,
+                name=job_name,
+            )
+        elif repr(existing.trigger) != repr(trigger):
+            scheduler.reschedule_job(job_id, trigger=trigger)
 
-    scheduler.start()
-    logger.info("[Scheduler] Started with ML Bundle job (every Monday at 03:00)")
+    scheduler.resume()
+    logger.info(f"[Scheduler] Started with jobs: {', '.join(JOBS)}")
 
+    if config.SCHEDULER["catch_up"]:
+        _catch_up_task = asyncio.get_running_loop().create_task(catch_up_missed_runs())
 
-def stop_scheduler():
-    """
-    หยุด scheduler
-    """
-    global scheduler
+
+async def _stop_local_scheduler() -> None:
+    global scheduler, _catch_up_task
+
+    task, _catch_up_task = _catch_up_task, None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
 
     if scheduler is not None:
-        scheduler.shutdown()
+        scheduler.shutdown(wait=False)
         scheduler = None
         logger.info("[Scheduler] Stopped")
 
 
-def get_scheduler_status() -> dict:
+async def start_scheduler():
+    """
+    เริ่ม scheduler พร้อม jobs ที่กำหนด ตามโหมดใน config
+    """
+    global leader
+
+    mode = config.SCHEDULER["mode"]
+    if mode == "disabled":
+        logger.info("[Scheduler] Disabled by config")
+        return
+
+    if mode == "distributed":
+        if leader is not None:
+            logger.warning("[Scheduler] Leader election already running")
+            return
+        leader = LeaderElection(
+            SCHEDULER_LOCK_KEY,
+            on_elected=_start_local_scheduler,
+            on_demoted=_stop_local_scheduler,
+            poll_seconds=config.SCHEDULER["leader_poll_seconds"],
+        )
+        leader.start()
+        logger.info(f"[Scheduler] Distributed mode, worker {WORKER_ID} joined leader election")
+        return
+
+    _start_local_scheduler()
+
+
+async def stop_scheduler():
+    """
+    หยุด scheduler (และปล่อย leadership ถ้าเป็น leader)
+    """
+    global leader
+
+    if leader is not None:
+        await leader.stop()
+        leader = None
+    await _stop_local_scheduler()
+
+
+def _isoformat(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+async def _recent_runs(limit: int = 20) -> list[dict]:
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        rows = await connection.fetch(
+            """
+            SELECT run_id, job_id, scheduled_for, worker, status, attempts,
+                   started_at, finished_at, duration_ms, message
+            FROM scheduler_job_run
+            ORDER BY started_at DESC
+            LIMIT $1
+            """,
+            limit,
+        )
+
+    return [
+        {
+            "run_id": row["run_id"],
+            "job_id": row["job_id"],
+            "scheduled_for": row["scheduled_for"].isoformat(),
+            "worker": row["worker"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "started_at": _isoformat(row["started_at"]),
+            "finished_at": _isoformat(row["finished_at"]),
+            "duration_ms": row["duration_ms"],
+            "message": row["message"],
+        }
+        for row in rows
+    ]
+
+
+async def _job_stats(days: int = 30) -> dict[str, dict]:
     """
-    ดูสถานะ scheduler และ jobs ทั้งหมด
+    สถิติต่อ job จาก scheduler_job_run ของทั้ง fleet ย้อนหลัง `days` วัน
     """
-    global scheduler
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        rows = await connection.fetch(
+            """
+            SELECT
+                job_id,
+                COUNT(*) AS runs,
+                COUNT(*) FILTER (WHERE status = 'FAILED') AS failures,
+                COUNT(*) FILTER (WHERE attempts > 1) AS retried,
+                percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms) AS p50_ms,
+                percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms) AS p95_ms,
+                MAX(duration_ms) AS max_ms,
+                MAX(finished_at) FILTER (WHERE status = 'SUCCESS') AS last_success_at
+            FROM scheduler_job_run
+            WHERE started_at >= now() - make_interval(days => $1)
+            GROUP BY job_id
+            """,
+            days,
+        )
+
+    return {
+        row["job_id"]: {
+            "runs": row["runs"],
+            "failures": row["failures"],
+            "retried": row["retried"],
+            "p50_ms": row["p50_ms"],
+            "p95_ms": row["p95_ms"],
+            "max_ms": row["max_ms"],
+            "last_success_at": _isoformat(row["last_success_at"]),
+        }
+        for row in rows
+    }
+
+
+async def get_scheduler_status() -> dict:
+    """
+    ดูสถานะ scheduler, jobs ทั้งหมด, สถิติเวลารัน และประวัติการรันล่าสุด
+    """
+    scheduled = {}
+    if scheduler is not None:
+        scheduled = {job.id: job for job in scheduler.get_jobs()}
 
-    if scheduler is None:
-        return {"running": False, "jobs": []}
+    try:
+        stats = await _job_stats()
+        recent_runs = await _recent_runs()
+    except Exception as e:
+        logger.warning(f"[Scheduler] Could not load run history: {e}")
+        stats, recent_runs = {}, []
+
+    # histogram เก็บเฉพาะรอบที่รันใน worker นี้ (หน่วยวินาที)
+    durations = JOB_DURATION.snapshot()
 
     jobs = []
-    for job in scheduler.get_jobs():
+    for job_id, (_, job_name, make_trigger) in JOBS.items():
+        job = scheduled.get(job_id)
         jobs.append({
-            "id": job.id,
-            "name": job.name,
-            "next_run": job.next_run_time.isoformat() if job.next_run_time else None,
-            "trigger": str(job.trigger),
+            "id": job_id,
+            "name": job_name,
+            "next_run": _isoformat(job.next_run_time) if job else None,
+            "trigger": str(job.trigger if job else make_trigger()),
+            "stats": stats.get(job_id),
+            "worker_durations": {
+                status: histogram
+                for (label_job, status), histogram in durations.items()
+                if label_job == job_id
+            },
         })
 
     return {
-        "running": scheduler.running,
-        "jobs": jobs
+        "mode": config.SCHEDULER["mode"],
+        "worker": WORKER_ID,
+        "is_leader": leader.is_leader if leader is not None else scheduler is not None,
+        "running": scheduler is not None and scheduler.running,
+        "jobs": jobs,
+        "recent_runs": recent_runs,
     }
 
 
 async def trigger_job_now(job_id: str) -> dict:
     """
-    รัน job ทันที (manual trigger)
+    รัน job ทันที (manual trigger) จาก worker ไหนก็ได้
     """
-    global scheduler
-
-    if scheduler is None:
+    if config.SCHEDULER["mode"] == "disabled":
         return {"success": False, "message": "Scheduler not running"}
 
-    job = scheduler.get_job(job_id)
-    if job is None:
+    if job_id not in JOBS:
         return {"success": False, "message": f"Job '{job_id}' not found"}
 
-    # Run the job function directly
-    if job_id == "ml_bundle_weekly":
-        await run_ml_bundle_job()
-        return {"success": True, "message": "ML Bundle job triggered successfully"}
-
-    return {"success": False, "message": f"Unknown job: {job_id}"}
+    return await execute_job(job_id, manual=True)
@@ -0,0 +1,60 @@
+"""
+Stock Maintenance Service
+งานดูแลสต็อก (daily_stock snapshot / ตัดของหมดอายุ) ที่เรียกจาก scheduler / API
+"""
+
+from datetime import date, timedelta
+
+from app.db.postgres import DataBasePool
+
+# จำนวนวันสูงสุดที่ catch-up ย้อนกลับไปเติม snapshot ในรอบเดียว
+MAX_CATCH_UP_DAYS = 366
+
+
+async def snapshot_daily_stock(date_from: date, date_to: date | None = None) -> int:
+    """
+    เขียน daily_stock ของทุกวันในช่วง [date_from, date_to] ในรอบเดียว
+    (snapshot วันก่อนหน้า + movement ของแต่ละวัน) คืนจำนวนแถวที่เขียน
+    """
+    date_to = date_to or date_from
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        affected = await connection.fetchval(
+            "SELECT snapshot_daily_stock_range($1, $2)",
+            date_from,
+            date_to,
+        )
+    return affected or 0
+
+
+async def snapshot_recent_daily_stock(today: date | None = None) -> int:
+    """
+    ปิดยอดทุกวันตั้งแต่ snapshot ล่าสุดก่อนวันนี้ (อย่างน้อยคือเมื่อวาน)
+    แล้วต่อยอดของวันนี้ หลัง downtime จะเติมวันที่ขาดไปทั้งหมดใน pass เดียว
+    """
+    today = today or date.today()
+    yesterday = today - timedelta(days=1)
+
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        last_snapshot = await connection.fetchval(
+            "SELECT MAX(stock_date) FROM daily_stock WHERE stock_date < $1",
+            today,
+        )
+
+    date_from = yesterday
+    if last_snapshot is not None:
+        # snapshot ล่าสุดอาจถ่ายไว้ตอนต้นวัน จึงคำนวณวันนั้นใหม่ด้วย
+        date_from = max(min(last_snapshot, yesterday), today - timedelta(days=MAX_CATCH_UP_DAYS))
+
+    return await snapshot_daily_stock(date_from, today)
+
+
+async def waste_expired_stock() -> int:
+    """
+    ตัดสต็อกที่เหลือใน lot ที่หมดอายุแล้วเป็น WASTE คืนจำนวน lot ที่ตัด
+    """
+    pool = await DataBasePool.get_pool()
+    async with pool.acquire() as connection:
+        wasted = await connection.fetchval("SELECT waste_expired_stock()")
+    return wasted or 0
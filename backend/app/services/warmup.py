@@ -0,0 +1,166 @@
+"""
+Startup Warm-up
+เตรียม worker ก่อนรับ traffic: เปิด connection ตาม WARMUP["connections"] และ prepare hot statements
+โหลด treatment catalog สร้าง cache ของ treatment / promotion bundles และ S3 client ไว้ล่วงหน้า
+ทำงานเป็น background task หลัง startup: /health/live ตอบได้ทันที ส่วน /health/ready ตอบ 503 จนกว่าจะเสร็จ
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+import config
+from app.db.postgres import DataBasePool
+
+logger = logging.getLogger(__name__)
+
+
+class _Skipped(Exception):
+    """step ที่ไม่ต้องทำใน worker นี้ (ปิดด้วย config)"""
+
+
+class WarmupState:
+    def __init__(self) -> None:
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.draining = False
+        # step -> {"status": "ok" | "skipped" | "error", "ms": float, "detail": str}
+        self.steps: dict[str, dict] = {}
+
+    @property
+    def is_ready(self) -> bool:
+        """warm-up จบแล้ว (สำเร็จหรือไม่ก็ตาม) และยังไม่อยู่ระหว่าง shutdown"""
+        return self.finished_at is not None and not self.draining
+
+    def report(self) -> dict:
+        return {
+            "ready": self.is_ready,
+            "draining": self.draining,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "steps": self.steps,
+        }
+
+
+state = WarmupState()
+_task: Optional[asyncio.Task] = None
+
+
+async def _open_connections() -> str:
+    pool = await DataBasePool.get_pool()
+    count = max(1, min(config.WARMUP["connections"], pool.get_max_size()))
+    # ถือ connection พร้อมกัน count เส้นเพื่อบังคับให้ pool เปิดครบ แล้วคืนกลับเป็น idle
+    async with AsyncExitStack() as stack:
+        connections = await asyncio.gather(
+            *(stack.enter_async_context(pool.acquire()) for _ in range(count))
+        )
+        # ปกติ init ของ pool prepare ให้แล้ว (prepare_on_connect) รอบนี้จึงไม่ยิงซ้ำ
+        prepared = await asyncio.gather(*(connection.prepare_registry() for connection in connections))
+    return f"{count} connections, {min(prepared)} statements prepared each"
+
+
+async def _load_catalog() -> str:
+    from app.services.catalog import get_catalog
+
+    catalog = await get_catalog()
+    return f"{len(catalog.treatments)} treatments, version {catalog.version}"
+
+
+async def _prime_caches() -> str:
+    if not config.WARMUP["prime_caches"] or not config.HTTP_CACHE["enabled"]:
+        raise _Skipped("cache priming disabled")
+    from app.api.routes import promotion, treatment
+
+    await treatment.prime_cache()
+    await promotion.prime_cache()
+    return "treatment categories, treatment list, promotion bundles"
+
+
+async def _storage_client() -> str:
+    if "storage" in config.DISABLED_SUBSYSTEMS:
+        raise _Skipped("storage disabled")
+    from app.utils.storage import warm_client
+
+    # boto3 import + client construction บล็อก event loop จึงย้ายไป thread
+    if not await asyncio.to_thread(warm_client):
+        raise _Skipped("storage not configured")
+    return "S3 client ready"
+
+
+async def _agent() -> str:
+    if not config.WARMUP["agent"] or "agent" in config.DISABLED_SUBSYSTEMS:
+        raise _Skipped("agent warm-up disabled")
+    from app.agents.sql_agent import get_sql_agent_executor
+
+    await asyncio.to_thread(get_sql_agent_executor)
+    return "SQL agent built"
+
+
+STEPS: tuple[tuple[str, Callable[[], Awaitable[str]]], ...] = (
+    ("connections", _open_connections),
+    ("catalog", _load_catalog),
+    ("caches", _prime_caches),
+    ("storage", _storage_client),
+    ("agent", _agent),
+)
+
+
+async def _run_step(name: str, step: Callable[[], Awaitable[str]]) -> None:
+    started = time.perf_counter()
+    try:
+        status, detail = "ok", await step()
+    except _Skipped as e:
+        status, detail = "skipped", str(e)
+    except Exception as e:
+        # step ที่พังไม่ทำให้ worker ไม่พร้อมตลอดไป request แรกจะทำงานนั้นเองตามปกติ
+        logger.warning(f"[Warmup] Step '{name}' failed: {e}")
+        status, detail = "error", str(e)
+    state.steps[name] = {
+        "status": status,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+        "detail": detail,
+    }
+
+
+async def _run_steps() -> None:
+    for name, step in STEPS:
+        await _run_step(name, step)
+
+
+async def _run() -> None:
+    try:
+        await asyncio.wait_for(
+            _run_steps(),
+            timeout=config.WARMUP["timeout_seconds"],
+        )
+    except asyncio.TimeoutError:
+        logger.warning("[Warmup] Timed out, reporting ready with the remaining steps unfinished")
+    state.finished_at = datetime.now(timezone.utc)
+    took = (state.finished_at - state.started_at).total_seconds()
+    logger.info(f"[Warmup] Ready after {took:.2f}s: {state.steps}")
+
+
+async def start_warmup() -> None:
+    global _task
+    state.started_at = datetime.now(timezone.utc)
+    if not config.WARMUP["enabled"]:
+        state.finished_at = state.started_at
+        logger.info("[Warmup] Disabled by config")
+        return
+    _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop_warmup() -> None:
+    """เรียกตอน shutdown: /health/ready ตอบ 503 ทันทีเพื่อให้ load balancer หยุดส่ง traffic"""
+    global _task
+    state.draining = True
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,44 @@
+"""
+Direct JSON encoding of asyncpg Records for large list responses.
+
+Route handlers normally build one Pydantic model per row and FastAPI then
+validates and serializes them again through ``response_model``. For trusted
+database output whose columns already match the response schema, ``json_response``
+encodes Records (and dicts/lists of them) straight to bytes instead. orjson is
+used when installed; otherwise the stdlib encoder produces the same output.
+"""
+
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    # asyncpg.Record exposes keys()/items() like a mapping; Decimal is encoded as a
+    # float like the Pydantic `float` fields it replaces.
+    if hasattr(value, "keys"):
+        return dict(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    """Response whose body is encoded without model validation; FastAPI skips response_model for it."""
+    return Response(content=dumps(content), status_code=status_code, media_type="application/json")
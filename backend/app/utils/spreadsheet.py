@@ -0,0 +1,76 @@
+import codecs
+import csv
+import zipfile
+from typing import Any, BinaryIO, Iterator, Optional
+
+XLSX_CONTENT_TYPES = {
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class SpreadsheetError(Exception):
+    """The upload could not be read as the CSV/XLSX it claims to be."""
+
+
+def _normalize_header(value: Any) -> str:
+    return str(value or "").strip().lower().replace(" ", "_")
+
+
+def _is_xlsx(filename: Optional[str], content_type: Optional[str]) -> bool:
+    if content_type in XLSX_CONTENT_TYPES:
+        return True
+    return bool(filename) and filename.lower().endswith(".xlsx")
+
+
+def iter_csv_rows(
+    stream: BinaryIO, encoding: str = "utf-8-sig"
+) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Yield ``(line_no, row)`` per CSV data row, decoding the byte stream lazily."""
+    reader = csv.reader(codecs.iterdecode(stream, encoding))
+    try:
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [_normalize_header(col) for col in header]
+        # Decoding and parsing happen lazily, so errors surface while iterating.
+        for values in reader:
+            if not any(str(value).strip() for value in values):
+                continue
+            yield reader.line_num, dict(zip(columns, values))
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise SpreadsheetError(f"line {reader.line_num + 1}: {exc}") from exc
+
+
+def iter_xlsx_rows(stream: BinaryIO) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Yield ``(row_no, row)`` for the first worksheet using openpyxl's read-only mode."""
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as exc:
+        # KeyError: a zip archive without the workbook parts.
+        raise SpreadsheetError(f"not a valid .xlsx workbook ({exc})") from exc
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [_normalize_header(col) for col in header]
+        for row_no, values in enumerate(rows, start=2):
+            if not any(value not in (None, "") for value in values):
+                continue
+            yield row_no, dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+
+def iter_spreadsheet_rows(
+    stream: BinaryIO,
+    filename: Optional[str] = None,
+    content_type: Optional[str] = None,
+) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Dispatch to the CSV or XLSX reader based on the upload's name/content type."""
+    if _is_xlsx(filename, content_type):
+        return iter_xlsx_rows(stream)
+    return iter_csv_rows(stream)
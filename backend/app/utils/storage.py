@@ -2,13 +2,13 @@ from functools import lru_cache
 from typing import Optional
 from urllib.parse import urlparse
 
-import boto3
-from botocore.client import Config
-
-from config import SUPABASE_OBJECT_STORAGE
+from config import DISABLED_SUBSYSTEMS, SUPABASE_OBJECT_STORAGE
 
 @lru_cache(maxsize=1)
 def _get_s3_client():
+    if "storage" in DISABLED_SUBSYSTEMS:
+        return None
+
     access_key = SUPABASE_OBJECT_STORAGE.get("access_key_id")
     secret_key = SUPABASE_OBJECT_STORAGE.get("secret_access_key")
     endpoint = SUPABASE_OBJECT_STORAGE.get("s3_endpoint")
@@ -17,6 +17,10 @@ def _get_s3_client():
     if not (access_key and secret_key and endpoint):
         return None
 
+    # boto3 takes ~0.5s to import; load it with the first signed URL, not at startup.
+    import boto3
+    from botocore.client import Config
+
     return boto3.client(
         "s3",
         aws_access_key_id=access_key,
@@ -27,6 +31,11 @@ def _get_s3_client():
     )
 
 
+def warm_client() -> bool:
+    """Create the S3 client ahead of the first signed URL; False when storage is not configured."""
+    return _get_s3_client() is not None
+
+
 def _normalize_key(key: str, bucket: str) -> str:
     if key.startswith(f"{bucket}/"):
         return key[len(bucket) + 1 :]
@@ -0,0 +1,130 @@
+"""
+Import-time profile of the API worker.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter for each
+variant (all subsystems, and with DISABLED_SUBSYSTEMS set) and summarizes the
+report: total import time, the top-level packages that cost the most (self time
+summed over every submodule), and whether the heavy optional dependencies were
+loaded at startup at all.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --variants ",ml,ml;agent;storage" --top 15
+    python -m benchmarks.import_time --save baseline
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from benchmarks.common import RESULTS_DIR, format_table, write_results
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Packages that should only load with the subsystem that needs them.
+HEAVY_PACKAGES = ("pandas", "mlxtend", "langchain", "langchain_community", "langchain_openai", "boto3", "sqlalchemy")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for each line of an -X importtime report."""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def profile(module: str, disabled: str) -> dict:
+    env = dict(os.environ, DISABLED_SUBSYSTEMS=disabled, PYTHONDONTWRITEBYTECODE="1")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    entries = parse_importtime(completed.stderr)
+    error = None
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed"
+
+    by_package: dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        by_package[name.split(".")[0]] += self_us
+    loaded = {name.split(".")[0] for name, *_ in entries}
+    return {
+        "disabled": disabled,
+        "total_ms": round(sum(self_us for _, self_us, _, _ in entries) / 1000, 1),
+        "modules": len(entries),
+        "packages_ms": {
+            package: round(us / 1000, 1)
+            for package, us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+        },
+        "heavy_loaded": [package for package in HEAVY_PACKAGES if package in loaded],
+        "error": error,
+    }
+
+
+def run(module: str, variants: list[str], rounds: int) -> dict:
+    results = {}
+    for disabled in variants:
+        runs = [profile(module, disabled) for _ in range(rounds)]
+        # Report the median run by total; the OS file cache makes the first run the slowest.
+        runs.sort(key=lambda result: result["total_ms"])
+        result = runs[len(runs) // 2]
+        result["total_ms_runs"] = [r["total_ms"] for r in runs]
+        result["total_ms_median"] = statistics.median(result["total_ms_runs"])
+        results[disabled or "(none)"] = result
+    return results
+
+
+def print_results(results: dict, top: int) -> None:
+    print(format_table(
+        ("disabled", "total ms", "modules", "heavy packages loaded", "error"),
+        [
+            (label, r["total_ms_median"], r["modules"], ", ".join(r["heavy_loaded"]) or "-", r["error"] or "")
+            for label, r in results.items()
+        ],
+    ))
+    for label, r in results.items():
+        print(f"\nTop packages by import time (disabled: {label})")
+        print(format_table(("package", "ms"), list(r["packages_ms"].items())[:top]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main", help="Module to import (default: the ASGI app)")
+    parser.add_argument(
+        "--variants",
+        default=",ml;agent;storage",
+        help="Comma-separated DISABLED_SUBSYSTEMS values to profile; ';' separates subsystems",
+    )
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--save", metavar="NAME", help="Save results as benchmarks/results/import_time-NAME.json")
+    args = parser.parse_args()
+
+    variants = [variant.replace(";", ",") for variant in args.variants.split(",")]
+    results = run(args.module, variants, args.rounds)
+    print_results(results, args.top)
+
+    if args.save:
+        path = write_results(
+            RESULTS_DIR / f"import_time-{args.save}.json",
+            "import_time",
+            {"module": args.module, "variants": variants, "rounds": args.rounds},
+            results,
+        )
+        print(f"\nSaved {path}")
+
+
+if __name__ == "__main__":
+    main()
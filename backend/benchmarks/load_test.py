@@ -0,0 +1,497 @@
+"""
+Load test for the booking, dashboard and item-catalog hot paths.
+
+Creates (or reuses) a dedicated benchmark database, applies schema.sql, seeds
+configurable volumes of raw history, then applies trigger.sql so derived state
+(stock lots, item quantities, daily_stock) is built the same way a migration
+would. Traffic is driven in-process through httpx's ASGI transport, so numbers
+measure the app + Postgres without network or server overhead. Latency comes
+from the client; SQL round trips and DB time per request are parsed from the
+Server-Timing header written by the timing middleware.
+
+Run from the backend directory (uses the DB_* settings from .env; the user
+needs CREATEDB):
+
+    python -m benchmarks.load_test --seed --customers 5000 --sell-invoices 50000
+    python -m benchmarks.load_test --requests 5000 --concurrency 32 --json-out before.json
+
+dashboard_stats isolates GET /dashboard/stats, e.g. to compare DB_FAN_OUT_BUDGET=1
+with the default budget:
+
+    DB_FAN_OUT_BUDGET=1 python -m benchmarks.load_test --mix dashboard_stats=1 --concurrency 1
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import time
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+import asyncpg
+
+import config
+from benchmarks.common import RESULTS_DIR, format_table, summarize, write_results
+
+DB_DIR = Path(__file__).resolve().parent.parent / "app" / "db"
+
+DASHBOARD_PATHS = (
+    "/api/v1/dashboard/stats",
+    "/api/v1/dashboard/revenue-chart?days=30",
+    "/api/v1/dashboard/appointments",
+    "/api/v1/dashboard/top-treatments?period=month",
+    "/api/v1/dashboard/promotions-used",
+    "/api/v1/dashboard/out-of-stock",
+    "/api/v1/dashboard/daily-stock",
+    "/api/v1/dashboard/completed-today",
+    "/api/v1/dashboard/expiring-items",
+)
+
+TREATMENT_CATEGORIES = ("Botox", "Filler", "Laser", "Facial", "Skin Booster", "Thread Lift")
+
+_SERVER_TIMING = re.compile(r'db;dur=(?P<db>[\d.]+);desc="queries=(?P<queries>\d+)"')
+
+
+# ==================== Database setup ====================
+
+
+def _admin_kwargs(database: str) -> dict:
+    return {
+        "database": database,
+        "user": config.POSTGRES["user"],
+        "password": config.POSTGRES["password"],
+        "host": config.POSTGRES["host"],
+        "port": config.POSTGRES["port"],
+    }
+
+
+async def create_database(name: str) -> None:
+    connection = await asyncpg.connect(**_admin_kwargs("postgres"))
+    try:
+        await connection.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        await connection.execute(f'CREATE DATABASE "{name}"')
+    finally:
+        await connection.close()
+
+
+SEED_SQL = """
+SELECT setseed({seed});
+
+INSERT INTO customer (customer_id, customer_code, full_name, phone, date_of_birth, gender, member_wallet_remain)
+SELECT g,
+       'CUS-' || lpad(g::text, 6, '0'),
+       'Customer ' || g,
+       lpad((800000000 + g)::text, 10, '0'),
+       date '1960-01-01' + (random() * 16000)::int,
+       (CASE WHEN random() < 0.8 THEN 'FEMALE' ELSE 'MALE' END)::gender,
+       0
+FROM generate_series(1, {customers}) g;
+
+INSERT INTO supplier (supplier_id, supplier_code, name)
+SELECT g, 'SUP-' || g, 'Supplier ' || g
+FROM generate_series(1, {suppliers}) g;
+
+INSERT INTO item_catalog (item_id, sku, name, variant_name, item_type, sell_price,
+                          restock_threshold, unit, unit_per_package)
+SELECT g,
+       'SKU-' || lpad(g::text, 6, '0'),
+       'Item ' || g,
+       CASE WHEN g % 4 = 0 THEN (g % 7 + 1) * 50 || 'U' END,
+       (CASE WHEN g % 5 = 0 THEN 'MEDICAL_TOOL' ELSE 'MEDICINE' END)::item_type,
+       round((100 + random() * 9900)::numeric, 2),
+       10 + (random() * 40)::int,
+       (ARRAY['U', 'CC', 'MG', 'PIECE'])[1 + g % 4]::unit_type,
+       1
+FROM generate_series(1, {items}) g;
+
+-- Bookings store treatment_id in sell_invoice_item.item_id, so treatment ids
+-- must also be item ids (treatments <= items).
+INSERT INTO treatment (treatment_id, name, description, category, price)
+SELECT g,
+       'Treatment ' || g,
+       'Benchmark treatment ' || g,
+       (ARRAY{categories})[1 + g % {category_count}],
+       (1000 + random() * 29000)::bigint
+FROM generate_series(1, {treatments}) g;
+
+INSERT INTO treatment_recipe (treatment_id, item_id, qty_per_session, sell_price)
+SELECT t.treatment_id, t.treatment_id, 1, t.price
+FROM treatment t;
+
+INSERT INTO promotion (promotion_id, code, name, is_stackable, start_at, end_at, is_active)
+SELECT g, 'PROMO-' || g, 'Promotion ' || g, g % 3 = 0,
+       now() - interval '180 days', now() + interval '180 days', true
+FROM generate_series(1, {promotions}) g;
+
+INSERT INTO promotion_benefit (promotion_id, benefit_type, target_scope, value_percent)
+SELECT promotion_id, 'PERCENT_DISCOUNT', 'INVOICE_TOTAL', 5 + promotion_id % 4 * 5
+FROM promotion;
+
+INSERT INTO promotion_condition_group (condition_group_id, promotion_id, sort_order)
+SELECT promotion_id, promotion_id, 1 FROM promotion;
+
+INSERT INTO promotion_condition_rule (condition_group_id, rule_type, op, amount_value, item_id, qty_base_unit)
+SELECT condition_group_id, 'MIN_SPEND'::promotion_rule_type, 'GTE'::promotion_rule_op,
+       1000 * (condition_group_id % 5), NULL, NULL::numeric
+FROM promotion_condition_group
+UNION ALL
+SELECT condition_group_id, 'HAS_ITEM', 'EQ', NULL, 1 + condition_group_id % {treatments}, NULL
+FROM promotion_condition_group
+WHERE condition_group_id % 2 = 0;
+
+INSERT INTO purchase_invoice (purchase_invoice_id, purchase_no, supplier_id, issue_at, total_amount)
+SELECT g,
+       'PO-' || lpad(g::text, 6, '0'),
+       1 + g % {suppliers},
+       date_trunc('second', now() - random() * interval '{days} days') + g * interval '1 millisecond',
+       0
+FROM generate_series(1, {purchase_invoices}) g;
+
+INSERT INTO purchase_invoice_item (purchase_invoice_id, item_id, qty, expire_date, purchase_price_per_unit)
+SELECT pi.purchase_invoice_id,
+       1 + (pi.purchase_invoice_id * 7919 + k * 104729) % {items},
+       50 + (random() * 150)::int,
+       pi.issue_at::date + 30 + (random() * 700)::int,
+       round((50 + random() * 5000)::numeric, 2)
+FROM purchase_invoice pi
+CROSS JOIN generate_series(1, {lines_per_invoice}) k
+ON CONFLICT DO NOTHING;
+
+INSERT INTO sell_invoice (sell_invoice_id, invoice_no, customer_id, issue_at, total_amount,
+                          discount_amount, final_amount, status)
+SELECT g,
+       'INV-' || lpad(g::text, 8, '0'),
+       1 + (random() * ({customers} - 1))::int,
+       date_trunc('second', now() - random() * interval '{days} days') + g * interval '1 millisecond',
+       0, 0, 0, 'PAID'
+FROM generate_series(1, {sell_invoices}) g;
+
+INSERT INTO sell_invoice_item (item_id, sell_invoice_id, qty, total_price)
+SELECT DISTINCT ON (pick.treatment_id, si.sell_invoice_id)
+       pick.treatment_id, si.sell_invoice_id, 1, t.price
+FROM sell_invoice si
+CROSS JOIN LATERAL (
+  SELECT 1 + (random() * ({treatments} - 1))::int AS treatment_id
+  FROM generate_series(1, 1 + si.sell_invoice_id % 3)
+) pick
+JOIN treatment t ON t.treatment_id = pick.treatment_id;
+
+UPDATE sell_invoice si
+SET total_amount = totals.amount, final_amount = totals.amount
+FROM (
+  SELECT sell_invoice_id, SUM(total_price) AS amount
+  FROM sell_invoice_item
+  GROUP BY sell_invoice_id
+) totals
+WHERE totals.sell_invoice_id = si.sell_invoice_id;
+
+INSERT INTO payment (payment_time, sell_invoice_id, receipt_no, method, amount_customer_paid, clinic_amount)
+SELECT issue_at, sell_invoice_id, 'RCP-' || lpad(sell_invoice_id::text, 8, '0'),
+       (CASE WHEN sell_invoice_id % 3 = 0 THEN 'CARD' ELSE 'CASH' END)::payment_method,
+       final_amount, final_amount
+FROM sell_invoice;
+
+INSERT INTO treatment_session (treatment_id, sell_invoice_id, customer_id, session_date, session_time)
+SELECT sii.item_id, si.sell_invoice_id, si.customer_id, si.issue_at::date, si.issue_at::time
+FROM sell_invoice_item sii
+JOIN sell_invoice si ON si.sell_invoice_id = sii.sell_invoice_id;
+
+INSERT INTO promotion_redemption (promotion_id, sell_invoice_id, customer_id, discount_total, redeemed_at)
+SELECT 1 + si.sell_invoice_id % {promotions}, si.sell_invoice_id, si.customer_id,
+       round(si.total_amount * 0.1, 2), si.issue_at
+FROM sell_invoice si
+WHERE si.sell_invoice_id % 10 = 0;
+
+-- Raw stock history; (created_at, item_id) must be unique, so offsets keep rows apart.
+INSERT INTO stock_movement (created_at, item_id, movement_type, qty, sell_invoice_id, purchase_invoice_id)
+SELECT pi.issue_at, pii.item_id, 'PURCHASE_IN', pii.qty, NULL, pii.purchase_invoice_id
+FROM purchase_invoice_item pii
+JOIN purchase_invoice pi ON pi.purchase_invoice_id = pii.purchase_invoice_id
+ON CONFLICT DO NOTHING;
+
+INSERT INTO stock_movement (created_at, item_id, movement_type, qty, sell_invoice_id, purchase_invoice_id)
+SELECT si.issue_at + interval '1 second', sii.item_id, 'USE_FOR_TREATMENT', -sii.qty, si.sell_invoice_id, NULL
+FROM sell_invoice_item sii
+JOIN sell_invoice si ON si.sell_invoice_id = sii.sell_invoice_id
+ON CONFLICT DO NOTHING;
+
+INSERT INTO stock_movement (created_at, item_id, movement_type, qty, sell_invoice_id, purchase_invoice_id)
+SELECT date_trunc('second', now() - random() * interval '{days} days') + g * interval '1 microsecond',
+       1 + (random() * ({items} - 1))::int,
+       'WITHDRAW',
+       -(1 + (random() * 5)::int),
+       NULL, NULL
+FROM generate_series(1, {movements}) g
+ON CONFLICT DO NOTHING;
+
+INSERT INTO appointment (customer_id, appointment_time, appointment_status)
+SELECT 1 + (random() * ({customers} - 1))::int,
+       date_trunc('hour', now()) + ((random() * 14 - 7) * interval '1 day'),
+       (CASE WHEN random() < 0.5 THEN 'COMPLETE' ELSE 'INCOMPLETE' END)::appointment_status
+FROM generate_series(1, {appointments}) g;
+"""
+
+IDENTITY_COLUMNS = (
+    ("customer", "customer_id"),
+    ("supplier", "supplier_id"),
+    ("item_catalog", "item_id"),
+    ("treatment", "treatment_id"),
+    ("promotion", "promotion_id"),
+    ("promotion_condition_group", "condition_group_id"),
+    ("purchase_invoice", "purchase_invoice_id"),
+    ("sell_invoice", "sell_invoice_id"),
+)
+
+
+async def seed_database(name: str, volumes: dict, seed: float) -> None:
+    connection = await asyncpg.connect(**_admin_kwargs(name))
+    try:
+        started = time.perf_counter()
+        await connection.execute((DB_DIR / "schema.sql").read_text())
+        await connection.execute(
+            SEED_SQL.format(
+                seed=seed,
+                categories="[" + ", ".join(f"'{c}'" for c in TREATMENT_CATEGORIES) + "]",
+                category_count=len(TREATMENT_CATEGORIES),
+                **volumes,
+            )
+        )
+        # Triggers/backfills run after the raw history exists, like a migration would.
+        await connection.execute((DB_DIR / "trigger.sql").read_text())
+        await connection.execute("SELECT refresh_item_quantity(item_id) FROM item_catalog")
+        await connection.execute(
+            "SELECT snapshot_daily_stock_range(current_date - $1::int, current_date)",
+            volumes["days"],
+        )
+        for table, column in IDENTITY_COLUMNS:
+            await connection.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                f"(SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}), false)"
+            )
+        await connection.execute("ANALYZE")
+        print(f"Seeded {name} in {time.perf_counter() - started:.1f}s")
+    finally:
+        await connection.close()
+
+
+# ==================== Traffic ====================
+
+
+def booking_request(rng: random.Random, volumes: dict) -> tuple[str, str, dict]:
+    treatments = [
+        {"treatment_id": treatment_id, "price": rng.randint(1000, 30000), "quantity": 1}
+        for treatment_id in rng.sample(range(1, volumes["treatments"] + 1), rng.randint(1, 3))
+    ]
+    promotions = rng.sample(range(1, volumes["promotions"] + 1), rng.randint(0, 2))
+    existing = rng.random() < 0.7
+    payload = {
+        "treatments": treatments,
+        "customer_name": f"Load Test {rng.randint(1, 10**6)}",
+        "customer_id": f"CUS-{rng.randint(1, volumes['customers']):06d}" if existing else None,
+        "promotions": promotions,
+        "session_date": date.today().isoformat(),
+        "session_time": f"{rng.randint(9, 19):02d}:{rng.choice((0, 30)):02d}",
+        "note": None,
+        "total_amount": sum(t["price"] for t in treatments),
+    }
+    return "POST", "/api/v1/booking", {"json": payload}
+
+
+def dashboard_request(rng: random.Random, volumes: dict) -> tuple[str, str, dict]:
+    path = rng.choice(DASHBOARD_PATHS)
+    return "GET", path, {}
+
+
+def dashboard_stats_request(rng: random.Random, volumes: dict) -> tuple[str, str, dict]:
+    return "GET", "/api/v1/dashboard/stats", {}
+
+
+def item_catalog_request(rng: random.Random, volumes: dict) -> tuple[str, str, dict]:
+    params = {"page": rng.randint(1, 5), "limit": 15}
+    filters = {
+        "name": lambda: f"Item {rng.randint(1, 99)}",
+        "code": lambda: f"SKU-{rng.randint(0, 9)}",
+        "item_type": lambda: rng.choice(("MEDICINE", "MEDICAL_TOOL")),
+        "status": lambda: rng.choice(("Low", "Normal")),
+        "unit": lambda: rng.choice(("U", "CC", "MG", "PIECE")),
+    }
+    for key in rng.sample(list(filters), rng.randint(0, 2)):
+        params[key] = filters[key]()
+    return "GET", "/api/v1/resource/item-catalog", {"params": params}
+
+
+SCENARIOS = {
+    "booking": booking_request,
+    "dashboard": dashboard_request,
+    "dashboard_stats": dashboard_stats_request,
+    "item_catalog": item_catalog_request,
+}
+
+
+async def run_traffic(
+    scenarios: dict[str, float],
+    volumes: dict,
+    total_requests: int,
+    concurrency: int,
+    seed: int,
+) -> dict:
+    import httpx
+
+    from app.db.postgres import DataBasePool
+    from app.main import create_app
+
+    app = create_app()
+    await DataBasePool.setup()
+
+    names = list(scenarios)
+    weights = [scenarios[name] for name in names]
+    samples: dict[str, dict[str, list]] = defaultdict(lambda: defaultdict(list))
+    errors: dict[str, int] = defaultdict(int)
+    remaining = total_requests
+
+    async def worker(worker_id: int, client) -> None:
+        nonlocal remaining
+        rng = random.Random(seed * 1000 + worker_id)
+        while remaining > 0:
+            remaining -= 1
+            scenario = rng.choices(names, weights)[0]
+            method, url, kwargs = SCENARIOS[scenario](rng, volumes)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            body_ok = True
+            if scenario == "booking" and response.status_code == 200:
+                body_ok = response.json().get("success", False)
+            if response.status_code >= 400 or not body_ok:
+                errors[scenario] += 1
+
+            series = samples[scenario]
+            series["latency_ms"].append(elapsed_ms)
+            timing = _SERVER_TIMING.search(response.headers.get("server-timing", ""))
+            if timing:
+                series["db_ms"].append(float(timing["db"]))
+                series["queries"].append(int(timing["queries"]))
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(i, client) for i in range(concurrency)))
+            wall = time.perf_counter() - started
+    finally:
+        await DataBasePool.teardown()
+
+    results = {"wall_seconds": wall, "throughput_rps": total_requests / wall, "scenarios": {}}
+    for scenario, series in samples.items():
+        results["scenarios"][scenario] = {
+            "requests": len(series["latency_ms"]),
+            "errors": errors[scenario],
+            "throughput_rps": len(series["latency_ms"]) / wall,
+            "latency_ms": summarize(series["latency_ms"]),
+            "db_ms": summarize(series["db_ms"]),
+            "queries": summarize(series["queries"]),
+        }
+    return results
+
+
+def print_report(results: dict) -> None:
+    rows = []
+    for scenario, stats in sorted(results["scenarios"].items()):
+        latency, queries, db = stats["latency_ms"], stats["queries"], stats["db_ms"]
+        rows.append([
+            scenario,
+            stats["requests"],
+            stats["errors"],
+            stats["throughput_rps"],
+            latency.get("p50"),
+            latency.get("p95"),
+            latency.get("p99"),
+            queries.get("mean"),
+            queries.get("max"),
+            db.get("mean"),
+        ])
+    print(format_table(
+        ["scenario", "reqs", "errors", "rps", "p50 ms", "p95 ms", "p99 ms", "queries", "max q", "db ms"],
+        rows,
+    ))
+    print(f"\nTotal: {results['throughput_rps']:.1f} req/s over {results['wall_seconds']:.1f}s")
+
+
+def _parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=f"{config.POSTGRES['database'] or 'refine_haus'}_bench")
+    parser.add_argument("--seed", action="store_true", help="(Re)create and seed the benchmark database")
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--suppliers", type=int, default=20)
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--treatments", type=int, default=40)
+    parser.add_argument("--promotions", type=int, default=20)
+    parser.add_argument("--purchase-invoices", type=int, default=1000)
+    parser.add_argument("--lines-per-invoice", type=int, default=5)
+    parser.add_argument("--sell-invoices", type=int, default=20000)
+    parser.add_argument("--movements", type=int, default=20000, help="Extra WITHDRAW stock movements")
+    parser.add_argument("--appointments", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365, help="History spread in days")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--mix",
+        type=_parse_mix,
+        default=_parse_mix("booking=1,dashboard=3,item_catalog=2"),
+        help="Weighted scenario mix, e.g. booking=1,dashboard=3,item_catalog=2",
+    )
+    parser.add_argument("--json-out", help="Write results as JSON (relative paths go to benchmarks/results)")
+    args = parser.parse_args()
+
+    volumes = {
+        "customers": args.customers,
+        "suppliers": args.suppliers,
+        "items": max(args.items, args.treatments),
+        "treatments": args.treatments,
+        "promotions": args.promotions,
+        "purchase_invoices": args.purchase_invoices,
+        "lines_per_invoice": args.lines_per_invoice,
+        "sell_invoices": args.sell_invoices,
+        "movements": args.movements,
+        "appointments": args.appointments,
+        "days": args.days,
+    }
+
+    if args.seed:
+        asyncio.run(create_database(args.database))
+        asyncio.run(seed_database(args.database, volumes, seed=(args.random_seed % 1000) / 1000))
+
+    # Point the app at the benchmark database; background jobs would skew the numbers.
+    config.POSTGRES["database"] = args.database
+    config.SCHEDULER["mode"] = "disabled"
+    config.METRICS["enabled"] = True
+
+    results = asyncio.run(
+        run_traffic(args.mix, volumes, args.requests, args.concurrency, args.random_seed)
+    )
+    print_report(results)
+
+    if args.json_out:
+        path = Path(args.json_out)
+        if not path.is_absolute() and path.parent == Path("."):
+            path = RESULTS_DIR / path
+        params = {**volumes, "requests": args.requests, "concurrency": args.concurrency, "mix": args.mix}
+        print(f"Results written to {write_results(path, 'load_test', params, results)}")
+
+
+if __name__ == "__main__":
+    main()
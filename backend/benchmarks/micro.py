@@ -0,0 +1,324 @@
+"""
+Micro-benchmarks for the ML bundle pipeline and checkout promotion checks.
+
+Cases:
+- apriori[N]: run_apriori on N synthetic baskets (treatments drawn Zipf-style,
+  like real demand where a few treatments dominate)
+- format_bundles[N]: format_bundle_recommendations on the rules mined from N baskets
+- promotion_rules[G×R]: booking._promotion_rules_satisfied against an in-memory
+  fake connection (G condition groups × R rules), reporting SQL round trips
+- customers_models[N] / customers_fastjson[N]: GET /resource/customers response
+  for N rows, through Pydantic models + response_model versus app.utils.fastjson
+
+Each case runs a warm-up then `--rounds` timed rounds. Results can be saved as a
+JSON baseline and compared against later runs; the comparison exits non-zero
+when any case's median regresses by more than `--threshold` percent.
+
+    python -m benchmarks.micro --save baseline
+    python -m benchmarks.micro --compare baseline --threshold 10
+    python -m benchmarks.micro --sizes 1000,10000,100000,1000000 --rounds 3
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from bisect import bisect_left
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Callable
+
+from benchmarks.common import RESULTS_DIR, format_table, load_results, write_results
+
+# ==================== Synthetic data ====================
+
+
+def zipf_baskets(
+    n_baskets: int,
+    n_treatments: int = 40,
+    exponent: float = 1.1,
+    max_size: int = 5,
+    seed: int = 42,
+) -> list[list[str]]:
+    """Baskets of 2..max_size distinct treatments, popularity ~ 1 / rank**exponent."""
+    rng = random.Random(seed)
+    names = [f"Treatment {rank}" for rank in range(1, n_treatments + 1)]
+    cumulative = list(accumulate(1 / rank ** exponent for rank in range(1, n_treatments + 1)))
+    total = cumulative[-1]
+
+    baskets = []
+    for _ in range(n_baskets):
+        size = rng.randint(2, max_size)
+        basket = set()
+        while len(basket) < size:
+            basket.add(names[bisect_left(cumulative, rng.random() * total)])
+        baskets.append(sorted(basket))
+    return baskets
+
+
+class FakeConnection:
+    """
+    Answers the queries issued by booking._promotion_rules_satisfied from memory
+    and counts round trips, so the benchmark measures Python-side evaluation cost
+    plus the number of awaits a real connection would turn into network trips.
+    """
+
+    def __init__(self, groups: dict[int, list[dict]], invoice_items: dict[int, int]) -> None:
+        self.groups = groups
+        self.invoice_items = invoice_items  # item_id -> qty
+        self.invoice_total = Decimal(sum(qty * 1000 for qty in invoice_items.values()))
+        self.queries = 0
+
+    async def fetchval(self, query: str, *args):
+        self.queries += 1
+        await asyncio.sleep(0)
+        if "COUNT(*)" in query and "promotion_condition_group" in query:
+            return len(self.groups)
+        if "SUM(total_price)" in query:
+            return self.invoice_total
+        if "EXISTS" in query:
+            return args[1] in self.invoice_items
+        if "SUM(qty)" in query:
+            return self.invoice_items.get(args[1], 0)
+        if "FROM sell_invoice" in query:
+            return 0
+        if "wallet_movement" in query:
+            return Decimal("5000")
+        raise AssertionError(f"Unexpected fetchval: {query}")
+
+    async def fetch(self, query: str, *args):
+        self.queries += 1
+        await asyncio.sleep(0)
+        if "FROM promotion_condition_group" in query:
+            return [{"condition_group_id": group_id} for group_id in self.groups]
+        if "FROM promotion_condition_rule" in query:
+            return self.groups.get(args[0], [])
+        raise AssertionError(f"Unexpected fetch: {query}")
+
+
+def promotion_fixture(n_groups: int, rules_per_group: int, seed: int = 42) -> FakeConnection:
+    """Groups whose last rule fails except in the final group (worst case: every rule is checked)."""
+    rng = random.Random(seed)
+    invoice_items = {item_id: rng.randint(1, 3) for item_id in rng.sample(range(1, 41), 4)}
+    rule_kinds = ("MIN_SPEND", "HAS_ITEM", "MIN_QTY_ITEM", "NEW_CUSTOMER_ONLY", "MIN_WALLET_TOPUP")
+
+    groups = {}
+    for group_id in range(1, n_groups + 1):
+        rules = []
+        for index in range(rules_per_group):
+            rule_type = rule_kinds[index % len(rule_kinds)]
+            item_id = rng.choice(list(invoice_items))
+            rules.append({
+                "rule_type": rule_type,
+                "op": "GTE",
+                "amount_value": Decimal("100"),
+                "item_id": item_id,
+                "qty_base_unit": Decimal("1"),
+            })
+        if group_id < n_groups:
+            rules[-1] = {**rules[-1], "rule_type": "HAS_ITEM", "item_id": 9999}
+        groups[group_id] = rules
+    return FakeConnection(groups, invoice_items)
+
+
+def customer_rows(n_rows: int, seed: int = 42) -> list[dict]:
+    """Rows shaped like queries.CUSTOMER_LIST output (dicts stand in for asyncpg Records)."""
+    rng = random.Random(seed)
+    return [
+        {
+            "customer_id": customer_id,
+            "customer_code": f"C{customer_id:06d}",
+            "full_name": f"Customer {customer_id}",
+            "nickname": rng.choice([None, "Mint", "Ploy", "Beam"]),
+            "phone": f"08{rng.randint(0, 99_999_999):08d}",
+            "date_of_birth": date(1970, 1, 1) + timedelta(days=rng.randint(0, 18_000)),
+            "gender": rng.choice(["MALE", "FEMALE", None]),
+            "member_wallet_remain": Decimal(rng.randint(0, 500_000)) / 100,
+        }
+        for customer_id in range(1, n_rows + 1)
+    ]
+
+
+# ==================== Runner ====================
+
+
+def measure(func: Callable[[], object], rounds: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "rounds": rounds,
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "stdev_ms": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def bench_apriori(sizes: list[int], rounds: int, min_support: float, min_confidence: float) -> dict:
+    from app.ml.apriori import format_bundle_recommendations, run_apriori
+
+    results = {}
+    for size in sizes:
+        baskets = zipf_baskets(size)
+        # Large inputs take seconds per run; fewer rounds keep the suite usable.
+        case_rounds = rounds if size < 100_000 else max(1, rounds // 3)
+
+        results[f"apriori[{size}]"] = measure(
+            lambda: run_apriori(baskets, min_support=min_support, min_confidence=min_confidence),
+            case_rounds,
+        )
+
+        rules = run_apriori(baskets, min_support=min_support, min_confidence=min_confidence)
+        stats = measure(lambda: format_bundle_recommendations(rules, top_n=len(rules)), rounds * 5)
+        stats["rules"] = len(rules)
+        results[f"format_bundles[{size}]"] = stats
+    return results
+
+
+def bench_promotions(shapes: list[tuple[int, int]], rounds: int) -> dict:
+    from app.api.routes.booking import _promotion_rules_satisfied
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for n_groups, rules_per_group in shapes:
+            connection = promotion_fixture(n_groups, rules_per_group)
+
+            def evaluate():
+                return loop.run_until_complete(
+                    _promotion_rules_satisfied(connection, 1, 1, 1)
+                )
+
+            connection.queries = 0
+            evaluate()
+            queries = connection.queries
+
+            stats = measure(evaluate, rounds * 20)
+            stats["queries"] = queries
+            results[f"promotion_rules[{n_groups}x{rules_per_group}]"] = stats
+    finally:
+        loop.close()
+    return results
+
+
+def bench_serialization(sizes: list[int], rounds: int) -> dict:
+    from pydantic import TypeAdapter
+
+    from app.schemas.customer import CustomerListResponse, CustomerRow
+    from app.utils import fastjson
+
+    adapter = TypeAdapter(CustomerListResponse)
+
+    def through_models(rows):
+        # Handler builds models; FastAPI then dumps, re-validates against
+        # response_model and JSON-encodes the result.
+        response = CustomerListResponse(items=[CustomerRow(**dict(row)) for row in rows])
+        validated = adapter.validate_python(response.model_dump())
+        return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+    results = {}
+    for size in sizes:
+        rows = customer_rows(size)
+        case_rounds = rounds if size < 100_000 else max(1, rounds // 3)
+        results[f"customers_models[{size}]"] = measure(lambda: through_models(rows), case_rounds)
+        stats = measure(lambda: fastjson.dumps({"items": rows}), case_rounds)
+        stats["encoder"] = "orjson" if fastjson.orjson is not None else "json"
+        results[f"customers_fastjson[{size}]"] = stats
+    return results
+
+
+# ==================== Reporting ====================
+
+
+def print_results(results: dict) -> None:
+    rows = [
+        [name, stats["rounds"], stats["min_ms"], stats["median_ms"], stats["stdev_ms"],
+         stats.get("rules", stats.get("queries"))]
+        for name, stats in results.items()
+    ]
+    print(format_table(["case", "rounds", "min ms", "median ms", "stdev ms", "rules/queries"], rows))
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """Print median deltas against a baseline; return True if any case regressed."""
+    regressed = False
+    rows = []
+    for name, stats in current.items():
+        before = baseline.get(name)
+        if before is None:
+            rows.append([name, None, stats["median_ms"], None, "new"])
+            continue
+        change = (stats["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+        verdict = "ok"
+        if change > threshold:
+            verdict, regressed = "REGRESSION", True
+        elif change < -threshold:
+            verdict = "faster"
+        queries_before, queries_now = before.get("queries"), stats.get("queries")
+        if queries_before is not None and queries_now is not None and queries_now > queries_before:
+            verdict, regressed = "MORE QUERIES", True
+        rows.append([name, before["median_ms"], stats["median_ms"], f"{change:+.1f}%", verdict])
+    print(format_table(["case", "baseline ms", "current ms", "change", "verdict"], rows))
+    return regressed
+
+
+def _baseline_path(name: str):
+    return RESULTS_DIR / f"micro-{name}.json"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Basket counts for apriori cases")
+    parser.add_argument("--promotion-shapes", default="1x3,5x5,20x5", help="GROUPSxRULES per promotion")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-support", type=float, default=0.01)
+    parser.add_argument("--min-confidence", type=float, default=0.1)
+    parser.add_argument("--json-rows", default="1000,10000", help="Row counts for serialization cases")
+    parser.add_argument("--only", choices=("apriori", "promotions", "serialization"))
+    parser.add_argument("--save", metavar="NAME", help="Save results as benchmarks/results/micro-NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    shapes = [tuple(int(n) for n in shape.split("x")) for shape in args.promotion_shapes.split(",") if shape]
+    json_rows = [int(size) for size in args.json_rows.split(",") if size]
+
+    results = {}
+    if args.only in (None, "apriori"):
+        results.update(bench_apriori(sizes, args.rounds, args.min_support, args.min_confidence))
+    if args.only in (None, "promotions"):
+        results.update(bench_promotions(shapes, args.rounds))
+    if args.only in (None, "serialization"):
+        results.update(bench_serialization(json_rows, args.rounds))
+    print_results(results)
+
+    params = {
+        "sizes": sizes,
+        "promotion_shapes": shapes,
+        "json_rows": json_rows,
+        "rounds": args.rounds,
+        "min_support": args.min_support,
+        "min_confidence": args.min_confidence,
+    }
+    if args.save:
+        print(f"\nBaseline written to {write_results(_baseline_path(args.save), 'micro', params, results)}")
+
+    if args.compare:
+        baseline = load_results(_baseline_path(args.compare))
+        print(f"\nCompared with {args.compare} ({baseline.get('git_revision') or 'unknown revision'}):")
+        if compare(baseline["results"], results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
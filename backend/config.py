@@ -3,6 +3,13 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Optional subsystems this worker neither imports nor serves: any of "ml" (Apriori bundles,
+# pandas/mlxtend), "agent" (LUMINA chat, LangChain) and "storage" (signed asset URLs, boto3).
+# e.g. DISABLED_SUBSYSTEMS=ml,agent for workers that only serve bookings.
+DISABLED_SUBSYSTEMS = frozenset(
+    name.strip().lower() for name in os.getenv("DISABLED_SUBSYSTEMS", "").split(",") if name.strip()
+)
+
 POSTGRES = {
     "database": os.getenv("DB_NAME"),
     "user": os.getenv("DB_USER"),
@@ -19,3 +26,127 @@ SUPABASE_OBJECT_STORAGE = {
     "s3_endpoint": os.getenv("SUPABASE_S3_ENDPOINT"),
     "s3_region": os.getenv("SUPABASE_S3_REGION", "ap-southeast-1"),
 }
+
+# local: every worker runs its own scheduler (single-process deployments)
+# distributed: one leader per fleet, elected with a Postgres advisory lock
+# disabled: no scheduled jobs in this process
+SCHEDULER = {
+    "mode": os.getenv("SCHEDULER_MODE", "local").lower(),
+    "leader_poll_seconds": float(os.getenv("SCHEDULER_LEADER_POLL_SECONDS", "15")),
+    # Random delay added to each cron fire so jobs don't hit the database in lockstep.
+    "jitter_seconds": int(os.getenv("SCHEDULER_JITTER_SECONDS", "60")),
+    # Failed runs are retried with exponential backoff: backoff * 2**attempt seconds.
+    "max_retries": int(os.getenv("SCHEDULER_MAX_RETRIES", "3")),
+    "retry_backoff_seconds": float(os.getenv("SCHEDULER_RETRY_BACKOFF_SECONDS", "30")),
+    # Run jobs whose slot was missed during downtime once, right after startup.
+    "catch_up": os.getenv("SCHEDULER_CATCH_UP", "true").lower() == "true",
+}
+
+METRICS = {
+    # Per-request latency / SQL round-trip tracking, Server-Timing headers and /metrics.
+    "enabled": os.getenv("METRICS_ENABLED", "true").lower() == "true",
+    # Requests issuing more SQL round trips than this are logged (N+1 patterns).
+    "query_count_warning": int(os.getenv("METRICS_QUERY_COUNT_WARNING", "25")),
+}
+
+# Opt-in statement fingerprinting with latency percentiles and sampled EXPLAIN ANALYZE.
+QUERY_PROFILING = {
+    "enabled": os.getenv("QUERY_PROFILING_ENABLED", "false").lower() == "true",
+    # Statements slower than this are candidates for EXPLAIN capture.
+    "slow_ms": float(os.getenv("QUERY_PROFILING_SLOW_MS", "100")),
+    # Fraction of slow SELECT executions re-run under EXPLAIN (ANALYZE, BUFFERS).
+    "explain_sample_rate": float(os.getenv("QUERY_PROFILING_EXPLAIN_SAMPLE_RATE", "0.1")),
+    "explain_timeout_ms": int(os.getenv("QUERY_PROFILING_EXPLAIN_TIMEOUT_MS", "5000")),
+    "explains_per_fingerprint": int(os.getenv("QUERY_PROFILING_EXPLAINS_PER_FINGERPRINT", "3")),
+    "reservoir_size": int(os.getenv("QUERY_PROFILING_RESERVOIR_SIZE", "512")),
+    "max_fingerprints": int(os.getenv("QUERY_PROFILING_MAX_FINGERPRINTS", "500")),
+}
+
+# Pooled asyncpg connections.
+DB_POOL = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "5")),
+    # Prepare the hot statements in app/db/queries.py when a pooled connection opens.
+    "prepare_on_connect": os.getenv("DB_PREPARE_ON_CONNECT", "true").lower() == "true",
+    # Max pooled connections one request may use for independent queries (fan_out); 1 = sequential.
+    # Each extra connection costs a reset round trip on release, so this pays off against a
+    # remote database, not one on the same host.
+    "fan_out_budget": int(os.getenv("DB_FAN_OUT_BUDGET", "3")),
+}
+
+# Startup warm-up; /health/ready reports 503 until it finishes (app/services/warmup.py).
+WARMUP = {
+    "enabled": os.getenv("WARMUP_ENABLED", "true").lower() == "true",
+    # Pooled connections opened and prepared up front (capped at DB_POOL max_size).
+    "connections": int(os.getenv("WARMUP_CONNECTIONS", "3")),
+    "prime_caches": os.getenv("WARMUP_PRIME_CACHES", "true").lower() == "true",
+    # Also build the SQL agent (schema reflection, LLM client); imports LangChain at startup.
+    "agent": os.getenv("WARMUP_AGENT", "false").lower() == "true",
+    # Report ready after this long even if a step is still running.
+    "timeout_seconds": float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30")),
+}
+
+# ETag / Cache-Control caching of reference-data responses (treatments, bundles, assets).
+HTTP_CACHE = {
+    "enabled": os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true",
+    # How long browsers may reuse a response before revalidating with If-None-Match.
+    "max_age_seconds": int(os.getenv("HTTP_CACHE_MAX_AGE_SECONDS", "60")),
+    # Responses with presigned storage URLs are rebuilt after this long (URLs expire after 3600s).
+    "signed_url_ttl_seconds": int(os.getenv("HTTP_CACHE_SIGNED_URL_TTL_SECONDS", "900")),
+    "max_entries": int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "256")),
+}
+
+# LISTEN/NOTIFY cache invalidation (one listener connection per worker).
+INVALIDATION = {
+    "enabled": os.getenv("INVALIDATION_ENABLED", "true").lower() == "true",
+    # Ping interval that detects a listener connection that died silently.
+    "keepalive_seconds": float(os.getenv("INVALIDATION_KEEPALIVE_SECONDS", "30")),
+    "reconnect_max_seconds": float(os.getenv("INVALIDATION_RECONNECT_MAX_SECONDS", "30")),
+}
+
+# Opt-in: large list endpoints encode asyncpg Records straight to JSON (orjson when
+# installed) instead of building and re-validating one Pydantic model per row, and
+# nested detail views (customer treatments, purchase invoice) are built by Postgres.
+FAST_JSON = {
+    "enabled": os.getenv("FAST_JSON_ENABLED", "false").lower() == "true",
+}
+
+# Limits on SQL written by the chat agent (app/agents/sql_guard.py).
+AGENT_SQL = {
+    # Read-only role or replica for agent queries; defaults to the primary (read-only transactions).
+    "database_url": os.getenv("AGENT_DATABASE_URL"),
+    "statement_timeout_ms": int(os.getenv("AGENT_SQL_STATEMENT_TIMEOUT_MS", "5000")),
+    # Queries whose EXPLAIN total cost exceeds this are rejected before they run.
+    "max_cost": float(os.getenv("AGENT_SQL_MAX_COST", "100000")),
+    # Injected LIMIT; the agent sees at most this many rows per query.
+    "max_rows": int(os.getenv("AGENT_SQL_MAX_ROWS", "200")),
+    # The agent's own SQLAlchemy pool (sync driver, so it cannot borrow asyncpg connections).
+    # Worst case per worker: DB_POOL max_size + pool_size + max_overflow + listener/leader connections.
+    "pool_size": int(os.getenv("AGENT_SQL_POOL_SIZE", "2")),
+    "max_overflow": int(os.getenv("AGENT_SQL_POOL_MAX_OVERFLOW", "0")),
+    "pool_timeout_seconds": float(os.getenv("AGENT_SQL_POOL_TIMEOUT_SECONDS", "10")),
+    # Recycle before server/proxy idle timeouts close the connection underneath the pool.
+    "pool_recycle_seconds": int(os.getenv("AGENT_SQL_POOL_RECYCLE_SECONDS", "1800")),
+}
+
+# Template answers for common questions before falling back to the SQL agent (app/agents/intents.py).
+INTENT_ROUTER = {
+    "enabled": os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true",
+    # Longer questions usually carry conditions the templates cannot express.
+    "max_chars": int(os.getenv("INTENT_ROUTER_MAX_CHARS", "120")),
+    # Trigram classifier: best example similarity, and its lead over the next intent.
+    "min_similarity": float(os.getenv("INTENT_ROUTER_MIN_SIMILARITY", "0.45")),
+    "min_margin": float(os.getenv("INTENT_ROUTER_MIN_MARGIN", "0.1")),
+    "max_list_rows": int(os.getenv("INTENT_ROUTER_MAX_LIST_ROWS", "20")),
+}
+
+# Conversation context sent to the SQL agent with each chat turn.
+CHAT_CONTEXT = {
+    # Token budget for verbatim recent turns; older turns are folded into a rolling summary.
+    "history_token_budget": int(os.getenv("CHAT_CONTEXT_HISTORY_TOKENS", "1500")),
+    "max_turns": int(os.getenv("CHAT_CONTEXT_MAX_TURNS", "12")),
+    # Unsummarized messages read per request (bounds the query for legacy long threads).
+    "scan_limit": int(os.getenv("CHAT_CONTEXT_SCAN_LIMIT", "200")),
+    "summary_max_tokens": int(os.getenv("CHAT_CONTEXT_SUMMARY_MAX_TOKENS", "400")),
+    "summary_model": os.getenv("CHAT_CONTEXT_SUMMARY_MODEL", "gpt-4o-mini"),
+}
@@ -0,0 +1,46 @@
+import pytest
+
+from app.agents.intents import INTENTS, classify
+
+
+@pytest.mark.parametrize(
+    "intent, example",
+    [(intent, example) for intent in INTENTS for example in intent.examples],
+    ids=lambda value: getattr(value, "name", value),
+)
+def test_examples_classify_to_their_intent(intent, example):
+    match = classify(example)
+    assert match is not None, example
+    assert match[0].name == intent.name
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "what items are out of stock",
+        "are any items running low",
+        "which products are low on stock",
+    ],
+)
+def test_low_stock_list_questions(message):
+    match = classify(message)
+    assert match is not None and match[0].name == "low_stock"
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "is botox low on stock",
+        "are we out of stock on filler",
+        "botox ยังมีไหม",
+        "revenue of botox today",
+        "top treatments for customer C-000001",
+        "revenue for botox today",
+        "how much revenue did botox make today",
+        "ยอดขายโบท็อกซ์วันนี้",
+        "sales target this month",
+        "low stock items in the filler category",
+    ],
+)
+def test_single_item_questions_go_to_the_agent(message):
+    assert classify(message) is None
@@ -0,0 +1,11 @@
+from app.db import queries as q
+
+
+def test_hot_statements_are_registered():
+    assert q.HOT_STATEMENTS <= set(q.STATEMENTS)
+
+
+def test_only_hot_paths_are_prepared_on_connect():
+    hot_prefixes = ("booking.", "promotion.", "dashboard.", "customer.", "cache.")
+    for name in q.STATEMENTS:
+        assert (name in q.HOT_STATEMENTS) == name.startswith(hot_prefixes), name
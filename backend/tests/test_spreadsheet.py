@@ -0,0 +1,26 @@
+import io
+
+import pytest
+
+from app.utils.spreadsheet import SpreadsheetError, iter_csv_rows, iter_spreadsheet_rows
+
+
+def test_csv_rows_skip_blank_lines_and_normalize_headers():
+    stream = io.BytesIO("Item Name,QTY\nBotox,2\n,\nFiller,1\n".encode("utf-8-sig"))
+    assert list(iter_csv_rows(stream)) == [
+        (2, {"item_name": "Botox", "qty": "2"}),
+        (4, {"item_name": "Filler", "qty": "1"}),
+    ]
+
+
+def test_csv_that_is_not_utf8_is_a_spreadsheet_error():
+    stream = io.BytesIO(b"item_name,qty\n\xff\xfe\xfa,1\n")
+    with pytest.raises(SpreadsheetError):
+        list(iter_csv_rows(stream))
+
+
+def test_xlsx_that_is_not_a_workbook_is_a_spreadsheet_error():
+    pytest.importorskip("openpyxl")
+    stream = io.BytesIO(b"item_name,qty\nBotox,1\n")
+    with pytest.raises(SpreadsheetError):
+        list(iter_spreadsheet_rows(stream, filename="items.xlsx"))
@@ -0,0 +1,83 @@
+import pytest
+
+from app.agents.sql_guard import GuardRejected, normalize_statement, with_row_limit
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT 1", "SELECT 1"),
+        ("  select name from treatment;  ", "select name from treatment"),
+        ("SELECT 1;;\n", "SELECT 1"),
+        ("WITH t AS (SELECT 1 AS n) SELECT n FROM t", "WITH t AS (SELECT 1 AS n) SELECT n FROM t"),
+        ("/* leading */ SELECT 1", "/* leading */ SELECT 1"),
+        ("SELECT 1 -- trailing comment", "SELECT 1 -- trailing comment"),
+        ("SELECT 1; -- nothing else", "SELECT 1"),
+        ("SELECT 'a;b', 'it''s'", "SELECT 'a;b', 'it''s'"),
+        ("SELECT E'\\';'", "SELECT E'\\';'"),
+        ("SELECT $$;$$, $tag$ ' ; $tag$", "SELECT $$;$$, $tag$ ' ; $tag$"),
+        ('SELECT 1 AS "a;b"', 'SELECT 1 AS "a;b"'),
+        ("SELECT 1 /* outer /* inner ; */ still ; comment */", "SELECT 1 /* outer /* inner ; */ still ; comment */"),
+        ("SELECT name FROM customer WHERE customer_id = $1", "SELECT name FROM customer WHERE customer_id = $1"),
+        ("SELECT '(' , ')'", "SELECT '(' , ')'"),
+    ],
+)
+def test_accepts_single_read_statement(sql, expected):
+    assert normalize_statement(sql) == expected
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        # A quote inside a line comment must not hide the semicolons that follow it.
+        "SELECT 1 -- it's\n) AS a LIMIT 1; COMMIT; DELETE FROM customer; SELECT * FROM (SELECT 1 -- '",
+        "SELECT 1; DELETE FROM customer",
+        "SELECT 1; COMMIT",
+        "SELECT 'x' -- ';\n; DROP TABLE customer",
+        "SELECT 1 /* ' */; DELETE FROM customer",
+        # Backslash escapes only apply to E'' strings.
+        "SELECT 'a\\'; DELETE FROM customer; --'",
+        "SELECT E'a\\'; DELETE FROM customer; --' ; DELETE FROM customer",
+        "SELECT $$ x $$; DELETE FROM customer",
+        'SELECT 1 AS "x"; DELETE FROM customer',
+        "DELETE FROM customer",
+        "UPDATE customer SET full_name = 'x'",
+        "/* SELECT */ DELETE FROM customer",
+        "COMMIT",
+        "",
+    ],
+)
+def test_rejects_anything_but_one_select(sql):
+    with pytest.raises(GuardRejected):
+        normalize_statement(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT 'unterminated",
+        "SELECT $$ unterminated",
+        "SELECT 1 /* unterminated",
+        'SELECT "unterminated',
+    ],
+)
+def test_rejects_unterminated_tokens(sql):
+    with pytest.raises(GuardRejected):
+        normalize_statement(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT 1) AS a UNION SELECT 2 FROM (SELECT 3",
+        "SELECT (1",
+    ],
+)
+def test_rejects_unbalanced_parentheses(sql):
+    with pytest.raises(GuardRejected):
+        normalize_statement(sql)
+
+
+def test_row_limit_wraps_the_normalized_statement():
+    statement = normalize_statement("SELECT 1 -- note")
+    assert with_row_limit(statement, 10) == "SELECT * FROM (\nSELECT 1 -- note\n) AS agent_query LIMIT 11"
@@ -2,10 +2,23 @@ import { useEffect, useMemo, useRef, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { useCart } from "../context/CartContext";
 
+// crypto.randomUUID is only available in secure contexts (https, localhost).
+function newIdempotencyKey() {
+  if (globalThis.crypto?.randomUUID) {
+    return globalThis.crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+}
+
 export default function BookingFormPage() {
   const navigate = useNavigate();
   const { cartItems, getCartTotal, getCartCount, clearCart } = useCart();
   const isNavigatingToSuccess = useRef(false);
+  // Idempotency-Key for the current booking payload: resubmitting the same
+  // booking (double click, retry after a timeout) reuses it so the server
+  // returns the first result instead of creating a second invoice.
+  const bookingAttempt = useRef(null);
+  const [isSubmitting, setIsSubmitting] = useState(false);
   const apiBase =
     import.meta.env.VITE_API_BASE ?? "http://localhost:8000/api/v1";
 
@@ -175,12 +188,21 @@ export default function BookingFormPage() {
       total_amount: totalPrice,
     };
 
+    const body = JSON.stringify(payload);
+    if (bookingAttempt.current?.body !== body) {
+      bookingAttempt.current = { body, key: newIdempotencyKey() };
+    }
+
     let invoiceNo = null;
+    setIsSubmitting(true);
     try {
       const response = await fetch(`${apiBase}/booking`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
+        headers: {
+          "Content-Type": "application/json",
+          "Idempotency-Key": bookingAttempt.current.key,
+        },
+        body,
       });
       const result = await response.json();
       if (!response.ok || !result?.success) {
@@ -189,6 +211,7 @@ export default function BookingFormPage() {
       invoiceNo = result.invoice_no ?? null;
     } catch (error) {
       isNavigatingToSuccess.current = false;
+      setIsSubmitting(false);
       alert(error.message || "Booking failed");
       return;
     }
@@ -408,7 +431,7 @@ export default function BookingFormPage() {
               <button
                 type="button"
                 onClick={handlePayment}
-                disabled={!name || !dateBooking || !timeBooking}
+                disabled={!name || !dateBooking || !timeBooking || isSubmitting}
                 className="mt-6 h-11 w-full rounded-md bg-[#a39373] text-[12px] font-semibold uppercase tracking-[0.22em] text-black hover:bg-[#b4a279] disabled:cursor-not-allowed disabled:opacity-50"
               >
                 Payment
@@ -62,6 +62,19 @@ function SearchIcon() {
   );
 }
 
+// Messages are fetched newest-first in pages; older pages load on demand
+const MESSAGE_PAGE_SIZE = 50;
+
+function normalizeMessages(data) {
+  return Array.isArray(data)
+    ? data.map((msg) => ({
+        id: msg.message_id,
+        role: msg.role === "USER" ? "user" : "assistant",
+        text: msg.content,
+      }))
+    : [];
+}
+
 function ThinkingDots() {
   const baseClass = "inline-block h-1.5 w-1.5 rounded-full bg-black/50";
   return (
@@ -82,7 +95,13 @@ export default function LuminaPage() {
   const [messages, setMessages] = useState([]);
   const [isSending, setIsSending] = useState(false);
   const [sendError, setSendError] = useState("");
+  const [hasOlder, setHasOlder] = useState(false);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
   const listRef = useRef(null);
+  // Set while prepending an older page so the view stays where the user was reading
+  const restoreScrollRef = useRef(null);
+  // Latest selection, read after awaits to drop pages for a conversation the user left.
+  const activeConversationRef = useRef(null);
 
   const apiBase = useMemo(
     () => import.meta.env.VITE_API_BASE ?? "http://localhost:8000/api/v1",
@@ -106,19 +125,47 @@ export default function LuminaPage() {
   async function loadMessages(conversationId) {
     try {
       const res = await fetch(
-        `${apiBase}/chat/conversations/${conversationId}/messages`
+        `${apiBase}/chat/conversations/${conversationId}/messages?limit=${MESSAGE_PAGE_SIZE}`
       );
       if (!res.ok) throw new Error(`Request failed (${res.status})`);
       const data = await res.json();
-      const normalized = Array.isArray(data)
-        ? data.map((msg) => ({
-            role: msg.role === "USER" ? "user" : "assistant",
-            text: msg.content,
-          }))
-        : [];
+      const normalized = normalizeMessages(data);
       setMessages(normalized);
+      setHasOlder(normalized.length === MESSAGE_PAGE_SIZE);
     } catch (err) {
       setMessages([]);
+      setHasOlder(false);
+    }
+  }
+
+  useEffect(() => {
+    activeConversationRef.current = activeConversationId;
+  }, [activeConversationId]);
+
+  async function loadOlderMessages() {
+    const conversationId = activeConversationId;
+    const oldestId = messages.find((m) => m.id != null)?.id;
+    if (!conversationId || oldestId == null || isLoadingOlder) return;
+    setIsLoadingOlder(true);
+    try {
+      const res = await fetch(
+        `${apiBase}/chat/conversations/${conversationId}/messages?before_id=${oldestId}&limit=${MESSAGE_PAGE_SIZE}`
+      );
+      if (!res.ok) throw new Error(`Request failed (${res.status})`);
+      const older = normalizeMessages(await res.json());
+      if (activeConversationRef.current !== conversationId) return;
+      if (listRef.current) {
+        restoreScrollRef.current = {
+          height: listRef.current.scrollHeight,
+          top: listRef.current.scrollTop,
+        };
+      }
+      setMessages((prev) => [...older, ...prev]);
+      setHasOlder(older.length === MESSAGE_PAGE_SIZE);
+    } catch (err) {
+      // keep what is already shown; the button stays available for a retry
+    } finally {
+      setIsLoadingOlder(false);
     }
   }
 
@@ -186,10 +233,17 @@ export default function LuminaPage() {
   // Keep the list pinned to bottom on new messages (scroll inside the chat box)
   useEffect(() => {
     if (isEmpty) return;
+    const restore = restoreScrollRef.current;
+    restoreScrollRef.current = null;
     requestAnimationFrame(() => {
-      if (listRef.current) {
-        listRef.current.scrollTop = listRef.current.scrollHeight;
+      if (!listRef.current) return;
+      if (restore) {
+        // older page was prepended: keep the same message under the viewport
+        listRef.current.scrollTop =
+          listRef.current.scrollHeight - restore.height + restore.top;
+        return;
       }
+      listRef.current.scrollTop = listRef.current.scrollHeight;
     });
   }, [messages.length, activeConversationId, isEmpty]);
 
@@ -247,6 +301,7 @@ export default function LuminaPage() {
                 onClick={() => {
                   setActiveConversationId(null);
                   setMessages([]);
+                  setHasOlder(false);
                   setPrompt("");
                 }}
               >
@@ -276,6 +331,7 @@ export default function LuminaPage() {
                   onClick={() => {
                     setActiveConversationId(null);
                     setMessages([]);
+                    setHasOlder(false);
                     setPrompt("");
                   }}
                 >
@@ -396,9 +452,21 @@ export default function LuminaPage() {
                   className="flex-1 overflow-y-auto overscroll-contain rounded-2xl border border-black/10 bg-white/60 p-4 pr-2"
                 >
                   <div className="space-y-3">
+                    {hasOlder ? (
+                      <div className="flex justify-center">
+                        <button
+                          type="button"
+                          onClick={loadOlderMessages}
+                          disabled={isLoadingOlder}
+                          className="rounded-full px-4 py-1 text-[12px] text-black/50 hover:bg-black/5 disabled:opacity-60"
+                        >
+                          {isLoadingOlder ? "Loading..." : "Load earlier messages"}
+                        </button>
+                      </div>
+                    ) : null}
                     {messages.map((m, idx) => (
                       <div
-                        key={idx}
+                        key={m.id ?? `local-${idx}`}
                         className={
                           m.role === "user"
                             ? "ml-auto max-w-[80%] rounded-2xl bg-white px-4 py-2 text-[13px] text-black/75 shadow-sm whitespace-pre-wrap"